@@ -22,32 +22,201 @@ Find DocParser attributes in a folder structure and return their parameters
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import hashlib
 import json
+import mmap
 import os
+from parsers.AtomicFile import writeAtomic
 from pathlib import Path
 import re
+import sys
 
-docparserpattern = re.compile(r"(?s)\[DocParser\(\s*\"(?P<friendlyname>[^\"]+)\"\s*,\s*(?P<issue>[0-9]+)\s*,\s*\"(?P<url>[^\"]+)\"\s*,\s*\"(?P<parser>[^\"]+)\"\s*\)\]")
+docparserpattern = re.compile(rb"(?s)\[DocParser\(\s*\"(?P<friendlyname>[^\"]+)\"\s*,\s*(?P<issue>[0-9]+)\s*,\s*\"(?P<url>[^\"]+)\"\s*,\s*\"(?P<parser>[^\"]+)\"\s*\)\]")
 
-def testfolder(folder: str | Path, glob: str = "*.cs") -> dict:
+docparserprefilter = b"DocParser("
+"""
+A literal that must be present in a file for docparserpattern to match. Checked before running the regex so that files without an attribute are rejected with a single substring search
+"""
+
+prunedirs = frozenset([".git", ".github", ".vs", ".vscode", ".idea", ".cache", ".diff", ".output", ".venv", "venv", "__pycache__", "bin", "obj", "node_modules", "packages", "TestResults"])
+"""
+Directory names which are never descended into. These are VCS, IDE, build output, and workflow scratch directories, which can not contain source files with DocParser attributes
+"""
+
+indexversion = 1
+"""
+The version of the index file format. Changing this invalidates all existing index files
+"""
+
+def findfiles(folder: str | Path, glob: str = "*.cs") -> list:
+    """
+    Finds all files in the folder, or sub-folders, matching the glob
+
+    Directories in prunedirs are skipped entirely. Entries are visited in sorted order, so the output is stable across runs and platforms
+
+    Args:
+        folder (str | Path): The folder to search
+        glob (str): The glob to match file names against. Default: "*.cs"
+
+    Returns:
+        list: A list of Path objects for the matching files
+    """
+    ret = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if d not in prunedirs)
+        for file in sorted(files):
+            if fnmatch.fnmatch(file, glob):
+                ret.append(Path(root, file))
+    return ret
+
+def testfolder(folder: str | Path, glob: str = "*.cs", workers: int | None = None, index: str | Path | None = None, changed: list | None = None) -> dict:
     """
     Tests if any files in the folder, or sub-folders, matching the glob contain an DocParser attribute and returns the results
 
+    Files are scanned concurrently on a thread pool. Only the I/O overlaps between threads: the system calls, and the hashing for the index, which also pages the file in, release the GIL. The prefilter and the regex hold the GIL, so the searches themselves run one at a time
+
+    If an index is provided, the results for each file are persisted to it along with the size, mtime, and SHA-256 of the file. On the next call, files
+    whose size and mtime are unchanged are not read at all, and files whose contents hash the same are not searched again.
+    The index is discarded if the folder, regex, prefilter, glob, or pruned directories have changed since it was written
+
+    If changed is also provided, the folder is not walked. Only the listed files are rescanned, and every other file is taken from the index.
+    If the index is empty or was discarded, a full scan is performed instead
+
     Args:
         folder (str | Path): The folder to check
-        glob (str): The glob to use for picking files to check. Default: ".cs"
+        glob (str): The glob to use for picking files to check. Default: "*.cs"
+        workers (int | None): The maximum number of threads to scan with. Default: None, which uses the ThreadPoolExecutor default
+        index (str | Path | None): The path to a JSON file to use as a persistent index. Created if it does not exist. Default: None
+        changed (list | None): A list of file paths, relative to folder, which have changed since the index was written; such as from `git diff --name-only`. Default: None
 
     Returns:
         dict: A dict of files where at least 1 DocParser attribute was found. The key is the file path relative to DocParserFinder.py, the value is the output of testfile(filePath)
     """
     ret = {}
     execpath = os.path.dirname(os.path.realpath(__file__))
-    for file in Path(folder).rglob(glob):
-        data = testfile(file)
-        if data is not None:
-            ret[str(file.absolute().relative_to(execpath, walk_up=True))] = data
+    folder = Path(folder)
+    entries = loadindex(index, folder, glob) if index is not None else {}
+    if changed is not None and len(entries) > 0:
+        keys = []
+        for name in changed:
+            key = Path(name).as_posix()
+            entries.pop(key, None)
+            if not any(part in prunedirs for part in Path(key).parts[:-1]) and fnmatch.fnmatch(Path(key).name, glob) and (folder / key).is_file():
+                keys.append(key)
+    else:
+        keys = [file.relative_to(folder).as_posix() for file in findfiles(folder, glob)]
+        entries = {key: entries.get(key) for key in keys}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for key, entry in zip(keys, executor.map(lambda key: testindexentry(folder / key, entries.get(key)), keys)):
+            entries[key] = entry
+    if index is not None:
+        saveindex(index, folder, glob, entries)
+    for key in sorted(entries, key=walkorder):
+        if entries[key]["matches"] is not None:
+            ret[str((folder / key).absolute().relative_to(execpath, walk_up=True))] = entries[key]["matches"]
     return ret
 
+def walkorder(key: str) -> tuple:
+    """
+    Returns a sort key which orders relative file paths the same way findfiles(folder, glob) visits them
+
+    Args:
+        key (str): A file path, relative to the folder being searched, using / as the separator
+
+    Returns:
+        tuple: The sort key
+    """
+    parts = key.split("/")
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+def indexfingerprint(folder: str | Path, glob: str) -> str:
+    """
+    Returns a fingerprint of everything that affects the results stored in an index, other than the contents of the files themselves
+
+    Args:
+        folder (str | Path): The folder being searched. Resolved, so the same folder has the same fingerprint regardless of how its path is written
+        glob (str): The glob used for picking files to check
+
+    Returns:
+        str: The fingerprint, as a hex string
+    """
+    return hashlib.sha256(json.dumps([indexversion, str(Path(folder).resolve()), docparserpattern.pattern.decode("utf8"), docparserprefilter.decode("utf8"), glob, sorted(prunedirs)]).encode("utf8")).hexdigest()
+
+def loadindex(path: str | Path, folder: str | Path, glob: str) -> dict:
+    """
+    Loads the entries from an index file
+
+    Args:
+        path (str | Path): The path to the index file
+        folder (str | Path): The folder being searched
+        glob (str): The glob used for picking files to check
+
+    Returns:
+        dict: The entries, keyed by the file path relative to the folder being searched. Empty if the file does not exist, can not be read, or was written with a different fingerprint
+    """
+    try:
+        with open(path, "r", encoding="utf8") as index_file:
+            data = json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("fingerprint") != indexfingerprint(folder, glob) or not isinstance(data.get("files"), dict):
+        return {}
+    return data["files"]
+
+def saveindex(path: str | Path, folder: str | Path, glob: str, entries: dict):
+    """
+    Atomically writes the entries to an index file
+
+    Args:
+        path (str | Path): The path to the index file
+        folder (str | Path): The folder being searched
+        glob (str): The glob used for picking files to check
+        entries (dict): The entries, as returned by loadindex(path, folder, glob)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writeAtomic(path, json.dumps({"fingerprint": indexfingerprint(folder, glob), "files": entries}).encode("utf8"))
+
+def testindexentry(filePath: str | Path, entry: dict | None) -> dict:
+    """
+    Tests if the file contains an DocParser attribute, reusing the previous result from an index when the file has not changed
+
+    Args:
+        filePath (str | Path): The file to check
+        entry (dict | None): The previous index entry for the file, if any
+
+    Returns:
+        dict: The new index entry for the file
+        {
+            "size": fileSize,
+            "mtime": fileModifiedTimeNs,
+            "sha256": fileHash,
+            "matches": testfile(filePath)
+        }
+    """
+    with open(filePath, "rb") as file:
+        stat = os.fstat(file.fileno())
+        if entry is not None and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime_ns:
+            return entry
+        if stat.st_size == 0:
+            digest = hashlib.sha256(b"").hexdigest()
+            matches = None
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest = hashlib.sha256(data).hexdigest()
+                if entry is not None and entry.get("sha256") == digest:
+                    matches = entry.get("matches")
+                else:
+                    matches = testbytes(data)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha256": digest,
+        "matches": matches
+    }
+
 def testfile(filePath: str | Path) -> list | None:
     """
     Tests if the file contains an DocParser attribute and returns the result
@@ -69,25 +238,154 @@ def testfile(filePath: str | Path) -> list | None:
         ...
     ]
     """
-    with open(filePath, "r", encoding="utf8", errors="ignore") as file:
-        lines = file.read()
-    m = docparserpattern.search(lines)
-    if m is None:
+    with open(filePath, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return testbytes(data)
+
+def testbytes(data: bytes | mmap.mmap) -> list | None:
+    """
+    Tests if the UTF-8 encoded data contains an DocParser attribute and returns the result
+
+    Args:
+        data (bytes | mmap.mmap): The data to check
+
+    Returns:
+        list | None: None if no matches are found; otherwise a list containing dicts as described in testfile(filePath)
+    """
+    if data.find(docparserprefilter) == -1:
         return None
     matches = []
-    while m is not None:
-        groups = m.groupdict()
+    for m in docparserpattern.finditer(data):
+        groups = {k: v.decode("utf8", errors="ignore") for k, v in m.groupdict().items()}
         groups["issue"] = int(groups["issue"])
         matches.append(groups)
-        m = docparserpattern.search(lines, m.end())
+    if len(matches) == 0:
+        return None
     return matches
 
+def jobkey(url: str, parser: str) -> str:
+    """
+    Returns the key which identifies a unique parse job
+
+    Args:
+        url (str): The URL of the page
+        parser (str): The name of the parser
+
+    Returns:
+        str: The job key
+    """
+    return parser + " " + url
+
+def loadmetrics(path: str | Path) -> dict:
+    """
+    Loads the durations of jobs from a previous run
+
+    The file should be a JSON object with a `jobs` key, where each key is a job key (see jobkey(url, parser)) and each value is a dict containing a `duration` key with the wall clock duration of the job, in seconds
+
+    Args:
+        path (str | Path): The path to the metrics file
+
+    Returns:
+        dict: A dict of job keys to durations, in seconds. Empty if the file does not exist or can not be read
+    """
+    try:
+        with open(path, "r", encoding="utf8") as metrics_file:
+            data = json.load(metrics_file)
+    except (OSError, ValueError):
+        return {}
+    ret = {}
+    if isinstance(data, dict) and isinstance(data.get("jobs"), dict):
+        for key, job in data["jobs"].items():
+            if isinstance(job, dict) and isinstance(job.get("duration"), (int, float)):
+                ret[key] = float(job["duration"])
+    return ret
+
+def plan(results: dict, metrics: dict | None = None) -> list:
+    """
+    Converts the output of testfolder(folder) into a list of unique parse jobs
+
+    Attributes are deduplicated by URL and parser, so each page is only fetched and parsed once no matter how many classes or friendly names reference it.
+    The jobs are ordered by estimated cost, longest first, so that parallel runners which pick jobs in order finish at roughly the same time.
+    Jobs without a previous duration are estimated at the mean of the known durations
+
+    Args:
+        results (dict): The output of testfolder(folder)
+        metrics (dict | None): A dict of job keys to durations from a previous run, as returned by loadmetrics(path). Default: None
+
+    Returns:
+        list: A list of dicts describing each job, as described below
+        [
+            {
+                "key": jobKey,
+                "url": "uri",
+                "parser": "parser",
+                "targets": [
+                    {
+                        "friendlyname": "friendlyName",
+                        "issue": issueId
+                    },
+                    ...
+                ],
+                "files": [
+                    filePath, // As in the keys of the output of testfolder(folder)
+                    ...
+                ],
+                "cost": estimatedDurationSeconds
+            },
+            ...
+        ]
+    """
+    if metrics is None:
+        metrics = {}
+    jobs = {}
+    for file, matches in results.items():
+        for match in matches:
+            key = jobkey(match["url"], match["parser"])
+            if key not in jobs:
+                jobs[key] = {
+                    "key": key,
+                    "url": match["url"],
+                    "parser": match["parser"],
+                    "targets": [],
+                    "files": [],
+                    "cost": None
+                }
+            target = {"friendlyname": match["friendlyname"], "issue": match["issue"]}
+            if target not in jobs[key]["targets"]:
+                jobs[key]["targets"].append(target)
+            if file not in jobs[key]["files"]:
+                jobs[key]["files"].append(file)
+    known = [metrics[key] for key in jobs if key in metrics]
+    default = sum(known) / len(known) if len(known) > 0 else 1.0
+    for key, job in jobs.items():
+        job["cost"] = metrics.get(key, default)
+    return sorted(jobs.values(), key=lambda job: (-job["cost"], job["key"]))
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Find DocParser attributes in a folder structure and return their parameters")
     parser.add_argument("--folder", action="store", help="The folder to search", required=True)
     parser.add_argument("--out", action="store", help="Output to the specified file instead of STDOUT")
+    parser.add_argument("--workers", action="store", type=int, help="The maximum number of threads to scan with")
+    parser.add_argument("--index", action="store", help="Persist results to the specified JSON file and only rescan files which have changed since the last run")
+    parser.add_argument("--changed", action="store", help="Only rescan the files listed in the specified file, one path per line relative to --folder (eg. from `git diff --name-only`), and take all other results from --index. Use - to read the list from STDIN")
+    parser.add_argument("--plan", action="store_true", help="Output a list of unique jobs, deduplicated by URL and parser and ordered longest first, instead of the attributes found in each file")
+    parser.add_argument("--metrics", action="store", help="Estimate the cost of each job in --plan from the durations recorded in the specified JSON file by a previous run")
     args = parser.parse_args()
-    ret = testfolder(args.folder)
+    if args.metrics != None and not args.plan:
+        parser.error("argument --metrics: requires argument --plan")
+    if args.changed != None and args.index == None:
+        parser.error("argument --changed: requires argument --index")
+    changed = None
+    if args.changed == "-":
+        changed = [line.strip() for line in sys.stdin if len(line.strip()) > 0]
+    elif args.changed != None:
+        with open(args.changed, "r", encoding="utf8") as changed_file:
+            changed = [line.strip() for line in changed_file if len(line.strip()) > 0]
+    ret = testfolder(args.folder, workers=args.workers, index=args.index, changed=changed)
+    if args.plan:
+        ret = plan(ret, loadmetrics(args.metrics) if args.metrics != None else None)
     if args.out == None:
         print(json.dumps(ret, indent=4))
     else:
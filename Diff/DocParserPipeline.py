@@ -0,0 +1,272 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Run the parse/diff jobs from a DocParserFinder plan as a pipeline, overlapping the fetches of all jobs with the parsing, diffing, and writing of the pages which have already arrived
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import sys
+import time
+
+import DocParserFinder
+from DocParserRunner import inputhash, loadparser, outputname
+from RunJournal import RunJournal
+
+from AtomicFile import writeAtomic
+from BaseParser import BaseParser
+from Fetcher import Fetcher
+from SnapshotCache import SnapshotCache
+
+workerparsers = {}
+"""
+The parsers loaded by parsejob in this process, by name
+"""
+
+def parsejob(name: str, html: str, targets: list, context: int | None = None, contextUnit: str = "chars", renames: bool = False, shards: bool = False, cache: SnapshotCache | None = None) -> list:
+    """
+    Parses a fetched page, and diffs it against the base file of each friendly name which has one. Runs in a worker process
+
+    The outputs are encoded here, so only bytes are sent back to the pipeline, and are identical to the files written by DocParserRunner.runjob
+
+    Args:
+        name (str): The name of the parser
+        html (str): The normalized page, as returned by Fetcher.fetch
+        targets (list): The base file name of each friendly name, as returned by DocParserRunner.outputname, and the path to its base file or sharded base folder in the cache, or None
+        context (int | None): The amount of unchanged text to keep around each change in string diffs (see BaseParser.trimContext). Default: None, which keeps all of the unchanged text
+        contextUnit (str): The unit of context. One of: chars, words. Default: chars
+        renames (bool): Report similar removed and added endpoints as renames, and TOC entries which changed category as moves. Default: False
+        shards (bool): Return the parsed data to be written as a folder of shards, named by the base file name without an extension (see BaseParser.writeShards). Default: False
+        cache (SnapshotCache | None): Lock a sharded base folder while it is read (see BaseParser.readSnapshot). Default: None
+
+    Returns:
+        list: The file name, contents, and whether the contents are written as a folder of shards, of each output, in the order DocParserRunner.runjob writes them
+
+    Raises:
+        ValueError: The parser does not exist
+    """
+    parser = workerparsers.get(name)
+    if parser is None:
+        parser = loadparser(name)
+        if parser is None:
+            raise ValueError("Parser " + name + " not found")
+        workerparsers[name] = parser
+    parser.context = context
+    parser.contextUnit = contextUnit
+    parser.renames = renames
+    parser.cache = cache
+    snapshot = json.dumps(parser.parse(html)).encode("utf8")
+    outputs = []
+    for target, lhs in targets:
+        outputs.append((target if shards else target + ".json", snapshot, shards))
+        if lhs is not None:
+            outputs.append((target + ".diff.json", json.dumps(parser.diffWithFileL(lhs, json.loads(snapshot))).encode("utf8"), False))
+    return outputs
+
+def writeoutputs(outdir: str | Path, outputs: list, cache: SnapshotCache | None = None) -> list:
+    """
+    Atomically writes the outputs of a job
+
+    Args:
+        outdir (str | Path): The folder to write the outputs to
+        outputs (list): The file name, contents, and whether the contents are written as a folder of shards, of each output, as returned by parsejob
+        cache (SnapshotCache | None): Write the outputs through this cache (see SnapshotCache.writeFile), and lock the folders of shards while they are written. Default: None
+
+    Returns:
+        list: The paths of the files which were written, including each shard
+    """
+    Path(outdir).mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, data, shards in outputs:
+        path = Path(outdir, name)
+        if shards:
+            paths.extend(BaseParser(cache=cache).writeShards(path, json.loads(data)))
+            continue
+        paths.append(path)
+        if cache is not None:
+            cache.writeFile(path, data)
+            continue
+        writeAtomic(path, data)
+    return paths
+
+async def pipeline(jobs: list, journal: RunJournal, cachedir: str | Path, outdir: str | Path, fetcher: Fetcher | None = None, context: int | None = None, contextUnit: str = "chars", renames: bool = False,
+                   connections: int = 4, workers: int | None = None, queueDepth: int = 2, shards: bool = False, cache: SnapshotCache | None = None) -> int:
+    """
+    Runs a batch of jobs as a pipeline of fetch, parse and diff, and write stages connected by bounded queues, recording the status of each in the journal
+
+    Up to connections pages are fetched at once in threads. A fetch keeps its slot until its page is accepted by the parse queue, so when parsing falls behind, fetching pauses instead of buffering pages.
+    Parsing and diffing run in a pool of worker processes, and a single writer writes the outputs and updates the journal, so at most connections + workers + 2 * queueDepth pages or results are held at once.
+    Jobs are skipped and failures are recorded in the same way as DocParserRunner.run
+
+    Args:
+        jobs (list): The output of DocParserFinder.plan(results)
+        journal (RunJournal): The journal
+        cachedir (str | Path): The folder containing the base files from the previous run
+        outdir (str | Path): The folder to write the outputs to
+        fetcher (Fetcher | None): The Fetcher shared by all jobs. Default: None, which creates a Fetcher with the default settings
+        context (int | None): The amount of unchanged text to keep around each change in string diffs (see BaseParser.trimContext). Default: None, which keeps all of the unchanged text
+        contextUnit (str): The unit of context. One of: chars, words. Default: chars
+        renames (bool): Report similar removed and added endpoints as renames, and TOC entries which changed category as moves. Default: False
+        connections (int): The maximum number of pages fetched at once. Default: 4
+        workers (int | None): The number of worker processes which parse and diff. Default: None, which uses the number of CPUs
+        queueDepth (int): The maximum number of pages waiting to be parsed, and of results waiting to be written. Default: 2
+        shards (bool): Write the parsed data as folders of shards, and diff against sharded base files, as DocParserRunner.runjob does. Default: False
+        cache (SnapshotCache | None): Write the outputs through this cache, and lock the folders of shards while they are written or read (see writeoutputs). Default: None
+
+    Returns:
+        int: The number of jobs which failed
+    """
+    if fetcher is None:
+        fetcher = Fetcher()
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    loop = asyncio.get_running_loop()
+    journalLock = asyncio.Lock()
+    slots = asyncio.Semaphore(connections)
+    pages = asyncio.Queue(maxsize=queueDepth)
+    results = asyncio.Queue(maxsize=queueDepth)
+    failed = 0
+
+    async def record(key: str, status: str, ihash: str, **kwargs):
+        async with journalLock:
+            await asyncio.to_thread(journal.update, key, status, ihash, **kwargs)
+
+    async def fail(job: dict, ihash: str, start: float, e: Exception):
+        nonlocal failed
+        failed += 1
+        print("Failed " + job["key"] + ": " + str(e), file=sys.stderr)
+        await record(job["key"], "failed", ihash, error=type(e).__name__ + ": " + str(e), duration=time.monotonic() - start)
+
+    async def fetch(job: dict, fetchers: ThreadPoolExecutor):
+        ihash = inputhash(job, cachedir)
+        if journal.isComplete(job["key"], ihash):
+            print("Skipping " + job["key"] + ", already complete", file=sys.stderr)
+            return
+        parser = loadparser(job["parser"], fetcher)
+        if parser is None:
+            print("Skipping " + job["key"] + ", parser not found", file=sys.stderr)
+            await record(job["key"], "skipped", ihash, error="Parser " + job["parser"] + " not found")
+            return
+        async with slots:
+            print("Running " + job["key"], file=sys.stderr)
+            await record(job["key"], "running", ihash)
+            start = time.monotonic()
+            try:
+                html = await loop.run_in_executor(fetchers, fetcher.fetch, job["url"], parser.normalize)
+            except Exception as e:
+                await fail(job, ihash, start, e)
+                return
+            await pages.put((job, ihash, start, html))
+
+    async def parse(processes: ProcessPoolExecutor):
+        while True:
+            item = await pages.get()
+            if item is None:
+                return
+            job, ihash, start, html = item
+            del item
+            targets = []
+            for target in job["targets"]:
+                name = outputname(target["friendlyname"])
+                lhs = Path(cachedir, name + ".json")
+                if shards and Path(cachedir, name, BaseParser.manifestName).is_file():
+                    lhs = Path(cachedir, name)
+                targets.append((name, str(lhs) if lhs.exists() else None))
+            try:
+                outputs = await loop.run_in_executor(processes, parsejob, job["parser"], html, targets, context, contextUnit, renames, shards, cache)
+            except Exception as e:
+                await fail(job, ihash, start, e)
+                continue
+            del html
+            await results.put((job, ihash, start, outputs))
+
+    async def write():
+        while True:
+            item = await results.get()
+            if item is None:
+                return
+            job, ihash, start, outputs = item
+            del item
+            try:
+                paths = await asyncio.to_thread(writeoutputs, outdir, outputs, cache)
+            except Exception as e:
+                await fail(job, ihash, start, e)
+                continue
+            await record(job["key"], "done", ihash, outputs=paths, duration=time.monotonic() - start)
+
+    with ThreadPoolExecutor(max_workers=connections) as fetchers, ProcessPoolExecutor(max_workers=workers) as processes:
+        writer = asyncio.create_task(write())
+        parsers = [asyncio.create_task(parse(processes)) for _ in range(workers)]
+        await asyncio.gather(*[fetch(job, fetchers) for job in jobs])
+        for _ in parsers:
+            await pages.put(None)
+        await asyncio.gather(*parsers)
+        await results.put(None)
+        await writer
+    return failed
+
+def run(jobs: list, journal: RunJournal, cachedir: str | Path, outdir: str | Path, fetcher: Fetcher | None = None, context: int | None = None, contextUnit: str = "chars", renames: bool = False,
+        connections: int = 4, workers: int | None = None, queueDepth: int = 2, shards: bool = False, cache: SnapshotCache | None = None) -> int:
+    """
+    Runs pipeline in a new event loop. The arguments are the same as pipeline
+
+    Returns:
+        int: The number of jobs which failed
+    """
+    return asyncio.run(pipeline(jobs, journal, cachedir, outdir, fetcher, context, contextUnit, renames, connections, workers, queueDepth, shards, cache))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the parse/diff jobs from a DocParserFinder plan as a pipeline, fetching concurrently while pages which have arrived are parsed")
+    pigroup = parser.add_mutually_exclusive_group(required=True)
+    pigroup.add_argument("--plan", action="store", help="Load the jobs from a JSON file created by DocParserFinder --plan")
+    pigroup.add_argument("--folder", action="store", help="Find the jobs by running DocParserFinder on the specified folder")
+    parser.add_argument("--cache", action="store", default="./.cache", help="The folder containing the base files from the previous run. Default: ./.cache")
+    parser.add_argument("--out", action="store", default="./.output", help="The folder to write the parsed data and diffs to. Default: ./.output")
+    parser.add_argument("--journal", action="store", help="The journal file. Default: journal.json in --out")
+    parser.add_argument("--resume", action="store_true", help="Resume from an existing journal, only running jobs which failed, did not finish, or whose inputs or outputs have changed")
+    parser.add_argument("--connections", action="store", type=int, default=4, help="The maximum number of pages to fetch at once. Default: 4")
+    parser.add_argument("--workers", action="store", type=int, help="The number of worker processes which parse and diff. Default: the number of CPUs")
+    parser.add_argument("--queue", action="store", type=int, default=2, help="The maximum number of pages waiting to be parsed, and of results waiting to be written. Default: 2")
+    parser.add_argument("--connecttimeout", action="store", type=float, default=10.0, help="The maximum number of seconds to wait for a connection. Default: 10")
+    parser.add_argument("--readtimeout", action="store", type=float, default=30.0, help="The maximum number of seconds to wait between bytes from the server. Default: 30")
+    parser.add_argument("--retries", action="store", type=int, default=3, help="The maximum number of times to retry a timeout, connection error, HTTP 429, or HTTP 5xx. Default: 3")
+    parser.add_argument("--deadline", action="store", type=float, help="The maximum number of seconds to spend fetching across the whole batch. Jobs which have not been fetched by then fail, and can be run later with --resume")
+    parser.add_argument("--hedge", action="store", type=float, help="Start a second request if the first has not completed after the specified percentile, from 0 to 100, of the latencies observed so far in the batch")
+    parser.add_argument("--hedgeafter", action="store", type=float, help="With --hedge, start a second request after the specified number of seconds until enough latencies have been observed. Without --hedge, always use this delay")
+    parser.add_argument("--context", action="store", type=int, help="Trim the unchanged text in string diffs to the specified number of characters or words around each change")
+    parser.add_argument("--contextunit", action="store", choices=["chars", "words"], default="chars", help="The unit of --context. Default: chars")
+    parser.add_argument("--renames", action="store_true", help="Report similar removed and added endpoints as renames, and TOC entries which changed category as moves")
+    parser.add_argument("--shards", action="store_true", help="Write the parsed data as a folder of per-endpoint shards and a manifest for each friendly name, so unchanged endpoints are not rewritten. Sharded base files in --cache are diffed against")
+    parser.add_argument("--snapshotcache", action="store", help="Write the outputs through a cache folder which concurrent runs may share. Each file is atomically replaced while holding an advisory lock on its path")
+    args = parser.parse_args()
+    if args.connections < 1 or args.queue < 1 or (args.workers is not None and args.workers < 1):
+        parser.error("arguments --connections, --workers, and --queue must be at least 1")
+    if args.plan != None:
+        with open(args.plan, "r", encoding="utf8") as plan_file:
+            jobs = json.load(plan_file)
+    else:
+        jobs = DocParserFinder.plan(DocParserFinder.testfolder(args.folder))
+    journal = RunJournal(args.journal if args.journal != None else Path(args.out, "journal.json"), args.resume)
+    fetcher = Fetcher(connectTimeout=args.connecttimeout, readTimeout=args.readtimeout, retries=args.retries, deadline=args.deadline, hedgePercentile=args.hedge, hedgeAfter=args.hedgeafter)
+    if run(jobs, journal, args.cache, args.out, fetcher, args.context, args.contextunit, args.renames, args.connections, args.workers, args.queue, args.shards, SnapshotCache(args.snapshotcache) if args.snapshotcache != None else None) > 0:
+        sys.exit(1)
@@ -0,0 +1,224 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Run the parse/diff jobs from a DocParserFinder plan as a single batch, with a journal that allows an interrupted or partially failed batch to be resumed
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+from pathlib import Path
+import re
+import sys
+import time
+import urllib.parse
+
+import DocParserFinder
+from RunJournal import hashfile, RunJournal
+
+parsersdir = Path(os.path.dirname(os.path.realpath(__file__)), "parsers")
+sys.path.insert(0, str(parsersdir))
+
+from BaseParser import BaseParser
+from Fetcher import Fetcher
+from SnapshotCache import SnapshotCache
+
+parsernamepattern = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def outputname(friendlyname: str) -> str:
+    """
+    Returns the base file name used for the outputs of a friendly name
+
+    This matches encodeURIComponent in the update-issues workflow, so the outputs line up with the files in the cache
+
+    Args:
+        friendlyname (str): The friendly name from the DocParser attribute
+
+    Returns:
+        str: The base file name, without an extension
+    """
+    return urllib.parse.quote(friendlyname, safe="!~*'()")
+
+def loadparser(name: str, fetcher: Fetcher | None = None) -> BaseParser | None:
+    """
+    Loads a parser from the parsers folder
+
+    Args:
+        name (str): The name of the parser. The module and class must both have this name
+        fetcher (Fetcher | None): The Fetcher for the parser to use. Default: None
+
+    Returns:
+        BaseParser | None: An instance of the parser; None if the parser does not exist
+    """
+    if parsernamepattern.match(name) is None or not (parsersdir / (name + ".py")).is_file():
+        return None
+    return getattr(importlib.import_module(name), name)(fetcher)
+
+def inputhash(job: dict, cachedir: str | Path) -> str:
+    """
+    Returns a hash of everything a job reads, other than the fetched page
+
+    This covers the job definition, the source of every module in the parsers folder, and the cached base files which will be diffed against.
+    Every module is covered, rather than only the parser and BaseParser, since a parser may import any of the others
+    For sharded base files (see BaseParser.writeShards), the manifest covers the hash of every shard
+
+    Args:
+        job (dict): A job from DocParserFinder.plan(results)
+        cachedir (str | Path): The folder containing the base files from the previous run
+
+    Returns:
+        str: The hash, as a hex string
+    """
+    inputs = [
+        job["key"],
+        job["targets"],
+        job["parser"],
+        [[module.name, hashfile(module)] for module in sorted(parsersdir.glob("*.py"))],
+        [hashfile(Path(cachedir, outputname(target["friendlyname"]) + ".json")) for target in job["targets"]]
+    ]
+    manifests = [hashfile(Path(cachedir, outputname(target["friendlyname"]), BaseParser.manifestName)) for target in job["targets"]]
+    if any(manifest is not None for manifest in manifests):
+        inputs.append(manifests)
+    return hashlib.sha256(json.dumps(inputs).encode("utf8")).hexdigest()
+
+def runjob(job: dict, parser: BaseParser, cachedir: str | Path, outdir: str | Path, shards: bool = False) -> list:
+    """
+    Parses the page for a job, then writes the parsed data and, if a base file is present in the cache, the diff for each of the friendly names of the job
+
+    Args:
+        job (dict): A job from DocParserFinder.plan(results)
+        parser (BaseParser): The parser to use
+        cachedir (str | Path): The folder containing the base files from the previous run
+        outdir (str | Path): The folder to write the outputs to
+        shards (bool): Write the parsed data as a folder of shards instead of a single file (see BaseParser.writeShards), and diff it against a sharded base file by reading only the shards which changed. Default: False
+
+    Returns:
+        list: The paths of the files which were written, including each shard
+    """
+    outputs = []
+    retp = parser.parseFromUrl(job["url"])
+    Path(outdir).mkdir(parents=True, exist_ok=True)
+    for target in job["targets"]:
+        name = outputname(target["friendlyname"])
+        if shards:
+            out = Path(outdir, name)
+            outputs.extend(parser.writeShards(out, retp))
+            lhs = Path(cachedir, name)
+            if parser.isShards(lhs):
+                retd = parser.diff(*parser.readChangedShards(lhs, out))
+                diffout = Path(outdir, name + ".diff.json")
+                parser.writeSnapshot(diffout, retd)
+                outputs.append(diffout)
+                continue
+        else:
+            out = Path(outdir, name + ".json")
+            parser.writeSnapshot(out, retp)
+            outputs.append(out)
+        lhs = Path(cachedir, name + ".json")
+        if lhs.is_file():
+            retd = parser.diffWithFileL(lhs, parser.readSnapshot(out))
+            diffout = Path(outdir, name + ".diff.json")
+            parser.writeSnapshot(diffout, retd)
+            outputs.append(diffout)
+    return outputs
+
+def run(jobs: list, journal: RunJournal, cachedir: str | Path, outdir: str | Path, fetcher: Fetcher | None = None, context: int | None = None, contextUnit: str = "chars", renames: bool = False, shards: bool = False, cache: SnapshotCache | None = None) -> int:
+    """
+    Runs a batch of jobs, recording the status of each in the journal
+
+    Jobs which the journal indicates are already complete with the same inputs are skipped. A job which fails is recorded and the batch continues with the next job
+
+    Args:
+        jobs (list): The output of DocParserFinder.plan(results)
+        journal (RunJournal): The journal
+        cachedir (str | Path): The folder containing the base files from the previous run
+        outdir (str | Path): The folder to write the outputs to
+        fetcher (Fetcher | None): The Fetcher shared by all jobs. Default: None, which creates a Fetcher with the default settings
+        context (int | None): The amount of unchanged text to keep around each change in string diffs (see BaseParser.trimContext). Default: None, which keeps all of the unchanged text
+        contextUnit (str): The unit of context. One of: chars, words. Default: chars
+        renames (bool): Report similar removed and added endpoints as renames, and TOC entries which changed category as moves. Default: False
+        shards (bool): Write the parsed data as folders of shards (see runjob). Default: False
+        cache (SnapshotCache | None): Write the outputs through this cache, and lock the folders of shards while they are written or read (see BaseParser.writeSnapshot). Default: None
+
+    Returns:
+        int: The number of jobs which failed
+    """
+    if fetcher is None:
+        fetcher = Fetcher()
+    failed = 0
+    for job in jobs:
+        ihash = inputhash(job, cachedir)
+        if journal.isComplete(job["key"], ihash):
+            print("Skipping " + job["key"] + ", already complete", file=sys.stderr)
+            continue
+        parser = loadparser(job["parser"], fetcher)
+        if parser is None:
+            print("Skipping " + job["key"] + ", parser not found", file=sys.stderr)
+            journal.update(job["key"], "skipped", ihash, error="Parser " + job["parser"] + " not found")
+            continue
+        parser.context = context
+        parser.contextUnit = contextUnit
+        parser.renames = renames
+        parser.cache = cache
+        print("Running " + job["key"], file=sys.stderr)
+        journal.update(job["key"], "running", ihash)
+        start = time.monotonic()
+        try:
+            outputs = runjob(job, parser, cachedir, outdir, shards)
+        except Exception as e:
+            failed += 1
+            print("Failed " + job["key"] + ": " + str(e), file=sys.stderr)
+            journal.update(job["key"], "failed", ihash, error=type(e).__name__ + ": " + str(e), duration=time.monotonic() - start)
+            continue
+        journal.update(job["key"], "done", ihash, outputs=outputs, duration=time.monotonic() - start)
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the parse/diff jobs from a DocParserFinder plan as a single batch")
+    pigroup = parser.add_mutually_exclusive_group(required=True)
+    pigroup.add_argument("--plan", action="store", help="Load the jobs from a JSON file created by DocParserFinder --plan")
+    pigroup.add_argument("--folder", action="store", help="Find the jobs by running DocParserFinder on the specified folder")
+    parser.add_argument("--cache", action="store", default="./.cache", help="The folder containing the base files from the previous run. Default: ./.cache")
+    parser.add_argument("--out", action="store", default="./.output", help="The folder to write the parsed data and diffs to. Default: ./.output")
+    parser.add_argument("--journal", action="store", help="The journal file. Default: journal.json in --out")
+    parser.add_argument("--resume", action="store_true", help="Resume from an existing journal, only running jobs which failed, did not finish, or whose inputs or outputs have changed")
+    parser.add_argument("--connecttimeout", action="store", type=float, default=10.0, help="The maximum number of seconds to wait for a connection. Default: 10")
+    parser.add_argument("--readtimeout", action="store", type=float, default=30.0, help="The maximum number of seconds to wait between bytes from the server. Default: 30")
+    parser.add_argument("--retries", action="store", type=int, default=3, help="The maximum number of times to retry a timeout, connection error, HTTP 429, or HTTP 5xx. Default: 3")
+    parser.add_argument("--deadline", action="store", type=float, help="The maximum number of seconds to spend fetching across the whole batch. Jobs which have not been fetched by then fail, and can be run later with --resume")
+    parser.add_argument("--hedge", action="store", type=float, help="Start a second request if the first has not completed after the specified percentile, from 0 to 100, of the latencies observed so far in the batch")
+    parser.add_argument("--hedgeafter", action="store", type=float, help="With --hedge, start a second request after the specified number of seconds until enough latencies have been observed. Without --hedge, always use this delay")
+    parser.add_argument("--context", action="store", type=int, help="Trim the unchanged text in string diffs to the specified number of characters or words around each change")
+    parser.add_argument("--contextunit", action="store", choices=["chars", "words"], default="chars", help="The unit of --context. Default: chars")
+    parser.add_argument("--renames", action="store_true", help="Report similar removed and added endpoints as renames, and TOC entries which changed category as moves")
+    parser.add_argument("--shards", action="store_true", help="Write the parsed data as a folder of per-endpoint shards and a manifest for each friendly name, so unchanged endpoints are not rewritten and diffs against sharded base files only read the shards which changed")
+    parser.add_argument("--snapshotcache", action="store", help="Write the outputs through a cache folder which concurrent runs may share. Each file is atomically replaced while holding an advisory lock on its path")
+    args = parser.parse_args()
+    if args.plan != None:
+        with open(args.plan, "r", encoding="utf8") as plan_file:
+            jobs = json.load(plan_file)
+    else:
+        jobs = DocParserFinder.plan(DocParserFinder.testfolder(args.folder))
+    journal = RunJournal(args.journal if args.journal != None else Path(args.out, "journal.json"), args.resume)
+    fetcher = Fetcher(connectTimeout=args.connecttimeout, readTimeout=args.readtimeout, retries=args.retries, deadline=args.deadline, hedgePercentile=args.hedge, hedgeAfter=args.hedgeafter)
+    if run(jobs, journal, args.cache, args.out, fetcher, args.context, args.contextunit, args.renames, args.shards, SnapshotCache(args.snapshotcache) if args.snapshotcache != None else None) > 0:
+        sys.exit(1)
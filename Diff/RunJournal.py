@@ -0,0 +1,141 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Record the status of each job in a batch of parse/diff jobs, so that an interrupted or partially failed batch can be resumed
+"""
+
+from datetime import datetime, UTC
+import hashlib
+import json
+from parsers.AtomicFile import writeAtomic
+from pathlib import Path
+
+def hashfile(path: str | Path) -> str | None:
+    """
+    Returns the SHA-256 of a file
+
+    Args:
+        path (str | Path): The file to hash
+
+    Returns:
+        str | None: The hash, as a hex string; None if the file does not exist
+    """
+    try:
+        with open(path, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+class RunJournal:
+    """
+    A journal of the status of each job in a batch run
+
+    The journal is rewritten atomically after every update, so it always reflects the last job which started or finished, even if the process is killed.
+    It is a JSON file in the format below, which is also accepted by DocParserFinder.loadmetrics(path)
+    {
+        "version": 1,
+        "jobs": {
+            jobKey: {
+                "status": status, // running, done, failed, or skipped
+                "inputHash": inputHash, // Hash of everything the job reads, other than the fetched page
+                "outputs": {
+                    outputPath: outputHash, // SHA-256 of each file written by the job
+                    ...
+                },
+                "error": error, // The error message, if failed or skipped
+                "duration": duration, // Wall clock duration of the job, in seconds
+                "updated": timestamp // ISO 8601 timestamp of the last update
+            },
+            ...
+        }
+    }
+    """
+    version = 1
+    """
+    The version of the journal file format. Journals written with a different version are discarded when resuming
+    """
+    def __init__(self, path:str | Path, resume:bool = False):
+        """
+        Args:
+            path (str | Path): The path to the journal file
+            resume (bool): If True, load the existing journal so that completed jobs can be skipped; otherwise, start a new journal
+        """
+        self.path = Path(path)
+        self.jobs = {}
+        if resume:
+            self.load()
+
+    def load(self):
+        """
+        Load the journal from disk, replacing any jobs in memory. Missing, unreadable, or incompatible journals are treated as empty
+        """
+        self.jobs = {}
+        try:
+            with open(self.path, "r", encoding="utf8") as journal_file:
+                data = json.load(journal_file)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == self.version and isinstance(data.get("jobs"), dict):
+            self.jobs = data["jobs"]
+
+    def save(self):
+        """
+        Atomically write the journal to disk
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        writeAtomic(self.path, json.dumps({"version": self.version, "jobs": self.jobs}, indent=4).encode("utf8"), True)
+
+    def isComplete(self, key:str, inputHash:str) -> bool:
+        """
+        Indicates if a job completed successfully with the same inputs, and all of its outputs are still present and unmodified
+
+        Args:
+            key (str): The job key
+            inputHash (str): The hash of the current inputs of the job
+
+        Returns:
+            bool: True if the job does not need to be run again
+        """
+        job = self.jobs.get(key)
+        if job is None or job.get("status") != "done" or job.get("inputHash") != inputHash:
+            return False
+        return all(hashfile(path) == outputHash for path, outputHash in job.get("outputs", {}).items())
+
+    def update(self, key:str, status:str, inputHash:str, outputs:list | None = None, error:str | None = None, duration:float | None = None):
+        """
+        Record the status of a job and save the journal
+
+        Args:
+            key (str): The job key
+            status (str): The new status. One of: running, done, failed, skipped
+            inputHash (str): The hash of the inputs of the job
+            outputs (list | None): The paths of the files written by the job. Default: None
+            error (str | None): The error message, if failed or skipped. Default: None
+            duration (float | None): The wall clock duration of the job, in seconds. Default: None
+        """
+        self.jobs[key] = {
+            "status": status,
+            "inputHash": inputHash,
+            "outputs": {str(path): hashfile(path) for path in outputs} if outputs is not None else {},
+            "error": error,
+            "duration": duration,
+            "updated": datetime.now(UTC).isoformat()
+        }
+        self.save()
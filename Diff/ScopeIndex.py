@@ -0,0 +1,356 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Build and query a persistent index joining Twitch scopes to the API endpoints and EventSub topics which use them
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import re
+import sys
+
+sys.path.insert(0, str(Path(os.path.dirname(os.path.realpath(__file__)), "parsers")))
+
+from AtomicFile import writeAtomic
+from BaseParser import BaseParser
+
+scopepattern = re.compile(r"(?<![A-Za-z0-9_:])[a-z][a-z0-9_]*(?::[a-z0-9_]+)+(?![A-Za-z0-9_:])")
+"""
+Matches a scope name, such as channel:read:subscriptions, in free text
+"""
+
+class ScopeIndex:
+    """
+    A persistent set of inverted indexes joining the output of TwitchScopesParser and TwitchReferenceParser
+
+    The index is built from two sources:
+    - scopes: For each scope, the `api` and `eventsub` lists from the output of TwitchScopesParser
+    - reference: For each endpoint, the scope names mentioned in `authorization` in the output of TwitchReferenceParser
+
+    From these, it maintains scope -> endpoints/topics, endpoint -> scopes, and topic -> scopes. An endpoint is joined to a scope if either source joins them.
+    Each source entry can be replaced individually, and only the index entries it touches are updated, so applying a diff costs time proportional to the size of the diff
+    """
+    version = 1
+    """
+    The version of the index file format. Index files written with a different version are discarded
+    """
+    def __init__(self):
+        self.scopeSources = {}
+        self.referenceSources = {}
+        self.scopes = {}
+        self.endpoints = {}
+        self.topics = {}
+
+    def load(self, path:str | Path) -> bool:
+        """
+        Load the index from a file, replacing the index in memory
+
+        Args:
+            path (str | Path): The path to the index file
+
+        Returns:
+            bool: True if the file was loaded; False if it does not exist, could not be read, or is from a different version, in which case the index is empty
+        """
+        self.__init__()
+        try:
+            with open(path, "r", encoding="utf8") as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            return False
+        for scope, entry in data["sources"]["scopes"].items():
+            self.setScope(scope, entry)
+        for endpoint, mentions in data["sources"]["reference"].items():
+            self.setMentions(endpoint, mentions)
+        return True
+
+    def save(self, path:str | Path):
+        """
+        Atomically write the index to a file
+
+        The sources are stored along with the inverted indexes, so the index can be updated incrementally after it is loaded again
+
+        Args:
+            path (str | Path): The path to the index file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writeAtomic(path, json.dumps({
+            "version": self.version,
+            "sources": {
+                "scopes": self.scopeSources,
+                "reference": self.referenceSources
+            },
+            "scopes": {scope: {"endpoints": sorted(entry["endpoints"]), "topics": sorted(entry["topics"])} for scope, entry in sorted(self.scopes.items())},
+            "endpoints": {endpoint: sorted(scopes) for endpoint, scopes in sorted(self.endpoints.items())},
+            "topics": {topic: sorted(scopes) for topic, scopes in sorted(self.topics.items())}
+        }).encode("utf8"))
+
+    def link(self, scope:str, endpoint:str | None = None, topic:str | None = None):
+        """
+        Join a scope to an endpoint or topic in the inverted indexes
+
+        Args:
+            scope (str): The scope
+            endpoint (str | None): The endpoint. Default: None
+            topic (str | None): The topic. Default: None
+        """
+        entry = self.scopes.setdefault(scope, {"endpoints": set(), "topics": set()})
+        if endpoint is not None:
+            entry["endpoints"].add(endpoint)
+            self.endpoints.setdefault(endpoint, set()).add(scope)
+        if topic is not None:
+            entry["topics"].add(topic)
+            self.topics.setdefault(topic, set()).add(scope)
+
+    def unlink(self, scope:str, endpoint:str | None = None, topic:str | None = None):
+        """
+        Remove the join between a scope and an endpoint or topic from the inverted indexes, unless another source still joins them
+
+        Args:
+            scope (str): The scope
+            endpoint (str | None): The endpoint. Default: None
+            topic (str | None): The topic. Default: None
+        """
+        if endpoint is not None:
+            if endpoint in self.scopeSources.get(scope, {}).get("api", []) or scope in self.referenceSources.get(endpoint, []):
+                return
+            if scope in self.scopes:
+                self.scopes[scope]["endpoints"].discard(endpoint)
+            if endpoint in self.endpoints:
+                self.endpoints[endpoint].discard(scope)
+                if len(self.endpoints[endpoint]) == 0:
+                    del self.endpoints[endpoint]
+        if topic is not None:
+            if topic in self.scopeSources.get(scope, {}).get("eventsub", []):
+                return
+            if scope in self.scopes:
+                self.scopes[scope]["topics"].discard(topic)
+            if topic in self.topics:
+                self.topics[topic].discard(scope)
+                if len(self.topics[topic]) == 0:
+                    del self.topics[topic]
+        if scope in self.scopes and scope not in self.scopeSources and len(self.scopes[scope]["endpoints"]) == 0 and len(self.scopes[scope]["topics"]) == 0:
+            del self.scopes[scope]
+
+    def setScope(self, scope:str, entry:dict | None):
+        """
+        Replace the source data for a scope
+
+        Args:
+            scope (str): The scope
+            entry (dict | None): The entry for the scope from the `endpoints` dict in the output of TwitchScopesParser; None if the scope was removed
+        """
+        old = self.scopeSources.pop(scope, None)
+        if old is not None:
+            for endpoint in old["api"]:
+                self.unlink(scope, endpoint=endpoint)
+            for topic in old["eventsub"]:
+                self.unlink(scope, topic=topic)
+            if scope in self.scopes and len(self.scopes[scope]["endpoints"]) == 0 and len(self.scopes[scope]["topics"]) == 0:
+                del self.scopes[scope]
+        if entry is not None:
+            self.scopeSources[scope] = {"api": list(entry.get("api") or []), "eventsub": list(entry.get("eventsub") or [])}
+            self.scopes.setdefault(scope, {"endpoints": set(), "topics": set()})
+            for endpoint in self.scopeSources[scope]["api"]:
+                self.link(scope, endpoint=endpoint)
+            for topic in self.scopeSources[scope]["eventsub"]:
+                self.link(scope, topic=topic)
+
+    def setReference(self, endpoint:str, entry:dict | None):
+        """
+        Replace the source data for an endpoint
+
+        Args:
+            endpoint (str): The endpoint
+            entry (dict | None): The entry for the endpoint from the `endpoints` dict in the output of TwitchReferenceParser; None if the endpoint was removed
+        """
+        self.setMentions(endpoint, list(dict.fromkeys(scopepattern.findall(entry.get("authorization") or ""))) if entry is not None else [])
+
+    def setMentions(self, endpoint:str, mentions:list):
+        """
+        Replace the scopes mentioned by the authorization of an endpoint
+
+        Args:
+            endpoint (str): The endpoint
+            mentions (list): The scopes mentioned
+        """
+        old = self.referenceSources.pop(endpoint, None)
+        if old is not None:
+            for scope in old:
+                self.unlink(scope, endpoint=endpoint)
+        if len(mentions) > 0:
+            self.referenceSources[endpoint] = mentions
+            for scope in mentions:
+                self.link(scope, endpoint=endpoint)
+
+    def buildFromScopes(self, snapshot:dict):
+        """
+        Replace all scope source data with the output of TwitchScopesParser
+
+        Args:
+            snapshot (dict): The output of TwitchScopesParser
+        """
+        for scope in list(self.scopeSources):
+            if scope not in snapshot["endpoints"]:
+                self.setScope(scope, None)
+        for scope, entry in snapshot["endpoints"].items():
+            self.setScope(scope, entry)
+
+    def buildFromReference(self, snapshot:dict):
+        """
+        Replace all endpoint source data with the output of TwitchReferenceParser
+
+        Args:
+            snapshot (dict): The output of TwitchReferenceParser
+        """
+        for endpoint in list(self.referenceSources):
+            if endpoint not in snapshot["endpoints"]:
+                self.setReference(endpoint, None)
+        for endpoint, entry in snapshot["endpoints"].items():
+            self.setReference(endpoint, entry)
+
+    def changedKeys(self, diff:dict) -> list:
+        """
+        Returns the keys of the endpoints which appear in a diff, including the previous key of a renamed endpoint
+
+        Args:
+            diff (dict): The output of BaseParser.diff(dict, dict)
+
+        Returns:
+            list: The keys
+        """
+        ret = []
+        for k, v in diff.get("endpoints", {}).items():
+            if v.get("_operation") == "rename":
+                ret.append(v["from"])
+            ret.append(k)
+        return ret
+
+    def updateFromScopes(self, diff:dict, snapshot:dict) -> list:
+        """
+        Update the scope source data for only the scopes which appear in a diff
+
+        Args:
+            diff (dict): The output of TwitchScopesParser.diff(dict, dict)
+            snapshot (dict): The RHS of the diff
+
+        Returns:
+            list: The scopes which were updated
+        """
+        scopes = self.changedKeys(diff)
+        for scope in scopes:
+            self.setScope(scope, snapshot["endpoints"].get(scope))
+        return scopes
+
+    def updateFromReference(self, diff:dict, snapshot:dict) -> list:
+        """
+        Update the endpoint source data for only the endpoints which appear in a diff
+
+        Args:
+            diff (dict): The output of TwitchReferenceParser.diff(dict, dict)
+            snapshot (dict): The RHS of the diff
+
+        Returns:
+            list: The endpoints which were updated
+        """
+        endpoints = self.changedKeys(diff)
+        for endpoint in endpoints:
+            self.setReference(endpoint, snapshot["endpoints"].get(endpoint))
+        return endpoints
+
+    def queryScope(self, scope:str) -> dict:
+        """
+        Returns the endpoints and topics joined to a scope
+
+        Args:
+            scope (str): The scope
+
+        Returns:
+            dict: A dict with `endpoints` and `topics` keys, each containing a sorted list
+        """
+        entry = self.scopes.get(scope, {"endpoints": set(), "topics": set()})
+        return {"endpoints": sorted(entry["endpoints"]), "topics": sorted(entry["topics"])}
+
+    def queryEndpoint(self, endpoint:str) -> list:
+        """
+        Returns the scopes joined to an endpoint
+
+        Args:
+            endpoint (str): The endpoint
+
+        Returns:
+            list: A sorted list of scopes
+        """
+        return sorted(self.endpoints.get(endpoint, set()))
+
+    def queryTopic(self, topic:str) -> list:
+        """
+        Returns the scopes joined to an EventSub topic
+
+        Args:
+            topic (str): The topic
+
+        Returns:
+            list: A sorted list of scopes
+        """
+        return sorted(self.topics.get(topic, set()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query a persistent index joining Twitch scopes to the API endpoints and EventSub topics which use them")
+    parser.add_argument("--index", action="store", help="The index file. Created if it does not exist", required=True)
+    bgroup = parser.add_argument_group("Build", "Update the index from parser output. Without the matching diff argument, the source is rebuilt from the whole snapshot")
+    bgroup.add_argument("--scopes", action="store", help="Load a JSON file created by TwitchScopesParser")
+    bgroup.add_argument("--scopesdiff", action="store", help="Only update the scopes in the specified diff of --scopes")
+    bgroup.add_argument("--reference", action="store", help="Load a JSON file created by TwitchReferenceParser")
+    bgroup.add_argument("--referencediff", action="store", help="Only update the endpoints in the specified diff of --reference")
+    qgroup = parser.add_argument_group("Query", "Output the index entries for the specified keys as JSON to STDOUT")
+    qgroup.add_argument("--scope", action="append", help="Output the endpoints and topics joined to the scope. May be specified multiple times")
+    qgroup.add_argument("--endpoint", action="append", help="Output the scopes joined to the endpoint. May be specified multiple times")
+    qgroup.add_argument("--topic", action="append", help="Output the scopes joined to the EventSub topic. May be specified multiple times")
+    args = parser.parse_args()
+    if args.scopesdiff != None and args.scopes == None:
+        parser.error("argument --scopesdiff: requires argument --scopes")
+    if args.referencediff != None and args.reference == None:
+        parser.error("argument --referencediff: requires argument --reference")
+    reader = BaseParser()
+    index = ScopeIndex()
+    index.load(args.index)
+    if args.scopes != None:
+        if args.scopesdiff != None:
+            index.updateFromScopes(reader.readSnapshot(args.scopesdiff), reader.readSnapshot(args.scopes))
+        else:
+            index.buildFromScopes(reader.readSnapshot(args.scopes))
+    if args.reference != None:
+        if args.referencediff != None:
+            index.updateFromReference(reader.readSnapshot(args.referencediff), reader.readSnapshot(args.reference))
+        else:
+            index.buildFromReference(reader.readSnapshot(args.reference))
+    if args.scopes != None or args.reference != None:
+        index.save(args.index)
+    if args.scope != None or args.endpoint != None or args.topic != None:
+        print(json.dumps({
+            "scopes": {scope: index.queryScope(scope) for scope in args.scope or []},
+            "endpoints": {endpoint: index.queryEndpoint(endpoint) for endpoint in args.endpoint or []},
+            "topics": {topic: index.queryTopic(topic) for topic in args.topic or []}
+        }, indent=4))
@@ -0,0 +1,45 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import os
+from pathlib import Path
+import threading
+
+def writeAtomic(path:str | Path, data:bytes, sync:bool = False):
+    """
+    Atomically write a file, by writing to a temporary file in the same folder, which is unique to the process and thread, and then replacing the file
+
+    The temporary file is deleted if the write fails. Used for every file which is replaced atomically
+
+    Args:
+        path (str | Path): The path to the file
+        data (bytes): The contents
+        sync (bool): Flush the contents to disk before replacing the file, so the file survives a crash. Default: False
+    """
+    path = Path(path)
+    temp = path.with_name(path.name + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp")
+    try:
+        with open(temp, "wb") as out_file:
+            out_file.write(data)
+            if sync:
+                out_file.flush()
+                os.fsync(out_file.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
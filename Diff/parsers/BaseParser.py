@@ -18,10 +18,35 @@
 #
 
 import argparse
+from AtomicFile import writeAtomic
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from difflib import SequenceMatcher
+from Fetcher import FetchError, Fetcher
+import gzip
+import hashlib
+import io
 import json
-import requests
+import JsonPatch
+import math
+from MinHash import MinHash
+import os
+from ParseModel import ParseModel
+from pathlib import Path
+import re
+import shlex
+from SnapshotCache import SnapshotCache
 import string
+import time
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
 
 class BaseParser:
     """
@@ -31,11 +56,146 @@ class BaseParser:
     """
     A string of all printable characters, except for vertical tab and form feed, which are not commonly used and can cause issues with parsing. This is used to filter out non-printable characters from the input HTML, which can cause issues with parsing and diffing
     """
+    nonprintable = re.compile("[^" + re.escape(printable) + "]+")
+    """
+    Matches runs of characters which are not in printable
+    """
+    compressionMagic = {
+        b"\x1f\x8b": "gzip",
+        b"\x28\xb5\x2f\xfd": "zstd"
+    }
+    """
+    The magic bytes at the start of a compressed snapshot, and the compression they indicate
+    """
+    manifestName = "manifest.json"
+    """
+    The name of the manifest in a folder created by writeShards(str, dict)
+    """
+    manifestVersion = 1
+    """
+    The version of the manifest format. Folders written with a different version can not be read
+    """
+    compressionExtensions = {
+        ".gz": "gzip",
+        ".zst": "zstd",
+        ".zstd": "zstd"
+    }
+    """
+    The file extensions which cause writeSnapshot(str, dict) to compress the snapshot, and the compression they indicate
+    """
+    elision = "\u2026"
+    """
+    Replaces the unchanged text which is trimmed from a string diff when context is set
+    """
+    words = re.compile(r"\S+")
+    """
+    Matches the words counted by context when contextUnit is words
+    """
+    renameIgnoredFields = frozenset(["slug", "url"])
+    """
+    The fields of an endpoint which are ignored when looking for renames. The slug is derived from the name, and every URL shares the same prefix
+    """
+    renameDetector = MinHash(ignoredKeys=renameIgnoredFields)
+    """
+    Finds the candidate pairs of removed and added endpoints for renames
+    """
+    renameThreshold = 0.6
+    """
+    The minimum similarity of a candidate pair of endpoints which is reported as a rename (see renameSimilarity(dict, dict))
+    """
+    lineContinuation = re.compile(r"\\[ \t]*\r?\n|\s\\\s+")
+    """
+    Matches a backslash which continues a curl command on the next line, including when the line break was collapsed into a space
+    """
+    parallelMinimum = 32
+    """
+    The minimum number of changed endpoints which are diffed in processes when diffWorkers is set. Fewer are diffed in this process, since starting the processes would take longer
+    """
+    curlOptions = {
+        "-X": "method",
+        "--request": "method",
+        "-H": "headers",
+        "--header": "headers",
+        "-d": "data",
+        "--data": "data",
+        "--data-raw": "data",
+        "--data-binary": "data",
+        "--data-urlencode": "data",
+        "--json": "data",
+        "--url": "url",
+        "-u": "options",
+        "--user": "options",
+        "-o": "options",
+        "--output": "options",
+        "-A": "options",
+        "--user-agent": "options",
+        "-e": "options",
+        "--referer": "options",
+        "-b": "options",
+        "--cookie": "options",
+        "-c": "options",
+        "--cookie-jar": "options",
+        "-F": "options",
+        "--form": "options",
+        "--form-string": "options",
+        "-m": "options",
+        "--max-time": "options",
+        "--connect-timeout": "options",
+        "--retry": "options",
+        "--max-redirs": "options",
+        "-x": "options",
+        "--proxy": "options",
+        "-U": "options",
+        "--proxy-user": "options",
+        "-E": "options",
+        "--cert": "options",
+        "--key": "options",
+        "--cacert": "options",
+        "-K": "options",
+        "--config": "options",
+        "-r": "options",
+        "--range": "options",
+        "-T": "options",
+        "--upload-file": "options",
+        "-w": "options",
+        "--write-out": "options",
+        "-D": "options",
+        "--dump-header": "options",
+        "--resolve": "options",
+        "--oauth2-bearer": "options"
+    }
+    """
+    The curl options which structure(str) parses into a key of the command, and the key. The options with the key "options" take a value, so they are kept in "options" together with it, and the value is never taken as the URL. Any other option is kept in "options"
+    """
+    structureFields = frozenset(["exampleRequestCurl", "exampleResponse"])
+    """
+    The keys whose string values diffobj(any, any) diffs by their structure (see structure(str)). The strings of any other key are diffed as text. Parsers may override this, and an empty set disables structure diffs
+    """
+    def __init__(self, fetcher:Fetcher | None = None, context:int | None = None, contextUnit:str = "chars", renames:bool = False, model:ParseModel | None = None, cache:SnapshotCache | None = None,
+                 diffWorkers:int | None = None):
+        """
+        Args:
+            fetcher (Fetcher | None): The Fetcher used by parseFromUrl(str). Share one instance between parsers to share its deadline. Default: None, which creates a Fetcher with the default settings
+            context (int | None): The amount of unchanged text to keep around each change in a string diff. Default: None, which keeps all of the unchanged text
+            contextUnit (str): The unit of context. One of: chars, words. Default: chars
+            renames (bool): Report similar removed and added endpoints as renames, and TOC entries which changed category as moves. Default: False
+            model (ParseModel | None): Convert the snapshots read by timeline(list, list | None) and the inputs of the diff in main() into this compact model, which uses less memory. Default: None, which keeps them as dicts
+            cache (SnapshotCache | None): Write snapshots through this cache, and lock shard folders while they are written or read, so concurrent runs can share the files. Default: None
+            diffWorkers (int | None): The number of processes used to diff the endpoints which changed (see diffEndpoints(dict, dict)). Default: None, which diffs in this process
+        """
+        self.fetcher = fetcher if fetcher is not None else Fetcher()
+        self.context = context
+        self.contextUnit = contextUnit
+        self.renames = renames
+        self.model = model
+        self.cache = cache
+        self.diffWorkers = diffWorkers
+
     def parseFromFile(self, path:str) -> dict:
         """
         Parse a page from the specified file and return a dict of parsed data
 
-        The file should be stored in UTF-8 compatible encoding
+        The file should be stored in UTF-8 compatible encoding, and may be compressed (see readSnapshot(str))
 
         Args:
             path (str): The path to an HTML file containing a snapshot of a page
@@ -43,27 +203,326 @@ class BaseParser:
         Returns:
             dict: A dict containing the parsed data (see parse(str))
         """
-        with open(path, "r", encoding="utf8") as html_file:
-            return self.parse("".join(c for c in html_file.read() if c in self.printable))
+        # Decoded with universal newlines, like an uncompressed file opened in text mode
+        with io.TextIOWrapper(self.openCompressed(path), encoding="utf8", newline=None) as html_file:
+            return self.parse(self.normalize(html_file.read()))
 
     def parseFromUrl(self, url:str) -> dict:
         """
         Parse a page from the specified URL and return a dict of parsed data
 
-        The user agent is sent as: streamactions.diff.parser/1
-
-        If the HTTP status code is not 200, the script exits with status 1
+        The page is fetched using the Fetcher in self.fetcher. The user agent is sent as: streamactions.diff.parser/1
 
         Args:
             url (str): The URL to a page
 
         Returns:
             dict: A dict containing the parsed data (see parse(str))
+
+        Raises:
+            FetchError: The page could not be fetched with HTTP status 200 within the timeouts, retries, and deadline of the Fetcher
+        """
+        return self.parse(self.fetcher.fetch(url, self.normalize))
+
+    def normalize(self, html:str) -> str:
+        """
+        Remove all characters which are not in printable from the input
+
+        Args:
+            html (str): The input
+
+        Returns:
+            str: The input, with the non-printable characters removed
+        """
+        return self.nonprintable.sub("", html)
+
+    def openCompressed(self, path:str):
+        """
+        Open a file for reading in binary mode, transparently decompressing it if it starts with one of the magic byte sequences in compressionMagic
+
+        Args:
+            path (str): The path to the file
+
+        Returns:
+            A binary file object
+
+        Raises:
+            RuntimeError: The file is compressed with zstd and neither the compression.zstd module (Python 3.14+) nor the zstandard package is available
+        """
+        with open(path, "rb") as raw_file:
+            magic = raw_file.read(4)
+        compression = None
+        for m, c in self.compressionMagic.items():
+            if magic.startswith(m):
+                compression = c
+        # Opened by path, so closing the returned file also closes the underlying file
+        if compression == "gzip":
+            return gzip.open(path, "rb")
+        elif compression == "zstd":
+            if zstd is None:
+                raise RuntimeError("Reading " + str(path) + " requires zstd support. Use Python 3.14+ or install the zstandard package")
+            return zstd.open(path, "rb")
+        return open(path, "rb")
+
+    def readSnapshot(self, path:str) -> dict:
+        """
+        Read a JSON file created by writeSnapshot(str, dict), or any other UTF-8 encoded JSON file, or a folder created by writeShards(str, dict)
+
+        The file may be uncompressed, or compressed with gzip or zstd. The compression is detected from the magic bytes at the start of the file
+
+        Args:
+            path (str): The path to the file or folder
+
+        Returns:
+            dict: The decoded JSON
+        """
+        if self.isShards(path):
+            with self.lockPath(path, True):
+                return self.readShards(path)
+        with self.openCompressed(path) as json_file:
+            return json.load(json_file)
+
+    def writeSnapshot(self, path:str, data:dict | list, indent:int | None = None, compression:str | None = None):
+        """
+        Write a dict to a UTF-8 encoded JSON file, optionally compressing it
+
+        Gzip output is written with a zeroed timestamp, so identical data always produces an identical file.
+        The file is replaced atomically, through cache if it is set, so a concurrent reader never sees a partially written file
+
+        Args:
+            path (str): The path to the file
+            data (dict | list): The data to write
+            indent (int | None): The indent passed to json.dump. Default: None
+            compression (str | None): The compression to use. One of: gzip, zstd, none. Default: None, which uses the compression in compressionExtensions for the extension of path, if any
+        """
+        if compression is None:
+            for ext, c in self.compressionExtensions.items():
+                if str(path).lower().endswith(ext):
+                    compression = c
+        if compression == "zstd" and zstd is None:
+            raise RuntimeError("Writing " + str(path) + " requires zstd support. Use Python 3.14+ or install the zstandard package")
+        encoded = json.dumps(data, indent=indent).encode("utf8")
+        if compression == "gzip":
+            raw_file = io.BytesIO()
+            with gzip.GzipFile(filename="", mode="wb", fileobj=raw_file, mtime=0) as json_file:
+                json_file.write(encoded)
+            encoded = raw_file.getvalue()
+        elif compression == "zstd":
+            encoded = zstd.compress(encoded)
+        if self.cache is not None:
+            self.cache.writeFile(path, encoded)
+        else:
+            writeAtomic(path, encoded)
+
+    def isShards(self, path:str) -> bool:
+        """
+        Indicates if a path is a folder created by writeShards(str, dict)
+
+        Args:
+            path (str): The path
+
+        Returns:
+            bool: True if the path is a folder containing a manifest
+        """
+        return Path(path, self.manifestName).is_file()
+
+    def lockPath(self, path:str, shared:bool = False):
+        """
+        Hold the lock of a path in cache for the duration of a with statement, if cache is set
+
+        Args:
+            path (str): The path
+            shared (bool): Allow other shared locks of the path to be held at the same time. Default: False
+
+        Returns:
+            A context manager, which does nothing if cache is not set
+        """
+        return self.cache.lockPath(path, shared) if self.cache is not None else nullcontext()
+
+    def writeShards(self, path:str, data:dict) -> list:
+        """
+        Write a dict created by parse(str) to a folder, with the value of each endpoint and each other top level key in a separate shard, and a manifest of the hash of each shard
+
+        Shards are named by the SHA-256 of their contents, so a shard which has not changed since the last write is neither rewritten nor touched, and identical values share a shard.
+        The manifest is written atomically after the shards, then shards which it no longer references are deleted. If cache is set, the folder is locked throughout, so a concurrent reader never loses a shard. The folder is in the format below
+        path/
+            manifest.json: {
+                "version": 1,
+                "shards": {
+                    key: hash, // Each top level key other than endpoints, such as toc
+                    "endpoints": {
+                        endpoint: hash,
+                        ...
+                    }
+                }
+            }
+            shards/
+                hash.json: The JSON of the value
+                ...
+
+        Args:
+            path (str): The path to the folder. Created if it does not exist
+            data (dict): The data to write
+
+        Returns:
+            list: The paths of the manifest and of every shard it references
+        """
+        Path(path).mkdir(parents=True, exist_ok=True)
+        with self.lockPath(path):
+            return self.writeShardsLocked(path, data)
+
+    def writeShardsLocked(self, path:str, data:dict) -> list:
+        """
+        Write a folder for writeShards(str, dict), after it has locked the folder
+
+        Args:
+            path (str): The path to the folder
+            data (dict): The data to write
+
+        Returns:
+            list: The paths of the manifest and of every shard it references
+        """
+        folder = Path(path, "shards")
+        folder.mkdir(parents=True, exist_ok=True)
+        shards = {}
+        manifest = {}
+        for key, value in data.items():
+            if key == "endpoints" and isinstance(value, dict):
+                manifest[key] = {}
+                for endpoint, endpointValue in value.items():
+                    manifest[key][endpoint] = self.shardHash(endpointValue, shards)
+            else:
+                manifest[key] = self.shardHash(value, shards)
+        for shardHash, shard in shards.items():
+            shardPath = Path(folder, shardHash + ".json")
+            if not shardPath.is_file():
+                writeAtomic(shardPath, shard)
+        manifestPath = Path(path, self.manifestName)
+        writeAtomic(manifestPath, json.dumps({"version": self.manifestVersion, "shards": manifest}, indent=4).encode("utf8"))
+        for shardPath in folder.glob("*.json"):
+            if shardPath.stem not in shards:
+                shardPath.unlink()
+        return [manifestPath] + [Path(folder, shardHash + ".json") for shardHash in shards]
+
+    def shardHash(self, value:any, shards:dict) -> str:
+        """
+        Encode a value as a shard
+
+        Args:
+            value (any): The value
+            shards (dict): The encoded shards, by hash, which the shard is added to
+
+        Returns:
+            str: The SHA-256 of the shard, as a hex string
+        """
+        shard = json.dumps(value).encode("utf8")
+        shardHash = hashlib.sha256(shard).hexdigest()
+        shards[shardHash] = shard
+        return shardHash
+
+    def readManifest(self, path:str) -> dict:
+        """
+        Read the manifest of a folder created by writeShards(str, dict)
+
+        Args:
+            path (str): The path to the folder
+
+        Returns:
+            dict: The shards in the manifest, as described in writeShards(str, dict)
+
+        Raises:
+            ValueError: The manifest is not in the format written by writeShards(str, dict)
+        """
+        with open(Path(path, self.manifestName), "r", encoding="utf8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if not isinstance(manifest, dict) or manifest.get("version") != self.manifestVersion or not isinstance(manifest.get("shards"), dict):
+            raise ValueError(str(Path(path, self.manifestName)) + " is not a shard manifest with version " + str(self.manifestVersion))
+        return manifest["shards"]
+
+    def readShard(self, path:str, shardHash:str, cache:dict | None = None) -> any:
+        """
+        Read a shard of a folder created by writeShards(str, dict)
+
+        Args:
+            path (str): The path to the folder
+            shardHash (str): The hash of the shard
+            cache (dict | None): The shards already read, by hash. Default: None
+
+        Returns:
+            any: The value in the shard. A shard found in cache is decoded again, so the values returned are never shared
         """
-        resp = requests.get(url, headers = { "User-Agent": "streamactions.diff.parser/1" })
-        if resp.status_code != 200:
-            exit(1)
-        return self.parse("".join(c for c in resp.text if c in self.printable))
+        if cache is not None and shardHash in cache:
+            return json.loads(cache[shardHash])
+        with open(Path(path, "shards", shardHash + ".json"), "rb") as shard_file:
+            shard = shard_file.read()
+        if cache is not None:
+            cache[shardHash] = shard
+        return json.loads(shard)
+
+    def readShards(self, path:str) -> dict:
+        """
+        Read every shard of a folder created by writeShards(str, dict)
+
+        Args:
+            path (str): The path to the folder
+
+        Returns:
+            dict: The dict which was written
+        """
+        cache = {}
+        ret = {}
+        for key, value in self.readManifest(path).items():
+            if key == "endpoints" and isinstance(value, dict):
+                ret[key] = {endpoint: self.readShard(path, shardHash, cache) for endpoint, shardHash in value.items()}
+            else:
+                ret[key] = self.readShard(path, value, cache)
+        return ret
+
+    def readChangedShards(self, lhsPath:str, rhsPath:str) -> tuple:
+        """
+        Read only the parts of two folders created by writeShards(str, dict) which diff(dict, dict) needs, by comparing their manifests first
+
+        Endpoints with the same hash on both sides are left out of both dicts, which diff(dict, dict) would omit from the diff anyway. Every other endpoint is read from the side(s) it is on.
+        Other top level keys, such as toc, are always read, but only once if they are unchanged
+
+        Args:
+            lhsPath (str): The path to the "original" folder
+            rhsPath (str): The path to the "new/modified" folder
+
+        Returns:
+            tuple: The lhs and rhs dicts, which diff(dict, dict) turns into the same diff as the full dicts
+        """
+        with self.lockPath(lhsPath, True), self.lockPath(rhsPath, True) if Path(lhsPath).resolve() != Path(rhsPath).resolve() else nullcontext():
+            return self.readChangedShardsLocked(lhsPath, rhsPath)
+
+    def readChangedShardsLocked(self, lhsPath:str, rhsPath:str) -> tuple:
+        """
+        Read two folders for readChangedShards(str, str), after it has locked them
+
+        Args:
+            lhsPath (str): The path to the "original" folder
+            rhsPath (str): The path to the "new/modified" folder
+
+        Returns:
+            tuple: The lhs and rhs dicts
+        """
+        lhsManifest = self.readManifest(lhsPath)
+        rhsManifest = self.readManifest(rhsPath)
+        cache = {}
+        lhs = {}
+        rhs = {}
+        for key in list(lhsManifest) + [x for x in rhsManifest if x not in lhsManifest]:
+            lv = lhsManifest.get(key)
+            rv = rhsManifest.get(key)
+            if key == "endpoints" and isinstance(lv, dict) and isinstance(rv, dict):
+                lhs[key] = {endpoint: self.readShard(lhsPath, shardHash) for endpoint, shardHash in lv.items() if rv.get(endpoint) != shardHash}
+                rhs[key] = {endpoint: self.readShard(rhsPath, shardHash) for endpoint, shardHash in rv.items() if lv.get(endpoint) != shardHash}
+                continue
+            if lv is not None:
+                lhs[key] = self.readShards(lhsPath)[key] if isinstance(lv, dict) else self.readShard(lhsPath, lv, cache)
+            if rv is not None:
+                rhs[key] = self.readShards(rhsPath)[key] if isinstance(rv, dict) else self.readShard(rhsPath, rv, cache)
+        return lhs, rhs
 
     def parse(self, html:str) -> dict:
         """
@@ -108,7 +567,7 @@ class BaseParser:
         """
         Diff two dicts created by parse(str)
 
-        The file should be stored in UTF-8 compatible encoding
+        The file should be stored in UTF-8 compatible encoding, and may be compressed (see readSnapshot(str))
 
         Args:
             lhsPath (str): The path to a JSON file containing the output of a previous call to parse(str). This will be the "original" file in the diff
@@ -117,14 +576,13 @@ class BaseParser:
         Returns:
             dict: A dict containing the diff data (see diff(dict, dict))
         """
-        with open(lhsPath, "r", encoding="utf8") as json_file:
-            return self.diff(json.load(json_file), rhs)
+        return self.diff(self.readSnapshot(lhsPath), rhs)
 
     def diffWithFileR(self, lhs:dict, rhsPath:str) -> dict:
         """
         Diff two dicts created by parse(str)
 
-        The file should be stored in UTF-8 compatible encoding
+        The file should be stored in UTF-8 compatible encoding, and may be compressed (see readSnapshot(str))
 
         Args:
             lhs (dict): A dict created by a call to parse(str). This will be the "original" file in the diff
@@ -133,14 +591,13 @@ class BaseParser:
         Returns:
             dict: A dict containing the diff data (see diff(dict, dict))
         """
-        with open(rhsPath, "r", encoding="utf8") as json_file:
-            return self.diff(lhs, json.load(json_file))
+        return self.diff(lhs, self.readSnapshot(rhsPath))
 
     def diffWithFiles(self, lhsPath:str, rhsPath:str) -> dict:
         """
         Diff two dicts created by parse(str)
 
-        The files should be stored in UTF-8 compatible encoding
+        The files should be stored in UTF-8 compatible encoding, and may be compressed (see readSnapshot(str))
 
         Args:
             lhsPath (str): The path to a JSON file containing the output of a previous call to parse(str). This will be the "original" file in the diff
@@ -149,17 +606,102 @@ class BaseParser:
         Returns:
             dict: A dict containing the diff data (see diff(dict, dict))
         """
-        with open(lhsPath, "r", encoding="utf8") as json_fileL:
-            with open(rhsPath, "r", encoding="utf8") as json_fileR:
-                return self.diff(json.load(json_fileL), json.load(json_fileR))
+        return self.diff(self.readSnapshot(lhsPath), self.readSnapshot(rhsPath))
+
+    def patch(self, lhs:dict, rhs:dict, keepOrder:bool = False) -> list:
+        """
+        Create an RFC 6902 JSON Patch which turns one dict created by parse(str) into another
+
+        Unlike diff(dict, dict), the patch only contains the values which changed, and applyPatch(dict, list) can rebuild rhs from lhs and the patch
+
+        Args:
+            lhs (dict): The "original" dict
+            rhs (dict): The "new/modified" dict
+            keepOrder (bool): Also preserve the order of keys, with moves which only applyPatch(dict, list) is known to support (see JsonPatch.create(any, any, str, bool)). Default: False
+
+        Returns:
+            list: The operations of the JSON Patch (see JsonPatch.create(any, any, str, bool))
+        """
+        return JsonPatch.create(lhs, rhs, keepOrder=keepOrder)
+
+    def applyPatch(self, snapshot:dict, patch:list) -> dict:
+        """
+        Apply an RFC 6902 JSON Patch created by patch(dict, dict) to a dict created by parse(str)
+
+        Args:
+            snapshot (dict): The "original" dict
+            patch (list): The operations of the JSON Patch
+
+        Returns:
+            dict: A new dict equal to the "new/modified" dict the patch was created from. The order of keys is also the same if the patch was created with keepOrder
+
+        Raises:
+            JsonPatch.JsonPatchError: The patch can not be applied to the snapshot
+        """
+        return JsonPatch.apply(snapshot, patch)
 
-    def diffobj(self, lhs:any, rhs:any) -> dict:
+    def trimContext(self, text:str, head:bool, tail:bool) -> str:
+        """
+        Trim an unchanged run of text in a string diff down to the context around the changes on either side of it, replacing the trimmed text with elision
+
+        Args:
+            text (str): The unchanged text
+            head (bool): If a change follows the text, keep context at the end of the text
+            tail (bool): If a change precedes the text, keep context at the start of the text
+
+        Returns:
+            str: The trimmed text; text if context is None or nothing would be trimmed
+        """
+        if self.context == None:
+            return text
+        if self.contextUnit == "words":
+            spans = [match.span() for match in self.words.finditer(text)]
+            keep = (self.context if head else 0) + (self.context if tail else 0)
+            if len(spans) <= keep:
+                return text
+            start = spans[self.context - 1][1] if tail and self.context > 0 else 0
+            end = spans[len(spans) - self.context][0] if head and self.context > 0 else len(text)
+        else:
+            keep = (self.context if head else 0) + (self.context if tail else 0)
+            if len(text) <= keep + len(self.elision):
+                return text
+            start = self.context if tail else 0
+            end = len(text) - self.context if head else len(text)
+        return text[:start] + self.elision + text[end:]
+
+    def listItem(self, value:any, operation:str) -> dict:
+        """
+        Mark an item which was added to or removed from a list, for diffobj(any, any)
+
+        Args:
+            value (any): The item
+            operation (str): The operation. One of: add, remove
+
+        Returns:
+            dict: A copy of the item if it is a dict; otherwise, a dict with the item in "string" if it is a string, or in "value". The operation is in "_operation"
+        """
+        if isinstance(value, Mapping):
+            value = ParseModel.toJson(value)
+        if isinstance(value, str):
+            value = {"string": value}
+        elif isinstance(value, dict):
+            value = value.copy()
+            if "_operation" in value:
+                del value["_operation"]
+        else:
+            value = {"value": ParseModel.toJson(value)}
+        value["_operation"] = operation
+        return value
+
+    def diffobj(self, lhs:any, rhs:any, values:bool = False, key:str | None = None) -> dict:
         """
         Diff two objects
 
         Args:
             lhs (any): The "original" object in the diff
             rhs (any): The "new/modified" object in the diff
+            values (bool): Include the value of a removed key in "lhs", and of an added key in "rhs", such as in the changes of a structure diff. Default: False
+            key (str | None): The key of the objects in the dict containing them. Strings are only diffed by their structure if this is in structureFields. Default: None
 
         Returns:
             dict: A dict containing the diff data, as described in diff(dict, dict)
@@ -168,49 +710,37 @@ class BaseParser:
                 return {"_operation": "remove", "lhs": lhs}
         elif isinstance(rhs, str) and lhs == None:
                 return {"_operation": "add", "rhs": rhs}
-        elif isinstance(lhs, dict) and rhs == None:
+        elif isinstance(lhs, Mapping) and rhs == None:
+                if not isinstance(lhs, dict):
+                    lhs = ParseModel.toJson(lhs)
                 lhs["_operation"] = "remove"
                 return lhs
-        elif isinstance(rhs, dict) and lhs == None:
+        elif isinstance(rhs, Mapping) and lhs == None:
+                if not isinstance(rhs, dict):
+                    rhs = ParseModel.toJson(rhs)
                 rhs["_operation"] = "add"
                 return rhs
         elif rhs == lhs:
             return {"_operation": "none"}
         elif isinstance(lhs, list) and isinstance(rhs, list):
             ret = []
-            lhs_strs = [json.dumps(x, sort_keys=True) for x in lhs]
-            rhs_strs = [json.dumps(x, sort_keys=True) for x in rhs]
+            lhs_strs = [json.dumps(x, sort_keys=True, default=ParseModel.toJson) for x in lhs]
+            rhs_strs = [json.dumps(x, sort_keys=True, default=ParseModel.toJson) for x in rhs]
             seqm = SequenceMatcher(None, lhs_strs, rhs_strs)
             for opcode, a0, a1, b0, b1 in seqm.get_opcodes():
                 if opcode == "equal":
                     pass
                 elif opcode == "insert":
                     for i in range(b0, b1):
-                        rv = dict(rhs[i]) if isinstance(rhs[i], dict) else rhs[i]
-                        if isinstance(rv, str):
-                            rv = {"string": rv}
-                        elif isinstance(rv, dict):
-                            rv = rv.copy()
-                            if "_operation" in rv:
-                                del rv["_operation"]
-                        rv["_operation"] = "add"
-                        ret.append(rv)
+                        ret.append(self.listItem(rhs[i], "add"))
                 elif opcode == "delete":
                     for i in range(a0, a1):
-                        lv = dict(lhs[i]) if isinstance(lhs[i], dict) else lhs[i]
-                        if isinstance(lv, str):
-                            lv = {"string": lv}
-                        elif isinstance(lv, dict):
-                            lv = lv.copy()
-                            if "_operation" in lv:
-                                del lv["_operation"]
-                        lv["_operation"] = "remove"
-                        ret.append(lv)
+                        ret.append(self.listItem(lhs[i], "remove"))
                 elif opcode == "replace":
                     n = min(a1 - a0, b1 - b0)
                     for i in range(n):
-                        res = self.diffobj(lhs[a0+i], rhs[b0+i])
-                        if res and isinstance(res, dict) and isinstance(lhs[a0+i], dict):
+                        res = self.diffobj(lhs[a0+i], rhs[b0+i], values)
+                        if res and isinstance(res, dict) and isinstance(lhs[a0+i], Mapping):
                             # The instructions say: "The unchanged values should not be marked in any way"
                             # We only want to add context keys if the item actually has a diff operation (meaning something changed inside)
                             # Or if the item itself was fully replaced, but here we are in a replace block so there is some change
@@ -221,32 +751,16 @@ class BaseParser:
                                     if k == "_operation":
                                         continue
                                     if k not in res:
-                                        res[k] = v
+                                        res[k] = ParseModel.toJson(v)
                         ret.append(res)
                     if a1 - a0 > n:
                         for i in range(a0 + n, a1):
-                            lv = dict(lhs[i]) if isinstance(lhs[i], dict) else lhs[i]
-                            if isinstance(lv, str):
-                                lv = {"string": lv}
-                            elif isinstance(lv, dict):
-                                lv = lv.copy()
-                                if "_operation" in lv:
-                                    del lv["_operation"]
-                            lv["_operation"] = "remove"
-                            ret.append(lv)
+                            ret.append(self.listItem(lhs[i], "remove"))
                     if b1 - b0 > n:
                         for i in range(b0 + n, b1):
-                            rv = dict(rhs[i]) if isinstance(rhs[i], dict) else rhs[i]
-                            if isinstance(rv, str):
-                                rv = {"string": rv}
-                            elif isinstance(rv, dict):
-                                rv = rv.copy()
-                                if "_operation" in rv:
-                                    del rv["_operation"]
-                            rv["_operation"] = "add"
-                            ret.append(rv)
+                            ret.append(self.listItem(rhs[i], "add"))
             return ret
-        elif isinstance(lhs, dict) and isinstance(rhs, dict):
+        elif isinstance(lhs, Mapping) and isinstance(rhs, Mapping):
             ret = {}
             foundk = []
             hasOp = False
@@ -260,17 +774,17 @@ class BaseParser:
                 lv = lhs[lk]
                 if lk in rhs_keys:
                     foundk.append(lk)
-                    res = self.diffobj(lv, rhs[lk])
+                    res = self.diffobj(lv, rhs[lk], values, lk)
                     hasOp = True
                 else:
-                    res = {"_operation": "remove"}
+                    res = {"_operation": "remove", "lhs": ParseModel.toJson(lv)} if values else {"_operation": "remove"}
                     hasOp = True
                 if (isinstance(res, dict) and res.get("_operation") != "none") or (not isinstance(res, dict) and res is not None):
                     ret[lk] = res
                     hasOp = True
             for rk in rhs_keys:
                 if rk not in foundk:
-                    ret[rk] = {"_operation": "add"}
+                    ret[rk] = {"_operation": "add", "rhs": ParseModel.toJson(rhs[rk])} if values else {"_operation": "add"}
                     hasOp = True
 
             if hasOp == False:
@@ -278,17 +792,25 @@ class BaseParser:
 
             return ret
         elif isinstance(lhs, str) and isinstance(rhs, str):
+            lstruct = self.structure(lhs) if key in self.structureFields else None
+            if lstruct != None:
+                rstruct = self.structure(rhs)
+                # A change which is only formatting falls through to the string diff, so it is still reported
+                if rstruct != None and lstruct[0] == rstruct[0] and lstruct[1] != rstruct[1]:
+                    return {"_operation": "structure", "format": lstruct[0], "changes": self.diffobj(lstruct[1], rstruct[1], True)}
             seqm = SequenceMatcher(None, lhs, rhs)
             lhs_str = []
             rhs_str = []
             combined_str = []
             hasIns = False
             hasDel = False
-            for opcode, a0, a1, b0, b1 in seqm.get_opcodes():
+            opcodes = seqm.get_opcodes()
+            for i, (opcode, a0, a1, b0, b1) in enumerate(opcodes):
                 if opcode == "equal":
-                    lhs_str.append(seqm.a[a0:a1])
-                    rhs_str.append(seqm.a[a0:a1])
-                    combined_str.append(seqm.a[a0:a1])
+                    equal = self.trimContext(seqm.a[a0:a1], i < len(opcodes) - 1, i > 0)
+                    lhs_str.append(equal)
+                    rhs_str.append(equal)
+                    combined_str.append(equal)
                 elif opcode == "insert":
                     rhs_str.append("<ins>" + seqm.b[b0:b1] + "</ins>")
                     combined_str.append("<ins>" + seqm.b[b0:b1] + "</ins>")
@@ -313,7 +835,90 @@ class BaseParser:
                 return {"_operation": "delete", "lhs": "".join(lhs_str)}
             else:
                 return {"_operation": "none"}
-        return {"_operation": "unknown", "lhs": lhs, "rhs": rhs}
+        return {"_operation": "unknown", "lhs": ParseModel.toJson(lhs), "rhs": ParseModel.toJson(rhs)}
+
+    def structure(self, text:str) -> tuple | None:
+        """
+        Parse a string which is a JSON object or array, or a curl command line, such as an example request or response, so diffobj(any, any) can diff it by its structure
+
+        A curl command is parsed into a dict with the keys "method", "url", "headers" (a dict of header values, by name), "data" (parsed as JSON if possible), and "options" (a list of any other arguments, where an option which takes a value is joined with it)
+
+        Args:
+            text (str): The string
+
+        Returns:
+            tuple | None: The format (json or curl) and the parsed value, where every JSON value other than an object or array is replaced with its JSON text; None if the string is neither
+        """
+        start = text.lstrip()[:5]
+        if start.startswith("{") or start.startswith("["):
+            value = self.parseJson(text)
+            return ("json", value) if value != None else None
+        if start != "curl " and start != "curl\t" and start != "curl\n":
+            return None
+        try:
+            tokens = shlex.split(self.lineContinuation.sub(" ", text))
+        except ValueError:
+            return None
+        ret = {"method": None, "url": None, "headers": {}, "data": None, "options": []}
+        i = 1
+        while i < len(tokens):
+            token = tokens[i]
+            key = self.curlOptions.get(token)
+            if token == "curl":
+                # Several commands in one example
+                return None
+            elif key != None and i + 1 < len(tokens):
+                i += 1
+                value = tokens[i]
+                if key == "headers":
+                    name, _, headerValue = value.partition(":")
+                    ret["headers"][name.strip()] = headerValue.strip()
+                elif key == "data":
+                    ret["data"] = value if ret["data"] == None else ret["data"] + "&" + value
+                elif key == "options":
+                    ret["options"].append(shlex.join([token, value]))
+                else:
+                    ret[key] = value
+            elif ret["url"] == None and not token.startswith("-"):
+                ret["url"] = token
+            else:
+                ret["options"].append(token)
+            i += 1
+        if ret["data"] != None:
+            data = self.parseJson(ret["data"])
+            if data != None:
+                ret["data"] = data
+        return ("curl", ret)
+
+    def parseJson(self, text:str) -> dict | list | None:
+        """
+        Parse a JSON object or array for structure(str)
+
+        Args:
+            text (str): The JSON
+
+        Returns:
+            dict | list | None: The parsed value, where every value other than an object or array is replaced with its JSON text; None if the string is not a JSON object or array
+        """
+        try:
+            value = json.loads(text, object_pairs_hook=lambda pairs: {k: self.jsonText(v) if isinstance(v, list) else v if isinstance(v, dict) else json.dumps(v) for k, v in pairs})
+        except ValueError:
+            return None
+        if isinstance(value, list):
+            return self.jsonText(value)
+        return value if isinstance(value, dict) else None
+
+    def jsonText(self, value:list) -> list:
+        """
+        Replace every value other than an object or array in a parsed JSON array, and in the arrays inside it, with its JSON text. Objects were already converted by parseJson(str)
+
+        Args:
+            value (list): The array
+
+        Returns:
+            list: The converted array
+        """
+        return [self.jsonText(x) if isinstance(x, list) else x if isinstance(x, dict) else json.dumps(x) for x in value]
 
     def diff(self, lhs:dict, rhs:dict) -> dict:
         """
@@ -380,33 +985,46 @@ class BaseParser:
         As shown above, "replace" operations will output a string showing just the LHS with <del></del> tags surrounding the removed text, a string showing just the RHS
         with <ins></ins> tags surrounding the added text, and a combined string showing both sets of tags
 
+        If context is set, the unchanged text in "insert", "delete", and "replace" strings is trimmed to that many characters or words (see contextUnit) around each change,
+        and the trimmed text is replaced with elision
+
         Operations:
         - add: Add a new sub-object or string, where one previously did not exist or was set to None
         - remove: Remove an existing sub-object or string. A string would be replaced with None, a sub-object would simply be removed from the dict or list
         - insert: Insert the text that is surrounded by the <ins></ins> tags. Contains only sub-key "rhs" from the "replace" example. May contain only enough surrounding text to provide appropriate context
         - delete: Remove the text that is surrounded by the <del></del> tags. Contains only sub-key "lhs" from the "replace" example. May contain only enough surrounding text to provide appropriate context
         - replace: Replace the text that is surrounded by the <del></del> tags with the text that is surrounded by the <ins></ins> tags
+        - structure: Only for the keys in structureFields, such as "exampleResponse" and "exampleRequestCurl". Both strings are JSON objects or arrays, or both are curl command lines, and they differ by more than formatting.
+          "format" is json or curl, and "changes" contains the diff of the values parsed by structure(str), using these operations. In JSON, values other than objects and arrays are diffed as their JSON text.
+          An added or removed key in "changes" contains its value in "rhs" or "lhs"
+        - rename: Only when renames is set. The endpoint was renamed from the key in "from". The key "changes" contains the diff of the values of the endpoint, in the same format as a modified endpoint.
+          In "toc", the entry was renamed from the endpoint in "from" within the same category, and "description" contains the diff of the description, if it changed
+        - move: Only when renames is set. In "toc", the entry was moved from the category in "from". "description" contains the diff of the description, if it changed
         - none: No operation. Should not normally occur
         - unknown: Unable to determine operation. Should not normally occur
 
         Args:
-            lhs (dict): A dict created by a call to parse(str). This will be the "original" file in the diff
-            rhs (dict): A dict created by a call to parse(str). This will be the "new/modified" file in the diff
+            lhs (dict): A dict created by a call to parse(str), or its compact model created by ParseModel.fromJson(dict). This will be the "original" file in the diff
+            rhs (dict): A dict created by a call to parse(str), or its compact model created by ParseModel.fromJson(dict). This will be the "new/modified" file in the diff
 
         Returns:
             dict: A dict containing the diff data, as described above
         """
         diff = {}
-        foundk = []
-        for lk,larr in lhs["toc"].items():
-            if lk in rhs["toc"]:
-                foundk.append(lk)
-                rarr = rhs["toc"][lk]
-                founde = []
-                for lv in larr:
+        # Unchanged sections are skipped with a single comparison, which stops at the first difference
+        if lhs["toc"] != rhs["toc"]:
+            foundk = set()
+            for lk,larr in lhs["toc"].items():
+                if lk in rhs["toc"]:
+                    foundk.add(lk)
+                    rarr = rhs["toc"][lk]
+                    rindex = {}
                     for rv in rarr:
-                        if lv["endpoint"] == rv["endpoint"]:
-                            founde.append(lv["endpoint"])
+                        rindex.setdefault(rv["endpoint"], []).append(rv)
+                    founde = set()
+                    for lv in larr:
+                        for rv in rindex.get(lv["endpoint"], []):
+                            founde.add(lv["endpoint"])
                             if "description" in lv and "description" in rv:
                                 if lv["description"] != rv["description"]:
                                     if "toc" not in diff:
@@ -414,67 +1032,440 @@ class BaseParser:
                                     if lk not in diff["toc"]:
                                         diff["toc"][lk] = [];
                                     diff["toc"][lk].append({"endpoint": lv["endpoint"], "description": self.diffobj(lv["description"], rv["description"])})
-                for lv in larr:
-                    if lv["endpoint"] not in founde:
-                        if "toc" not in diff:
-                            diff["toc"] = {}
-                        if lk not in diff["toc"]:
-                            diff["toc"][lk] = [];
-                        diff["toc"][lk].append({"endpoint": lv["endpoint"], "_operation": "remove"})
-                for rv in rarr:
-                    if rv["endpoint"] not in founde:
-                        if "toc" not in diff:
-                            diff["toc"] = {}
-                        if lk not in diff["toc"]:
-                            diff["toc"][lk] = [];
-                        rv["_operation"] = "add"
-                        diff["toc"][lk].append(rv)
-            else:
-                if "toc" not in diff:
-                    diff["toc"] = {}
-                diff["toc"][lk] = {"_operation": "remove"}
-        for rk in rhs["toc"]:
-            if rk not in foundk:
-                if "toc" not in diff:
-                    diff["toc"] = {}
-                diff["toc"][rk] = {"_operation": "add"}
-        foundk = []
-        for lk,lv in lhs["endpoints"].items():
-            if lk in rhs["endpoints"]:
-                foundk.append(lk)
-                rv = rhs["endpoints"][lk]
-                hasOp = False
-                ret = {}
-                founddk = []
-                for ldk,ldv in lv.items():
-                    if ldk in rv:
-                        founddk.append(ldk)
-                        rdv = rv[ldk]
-                        if ldv != rdv:
-                            ret[ldk] = self.diffobj(ldv, rdv)
-                            hasOp = True
-                    else:
-                        ret[ldk] = {"_operation": "remove"}
-                        hasOp = True
-                for rdk in rv:
-                    if rdk not in founddk:
-                        ret[rdk] = {"_operation": "add"}
-                        hasOp = True
-                if hasOp == True:
+                    for lv in larr:
+                        if lv["endpoint"] not in founde:
+                            if "toc" not in diff:
+                                diff["toc"] = {}
+                            if lk not in diff["toc"]:
+                                diff["toc"][lk] = [];
+                            diff["toc"][lk].append({"endpoint": lv["endpoint"], "_operation": "remove"})
+                    for rv in rarr:
+                        if rv["endpoint"] not in founde:
+                            if "toc" not in diff:
+                                diff["toc"] = {}
+                            if lk not in diff["toc"]:
+                                diff["toc"][lk] = [];
+                            if not isinstance(rv, dict):
+                                rv = ParseModel.toJson(rv)
+                            rv["_operation"] = "add"
+                            diff["toc"][lk].append(rv)
+                else:
+                    if "toc" not in diff:
+                        diff["toc"] = {}
+                    diff["toc"][lk] = {"_operation": "remove"}
+            for rk in rhs["toc"]:
+                if rk not in foundk:
+                    if "toc" not in diff:
+                        diff["toc"] = {}
+                    diff["toc"][rk] = {"_operation": "add"}
+        if lhs["endpoints"] != rhs["endpoints"]:
+            changed = self.diffEndpoints(lhs["endpoints"], rhs["endpoints"]) if self.diffWorkers != None and self.diffWorkers > 1 else None
+            foundk = set()
+            for lk,lv in lhs["endpoints"].items():
+                if lk in rhs["endpoints"]:
+                    foundk.add(lk)
+                    ret = changed.get(lk, {}) if changed != None else self.diffEndpoint(lv, rhs["endpoints"][lk])
+                    if len(ret) > 0:
+                        if "endpoints" not in diff:
+                            diff["endpoints"] = {}
+                        diff["endpoints"][lk] = ret
+                else:
                     if "endpoints" not in diff:
                         diff["endpoints"] = {}
-                    diff["endpoints"][lk] = ret
-            else:
-                if "endpoints" not in diff:
-                    diff["endpoints"] = {}
-                diff["endpoints"][lk] = {"_operation": "remove"}
-        for rk in rhs["endpoints"]:
-            if rk not in foundk:
-                if "endpoints" not in diff:
-                    diff["endpoints"] = {}
-                diff["endpoints"][rk] = {"_operation": "add"}
+                    diff["endpoints"][lk] = {"_operation": "remove"}
+            for rk in rhs["endpoints"]:
+                if rk not in foundk:
+                    if "endpoints" not in diff:
+                        diff["endpoints"] = {}
+                    diff["endpoints"][rk] = {"_operation": "add"}
+        if self.renames:
+            self.detectRenames(lhs, rhs, diff)
         return diff
 
+    def diffEndpoint(self, lv:dict, rv:dict) -> dict:
+        """
+        Diff the values of one endpoint
+
+        Args:
+            lv (dict): The "original" endpoint
+            rv (dict): The "new/modified" endpoint
+
+        Returns:
+            dict: A dict containing the diff of each key of the endpoint which changed, as described in diff(dict, dict); {} if nothing changed
+        """
+        ret = {}
+        founddk = []
+        for ldk,ldv in lv.items():
+            if ldk in rv:
+                founddk.append(ldk)
+                rdv = rv[ldk]
+                if ldv != rdv:
+                    ret[ldk] = self.diffobj(ldv, rdv, key=ldk)
+            else:
+                ret[ldk] = {"_operation": "remove"}
+        for rdk in rv:
+            if rdk not in founddk:
+                ret[rdk] = {"_operation": "add"}
+        return ret
+
+    def diffEndpoints(self, lhs:dict, rhs:dict) -> dict | None:
+        """
+        Diff the endpoints which are on both sides and changed, in a pool of diffWorkers processes
+
+        Only the pairs which are not equal are sent to the processes, in chunks encoded as JSON, and the diffs are returned the same way, so neither snapshot is pickled.
+        The endpoints are diffed by diffEndpoint(dict, dict) of BaseParser, so diff(dict, dict) merges them into a diff identical to diffing in this process
+
+        Args:
+            lhs (dict): The "endpoints" of the "original" dict
+            rhs (dict): The "endpoints" of the "new/modified" dict
+
+        Returns:
+            dict | None: The diff of each endpoint which changed, by name; None if fewer than parallelMinimum endpoints changed
+        """
+        pairs = [(endpoint, lv, rhs[endpoint]) for endpoint, lv in lhs.items() if endpoint in rhs and lv != rhs[endpoint]]
+        if len(pairs) < self.parallelMinimum:
+            return None
+        size = math.ceil(len(pairs) / (self.diffWorkers * 4))
+        chunks = [json.dumps(pairs[i:i + size], default=ParseModel.toJson).encode("utf8") for i in range(0, len(pairs), size)]
+        del pairs
+        ret = {}
+        with ProcessPoolExecutor(max_workers=self.diffWorkers) as executor:
+            for result in executor.map(diffChunk, chunks, [self.context] * len(chunks), [self.contextUnit] * len(chunks)):
+                for endpoint, value in json.loads(result):
+                    ret[endpoint] = value
+        return ret
+
+    def benchmarkDiff(self, lhs:dict, rhs:dict, workers:list, repeat:int = 3) -> dict:
+        """
+        Measure diff(dict, dict) with different numbers of diffWorkers
+
+        Args:
+            lhs (dict): The "original" dict
+            rhs (dict): The "new/modified" dict
+            workers (list): The numbers of processes to measure. 1 diffs in this process
+            repeat (int): The number of times to diff with each number of processes. The fastest is reported. Default: 3
+
+        Returns:
+            dict: The number of CPUs, and for each number of processes, the seconds taken, the speedup over the first number of processes, and whether the diff is identical to the diff with the first
+        """
+        diffWorkers = self.diffWorkers
+        results = []
+        try:
+            for count in workers:
+                self.diffWorkers = count
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    retd = self.diff(lhs, rhs)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best == None else min(best, elapsed)
+                encoded = json.dumps(retd)
+                if len(results) == 0:
+                    baseline = (best, encoded)
+                results.append({"workers": count, "seconds": best, "speedup": baseline[0] / best if best > 0 else None, "identical": encoded == baseline[1]})
+        finally:
+            self.diffWorkers = diffWorkers
+        return {"cpus": os.cpu_count(), "results": results}
+
+    def hasChanged(self, lhs:dict, rhs:dict) -> bool:
+        """
+        Indicate if diff(dict, dict) would return a non-empty diff, without computing it
+
+        The comparison stops at the first difference, and string diffs are never computed
+
+        Args:
+            lhs (dict): The "original" dict, as passed to diff(dict, dict)
+            rhs (dict): The "new/modified" dict, as passed to diff(dict, dict)
+
+        Returns:
+            bool: True if the diff would not be empty
+        """
+        if lhs["endpoints"] != rhs["endpoints"]:
+            return True
+        if lhs["toc"] == rhs["toc"]:
+            return False
+        if lhs["toc"].keys() != rhs["toc"].keys():
+            return True
+        for category, larr in lhs["toc"].items():
+            rindex = {}
+            for rv in rhs["toc"][category]:
+                rindex.setdefault(rv["endpoint"], []).append(rv)
+            if set(lv["endpoint"] for lv in larr) != rindex.keys():
+                return True
+            for lv in larr:
+                if "description" in lv and any("description" in rv and lv["description"] != rv["description"] for rv in rindex[lv["endpoint"]]):
+                    return True
+        return False
+
+    def stat(self, lhs:dict, rhs:dict) -> dict:
+        """
+        Count the changes which diff(dict, dict) would report, without computing string diffs
+
+        The format of the returned dict is:
+        {
+            "changed": changed, // True if the diff would not be empty
+            "toc": {
+                "categoriesAdded": count,
+                "categoriesRemoved": count,
+                "entriesAdded": count, // In categories on both sides
+                "entriesRemoved": count, // In categories on both sides
+                "entriesModified": count // Entries whose description changed
+            },
+            "endpoints": {
+                "added": count,
+                "removed": count,
+                "modified": count
+            },
+            "fields": { // Keys of the modified endpoints, such as description or requestBody
+                "added": count,
+                "removed": count,
+                "modified": count
+            }
+        }
+
+        Renames are not detected, so a renamed endpoint is counted as removed and added
+
+        Args:
+            lhs (dict): The "original" dict, as passed to diff(dict, dict)
+            rhs (dict): The "new/modified" dict, as passed to diff(dict, dict)
+
+        Returns:
+            dict: The counts, as described above
+        """
+        toc = {"categoriesAdded": 0, "categoriesRemoved": 0, "entriesAdded": 0, "entriesRemoved": 0, "entriesModified": 0}
+        endpoints = {"added": 0, "removed": 0, "modified": 0}
+        fields = {"added": 0, "removed": 0, "modified": 0}
+        if lhs["toc"] != rhs["toc"]:
+            toc["categoriesRemoved"] = sum(1 for category in lhs["toc"] if category not in rhs["toc"])
+            toc["categoriesAdded"] = sum(1 for category in rhs["toc"] if category not in lhs["toc"])
+            for category, larr in lhs["toc"].items():
+                if category not in rhs["toc"]:
+                    continue
+                rindex = {}
+                for rv in rhs["toc"][category]:
+                    rindex.setdefault(rv["endpoint"], []).append(rv)
+                lnames = set(lv["endpoint"] for lv in larr)
+                toc["entriesRemoved"] += sum(1 for lv in larr if lv["endpoint"] not in rindex)
+                toc["entriesAdded"] += sum(1 for rv in rhs["toc"][category] if rv["endpoint"] not in lnames)
+                for lv in larr:
+                    if "description" in lv:
+                        toc["entriesModified"] += sum(1 for rv in rindex.get(lv["endpoint"], []) if "description" in rv and lv["description"] != rv["description"])
+        if lhs["endpoints"] != rhs["endpoints"]:
+            for endpoint, lv in lhs["endpoints"].items():
+                if endpoint not in rhs["endpoints"]:
+                    endpoints["removed"] += 1
+                    continue
+                rv = rhs["endpoints"][endpoint]
+                if lv == rv:
+                    continue
+                endpoints["modified"] += 1
+                for key, value in lv.items():
+                    if key not in rv:
+                        fields["removed"] += 1
+                    elif value != rv[key]:
+                        fields["modified"] += 1
+                fields["added"] += sum(1 for key in rv if key not in lv)
+            endpoints["added"] = sum(1 for endpoint in rhs["endpoints"] if endpoint not in lhs["endpoints"])
+        changed = any(x > 0 for counts in (toc, endpoints) for x in counts.values())
+        return {"changed": changed, "toc": toc, "endpoints": endpoints, "fields": fields}
+
+    def renameSimilarity(self, lhs:dict, rhs:dict) -> float:
+        """
+        Returns how similar two endpoints are field by field, so boilerplate shared by endpoints with the same schema can not outweigh their differences
+
+        Each field other than those in renameIgnoredFields is compared with the exact Jaccard similarity of its shingles (see MinHash.similarity(any, any)).
+        Fields which are empty in both endpoints are skipped, and a field which is empty in only one of them counts as 0
+
+        Args:
+            lhs (dict): The "original" endpoint
+            rhs (dict): The "new/modified" endpoint
+
+        Returns:
+            float: The mean similarity of the fields, from 0 to 1; 0 if every field is empty in both
+        """
+        similarities = []
+        for k in list(lhs) + [k for k in rhs if k not in lhs]:
+            if k == "_operation" or k in self.renameIgnoredFields:
+                continue
+            lv = lhs.get(k)
+            rv = rhs.get(k)
+            if not lv and not rv:
+                continue
+            similarities.append(self.renameDetector.similarity(lv, rv))
+        return sum(similarities) / len(similarities) if len(similarities) > 0 else 0.0
+
+    def detectRenames(self, lhs:dict, rhs:dict, diff:dict):
+        """
+        Replace pairs of removed and added endpoints which are similar with a rename, and pairs of TOC entries which were removed from one category and added to another with a move
+
+        Candidate endpoints are found with the MinHash signatures of their values (see MinHash.match(dict, dict, Callable)), so only likely pairs are compared.
+        A candidate is only reported as a rename if its field by field similarity reaches renameThreshold (see renameSimilarity(dict, dict))
+
+        Args:
+            lhs (dict): The "original" dict passed to diff(dict, dict)
+            rhs (dict): The "new/modified" dict passed to diff(dict, dict)
+            diff (dict): The diff, which is modified in place
+        """
+        endpoints = diff.get("endpoints", {})
+        removed = {k: lhs["endpoints"][k] for k, v in endpoints.items() if v == {"_operation": "remove"} and k not in rhs["endpoints"]}
+        added = {k: rhs["endpoints"][k] for k, v in endpoints.items() if v == {"_operation": "add"} and k not in lhs["endpoints"]}
+        renamed = {}
+        if len(removed) > 0 and len(added) > 0:
+            for lk, rk, _ in self.renameDetector.match(removed, added, lambda lv, rv: self.renameSimilarity(lv, rv) >= self.renameThreshold):
+                renamed[rk] = lk
+                del endpoints[lk]
+                endpoints[rk] = {"_operation": "rename", "from": lk, "changes": self.diffEndpoint(lhs["endpoints"][lk], rhs["endpoints"][rk])}
+        toc = diff.get("toc", {})
+        removedToc = {}
+        for category, entries in toc.items():
+            if isinstance(entries, list):
+                for entry in entries:
+                    if entry.get("_operation") == "remove":
+                        removedToc.setdefault(entry["endpoint"], []).append(category)
+        replaced = set()
+        for category, entries in toc.items():
+            if isinstance(entries, list):
+                for i, entry in enumerate(entries):
+                    if entry.get("_operation") != "add":
+                        continue
+                    endpoint = entry["endpoint"]
+                    if endpoint in renamed and category in removedToc.get(renamed[endpoint], []) and (renamed[endpoint], category) not in replaced:
+                        source = category
+                        ret = {"endpoint": endpoint, "from": renamed[endpoint], "_operation": "rename"}
+                        replaced.add((renamed[endpoint], category))
+                        old = renamed[endpoint]
+                    else:
+                        sources = [x for x in removedToc.get(endpoint, []) if x != category and (endpoint, x) not in replaced]
+                        if len(sources) == 0:
+                            continue
+                        source = sources[0]
+                        ret = {"endpoint": endpoint, "from": source, "_operation": "move"}
+                        replaced.add((endpoint, source))
+                        old = endpoint
+                    lv = next(x for x in lhs["toc"][source] if x["endpoint"] == old)
+                    if "description" in lv and "description" in entry and lv["description"] != entry["description"]:
+                        ret["description"] = self.diffobj(lv["description"], entry["description"])
+                    entries[i] = ret
+        for category in list(toc):
+            if isinstance(toc[category], list):
+                toc[category] = [x for x in toc[category] if x.get("_operation") != "remove" or (x["endpoint"], category) not in replaced]
+                if len(toc[category]) == 0:
+                    del toc[category]
+
+    def timeline(self, snapshots:list, labels:list | None = None) -> dict:
+        """
+        Compute the change history of every endpoint and TOC category over an ordered list of dicts created by parse(str), in a single pass
+
+        Each revision is loaded once and only compared with the previous revision, which is the only other revision kept in memory.
+        An unchanged endpoint is skipped after a single comparison, and only the fields which changed are diffed, so the cost of diffing is proportional to the amount of change
+
+        The format of the returned dict is:
+        {
+            "revisions": [
+                label, // The label of each revision, in order
+                ...
+            ],
+            "toc": {
+                category: [ // Only categories which changed
+                    {
+                        "revision": label, // The revision the change appeared in
+                        "_operation": operation, // add, remove, or change
+                        "added": [ // For change, the endpoints added to the category
+                            endpoint,
+                            ...
+                        ],
+                        "removed": [ // For change, the endpoints removed from the category
+                            endpoint,
+                            ...
+                        ]
+                    },
+                    ...
+                ],
+                ...
+            },
+            "endpoints": {
+                endpoint: [ // Only endpoints which changed
+                    {
+                        "revision": label, // The revision the change appeared in
+                        "_operation": operation, // add, remove, or change
+                        "fields": { // For change, the diff of each field which changed, as described in diff(dict, dict)
+                            field: diff,
+                            ...
+                        }
+                    },
+                    ...
+                ],
+                ...
+            }
+        }
+
+        Args:
+            snapshots (list): The revisions, oldest first. Each is a dict created by parse(str), or the path to a file which can be read by readSnapshot(str)
+            labels (list | None): The label of each revision. Default: None, which uses the path of each file, or the index of each dict
+
+        Returns:
+            dict: A dict containing the history, as described above
+        """
+        ret = {
+            "revisions": [],
+            "toc": {},
+            "endpoints": {}
+        }
+        previous = None
+        previousToc = {}
+        for i, snapshot in enumerate(snapshots):
+            label = labels[i] if labels != None else (str(snapshot) if not isinstance(snapshot, dict) else i)
+            if not isinstance(snapshot, dict):
+                snapshot = self.readSnapshot(snapshot)
+                if self.model != None:
+                    snapshot = self.model.fromJson(snapshot)
+            ret["revisions"].append(label)
+            toc = {category: set(x["endpoint"] for x in entries) for category, entries in snapshot["toc"].items()}
+            if previous != None:
+                before = previous["endpoints"]
+                after = snapshot["endpoints"]
+                for endpoint, value in after.items():
+                    if endpoint not in before:
+                        ret["endpoints"].setdefault(endpoint, []).append({"revision": label, "_operation": "add"})
+                    elif before[endpoint] != value:
+                        if isinstance(before[endpoint], Mapping) and isinstance(value, Mapping):
+                            changes = self.diffEndpoint(before[endpoint], value)
+                        else:
+                            changes = self.diffobj(before[endpoint], value)
+                        ret["endpoints"].setdefault(endpoint, []).append({"revision": label, "_operation": "change", "fields": changes})
+                for endpoint in before:
+                    if endpoint not in after:
+                        ret["endpoints"].setdefault(endpoint, []).append({"revision": label, "_operation": "remove"})
+                for category, entries in toc.items():
+                    if category not in previousToc:
+                        ret["toc"].setdefault(category, []).append({"revision": label, "_operation": "add"})
+                    elif entries != previousToc[category]:
+                        ret["toc"].setdefault(category, []).append({"revision": label, "_operation": "change", "added": sorted(entries - previousToc[category]), "removed": sorted(previousToc[category] - entries)})
+                for category in previousToc:
+                    if category not in toc:
+                        ret["toc"].setdefault(category, []).append({"revision": label, "_operation": "remove"})
+            previous = snapshot
+            previousToc = toc
+        return ret
+
+    def addArguments(self, parser:argparse.ArgumentParser):
+        """
+        Add arguments which are specific to this parser to the argument parser used by main()
+
+        Args:
+            parser (argparse.ArgumentParser): The argument parser
+        """
+        pass
+
+    def applyArguments(self, args:argparse.Namespace):
+        """
+        Apply the arguments added by addArguments(argparse.ArgumentParser) before main() parses the page
+
+        Args:
+            args (argparse.Namespace): The parsed arguments
+        """
+        pass
+
     def main(self):
         """
         Processes the argument parser, executes requested operations, and produces output to the specified location
@@ -482,30 +1473,90 @@ class BaseParser:
         parser = argparse.ArgumentParser(description="Parse a page into a JSON format that can be diffed")
         pgroup = parser.add_argument_group("Parse HTML", "Parse the HTML of a page and return a dict of parsed data")
         pigroup = pgroup.add_mutually_exclusive_group()
-        pigroup.add_argument("--file", action="store", help="Parse the HTML from a file stored in a UTF-8 compatible encoding")
+        pigroup.add_argument("--file", action="store", help="Parse the HTML from a file stored in a UTF-8 compatible encoding, optionally compressed with gzip or zstd")
         pigroup.add_argument("--url", action="store", help="Parse the HTML from a URL")
         pgroup.add_argument("--out", action="store", help="Output JSON object from HTML to the specified file instead of STDOUT")
         pgroup.add_argument("--pretty", action="store_true", help="Prettyfi the parser output when using --out")
+        pgroup.add_argument("--compress", action="store", choices=["gzip", "zstd", "none"], help="Compress the output of --out and --diffout. Default: Detected from the file extension (.gz, .zst)")
+        pgroup.add_argument("--snapshotcache", action="store", help="Write --out, --diffout, and --patchout through a cache folder which concurrent runs may share. Each file is atomically replaced while holding an advisory lock on its path. Folders written by --shards are also locked while they are written or read")
+        pgroup.add_argument("--shards", action="store_true", help="Write --out as a folder with a shard per endpoint, named by its hash, and a manifest, so unchanged endpoints are not rewritten. --lhs, --rhs, --applypatch, and --timeline also accept these folders, and a diff of two folders only reads the shards which changed")
+        fgroup = parser.add_argument_group("Fetch", "Control the timeouts and retries used by --url")
+        fgroup.add_argument("--connecttimeout", action="store", type=float, default=10.0, help="The maximum number of seconds to wait for a connection. Default: 10")
+        fgroup.add_argument("--readtimeout", action="store", type=float, default=30.0, help="The maximum number of seconds to wait between bytes from the server. Default: 30")
+        fgroup.add_argument("--retries", action="store", type=int, default=3, help="The maximum number of times to retry a timeout, connection error, HTTP 429, or HTTP 5xx. Default: 3")
+        fgroup.add_argument("--deadline", action="store", type=float, help="The maximum number of seconds to spend fetching, including all retries")
+        fgroup.add_argument("--hedgeafter", action="store", type=float, help="Start a second request if the first has not completed after the specified number of seconds, and use whichever succeeds first")
         dgroup = parser.add_argument_group("Diff", "Diff two dicts created by the parser. If only one of --lhs/--rhs is specified, the other is taken from the output of parsing --file/--url")
-        dgroup.add_argument("--lhs", action="store", help="Load a JSON file created by parse as the LHS (Original)")
-        dgroup.add_argument("--rhs", action="store", help="Load a JSON file created by parse as the RHS (New/Modified)")
+        dgroup.add_argument("--lhs", action="store", help="Load a JSON file created by parse as the LHS (Original). May be compressed with gzip or zstd")
+        dgroup.add_argument("--rhs", action="store", help="Load a JSON file created by parse as the RHS (New/Modified). May be compressed with gzip or zstd")
         dgroup.add_argument("--diffout", action="store", help="Output diff as JSON to the specified file instead of STDOUT")
         dgroup.add_argument("--diffpretty", action="store_true", help="Prettyfi the parser output when using --diffout")
+        dgroup.add_argument("--context", action="store", type=int, help="Trim the unchanged text in string diffs to the specified number of characters or words around each change")
+        dgroup.add_argument("--contextunit", action="store", choices=["chars", "words"], default="chars", help="The unit of --context. Default: chars")
+        dgroup.add_argument("--renames", action="store_true", help="Report similar removed and added endpoints as renames, and TOC entries which changed category as moves")
+        dgroup.add_argument("--diffworkers", action="store", type=int, help="Diff the endpoints which changed in the specified number of processes. The output is identical to diffing in a single process. Default: 1")
+        dgroup.add_argument("--diffbenchmark", action="store", type=int, nargs="+", help="Output the time taken to diff --lhs and --rhs with each of the specified numbers of --diffworkers, and the speedup over the first, instead of the diff")
+        dgroup.add_argument("--stat", action="store_true", help="Output the number of added, removed, and modified TOC entries, endpoints, and endpoint fields instead of the diff, without computing string diffs")
+        dgroup.add_argument("--check", action="store_true", help="Output {\"changed\": true} or {\"changed\": false} instead of the diff, stopping at the first difference")
+        dgroup.add_argument("--compact", action="store_true", help="Load the inputs of the diff and --timeline into a compact typed model, which uses less memory than dicts when the snapshots are large or many")
+        dgroup.add_argument("--patchout", action="store", help="Also output an RFC 6902 JSON Patch which turns the LHS into the RHS to the specified file. Uses --diffpretty and --compress")
+        dgroup.add_argument("--patchorder", action="store_true", help="Also preserve the order of keys in --patchout, by moving keys to their own location. Only --applypatch is known to support these moves")
+        tgroup = parser.add_argument_group("Timeline", "Output the change history of each endpoint over several JSON files created by parse, to --diffout or STDOUT")
+        tgroup.add_argument("--timeline", action="store", nargs="+", help="Load the JSON files created by parse, oldest first. May be compressed with gzip or zstd")
+        agroup = parser.add_argument_group("Apply Patch", "Rebuild a dict created by the parser by applying a JSON Patch created by --patchout to --lhs. The result is output like the result of parsing --file/--url")
+        agroup.add_argument("--applypatch", action="store", help="Load a JSON Patch file created by --patchout. May be compressed with gzip or zstd")
+        self.addArguments(parser)
         args = parser.parse_args()
-        if args.url == None and args.file == None and args.lhs == None and args.rhs == None:
+        if args.url == None and args.file == None and args.lhs == None and args.rhs == None and args.timeline == None:
             parser.error("must provide at least 1 argument")
+        if args.timeline != None and (args.url != None or args.file != None or args.lhs != None or args.rhs != None):
+            parser.error("argument --timeline: not allowed with arguments --file, --url, --lhs, or --rhs")
+        if args.applypatch != None and (args.url != None or args.file != None or args.rhs != None or args.patchout != None):
+            parser.error("argument --applypatch: not allowed with arguments --file, --url, --rhs, or --patchout")
+        if args.applypatch != None and args.lhs == None:
+            parser.error("argument --applypatch: requires argument --lhs")
         if args.file != None and args.lhs != None and args.rhs != None:
             parser.error("argument --file: not allowed when using both arguments --lhs and --rhs")
         if args.url != None and args.lhs != None and args.rhs != None:
             parser.error("argument --url: not allowed when using both arguments --lhs and --rhs")
-        if args.url == None and args.file == None and (args.lhs == None or args.rhs == None):
+        if args.applypatch == None and args.timeline == None and args.url == None and args.file == None and (args.lhs == None or args.rhs == None):
             parser.error("can not diff with only 1 input")
+        if args.stat and args.check:
+            parser.error("argument --stat: not allowed with argument --check")
+        if args.diffbenchmark != None and (args.stat or args.check):
+            parser.error("argument --diffbenchmark: not allowed with arguments --stat or --check")
+        if (args.diffbenchmark != None and any(count < 1 for count in args.diffbenchmark)) or (args.diffworkers != None and args.diffworkers < 1):
+            parser.error("arguments --diffworkers and --diffbenchmark must be at least 1")
+        if args.shards and args.out == None:
+            parser.error("argument --shards: requires argument --out")
+        if args.patchorder and args.patchout == None:
+            parser.error("argument --patchorder: requires argument --patchout")
+        self.fetcher = Fetcher(connectTimeout=args.connecttimeout, readTimeout=args.readtimeout, retries=args.retries, deadline=args.deadline, hedgeAfter=args.hedgeafter)
+        self.context = args.context
+        self.contextUnit = args.contextunit
+        self.renames = args.renames
+        self.diffWorkers = args.diffworkers
+        if args.compact:
+            self.model = ParseModel()
+        if args.snapshotcache != None:
+            self.cache = SnapshotCache(args.snapshotcache)
+        self.applyArguments(args)
         retp = None
         retd = None
-        if args.file != None:
+        outPath = None
+        if args.applypatch != None:
+            try:
+                retp = self.applyPatch(self.readSnapshot(args.lhs), self.readSnapshot(args.applypatch))
+            except JsonPatch.JsonPatchError as e:
+                parser.exit(1, "Applying " + args.applypatch + " failed: " + str(e) + "\n")
+            args.lhs = None
+        elif args.file != None:
             retp = self.parseFromFile(args.file)
         elif args.url != None:
-            retp = self.parseFromUrl(args.url)
+            try:
+                retp = self.parseFromUrl(args.url)
+            except FetchError as e:
+                parser.exit(1, str(e) + "\n")
         if retp != None:
             if args.out == None:
                 print(json.dumps(retp, indent=4))
@@ -514,17 +1565,43 @@ class BaseParser:
                     indent=4
                 else:
                     indent=None
-                with open(args.out, "w", encoding="utf8") as pout_file:
-                    json.dump(retp, pout_file, indent=indent)
+                if args.shards:
+                    self.writeShards(args.out, retp)
+                else:
+                    self.writeSnapshot(args.out, retp, indent, args.compress)
                 if args.lhs != None or args.rhs != None:
-                    with open(args.out, "r", encoding="utf8") as json_file:
-                        retp = json.load(json_file)
-        if args.lhs != None and args.rhs != None:
-            retd = self.diffWithFiles(args.lhs, args.rhs)
+                    outPath = args.out
+        lhs = None
+        rhs = None
+        lhsPath = args.lhs if args.lhs != None else outPath
+        rhsPath = args.rhs if args.rhs != None else outPath
+        if args.patchout == None and lhsPath != None and rhsPath != None and self.isShards(lhsPath) and self.isShards(rhsPath):
+            lhs, rhs = self.readChangedShards(lhsPath, rhsPath)
+        elif args.lhs != None and args.rhs != None:
+            lhs = self.readSnapshot(args.lhs)
+            rhs = self.readSnapshot(args.rhs)
         elif args.lhs != None and retp != None:
-            retd = self.diffWithFileL(args.lhs, retp)
+            lhs = self.readSnapshot(args.lhs)
+            rhs = self.readSnapshot(outPath) if outPath != None else retp
         elif args.rhs != None and retp != None:
-            retd = self.diffWithFileR(retp, args.rhs)
+            lhs = self.readSnapshot(outPath) if outPath != None else retp
+            rhs = self.readSnapshot(args.rhs)
+        if args.timeline != None:
+            retd = self.timeline(args.timeline)
+        if lhs != None:
+            if args.patchout != None:
+                self.writeSnapshot(args.patchout, self.patch(lhs, rhs, args.patchorder), 4 if args.diffpretty else None, args.compress)
+            if self.model != None:
+                lhs = self.model.fromJson(lhs)
+                rhs = self.model.fromJson(rhs)
+            if args.check:
+                retd = {"changed": self.hasChanged(lhs, rhs)}
+            elif args.stat:
+                retd = self.stat(lhs, rhs)
+            elif args.diffbenchmark != None:
+                retd = self.benchmarkDiff(lhs, rhs, args.diffbenchmark)
+            else:
+                retd = self.diff(lhs, rhs)
         if retd != None:
             if retp != None and args.out == None:
                 print("")
@@ -535,5 +1612,19 @@ class BaseParser:
                     indent=4
                 else:
                     indent=None
-                with open(args.diffout, "w", encoding="utf8") as dout_file:
-                    json.dump(retd, dout_file, indent=indent)
\ No newline at end of file
+                self.writeSnapshot(args.diffout, retd, indent, args.compress)
+
+def diffChunk(chunk:bytes, context:int | None, contextUnit:str) -> bytes:
+    """
+    Diff a chunk of the endpoints sent by BaseParser.diffEndpoints(dict, dict). Runs in a worker process
+
+    Args:
+        chunk (bytes): The name, "original" value, and "new/modified" value of each endpoint, encoded as JSON
+        context (int | None): The context of the parser
+        contextUnit (str): The contextUnit of the parser
+
+    Returns:
+        bytes: The name and diff of each endpoint, encoded as JSON
+    """
+    parser = BaseParser(context=context, contextUnit=contextUnit)
+    return json.dumps([[endpoint, parser.diffEndpoint(lv, rv)] for endpoint, lv, rv in json.loads(chunk)]).encode("utf8")
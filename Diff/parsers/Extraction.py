@@ -0,0 +1,224 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from bs4 import Tag
+from collections.abc import Callable, Iterable
+
+def string(tag) -> str:
+    """
+    Returns the single string inside a tag, stripped of surrounding whitespace
+
+    Args:
+        tag: A BeautifulSoup element
+
+    Returns:
+        str: The string; "None" if the tag does not contain exactly one string
+    """
+    return str(tag.string).strip()
+
+def text(tag) -> str:
+    """
+    Returns all of the strings inside a tag, each stripped of surrounding whitespace, joined with a single space
+
+    Args:
+        tag: A BeautifulSoup element
+
+    Returns:
+        str: The text
+    """
+    return " ".join([str(x) for x in tag.stripped_strings])
+
+def nextTags(tag):
+    """
+    Yields the following siblings of a tag which are also tags, skipping strings
+
+    Args:
+        tag: A BeautifulSoup element
+
+    Yields:
+        Tag: Each following sibling tag, in document order
+    """
+    for sibling in tag.next_siblings:
+        if isinstance(sibling, Tag):
+            yield sibling
+
+readers = {
+    "string": string,
+    "text": text
+}
+"""
+The named readers which can be used by a Column
+"""
+
+class Column:
+    """
+    Declares how to read one cell of a table row into a field of the output dict
+    """
+    def __init__(self, name:str, read:str | Callable = "string", minCells:int = 0, headers:Iterable[str] = ()):
+        """
+        Args:
+            name (str): The key of the field in the output dict
+            read (str | Callable): The name of a reader in readers, or a function which takes the cell and returns the value. Default: string
+            minCells (int): The column is only present in rows with more than this many cells, and only if every previous optional column was present. Columns after it shift left when it is absent. Default: 0, which means always present
+            headers (Iterable[str]): Lowercase values of this column which indicate a header row. A row is skipped if every column has a header value. Default: None
+        """
+        self.name = name
+        self.read = readers[read] if isinstance(read, str) else read
+        self.minCells = minCells
+        self.headers = frozenset(headers)
+
+class Table:
+    """
+    Declares how to read the rows of the tbody of a table into a list of dicts
+
+    The columns are compiled once into a tuple of readers, so reading a table performs no tree searches other than locating the tbody
+    """
+    def __init__(self, *columns:Column):
+        """
+        Args:
+            *columns (Column): The columns, in order
+        """
+        self.columns = tuple((c.name, c.read, c.minCells, c.headers) for c in columns)
+        self.skipHeaders = any(len(c.headers) > 0 for c in columns)
+
+    def rows(self, table:Tag) -> list:
+        """
+        Read the rows of a table
+
+        Args:
+            table (Tag): The table tag
+
+        Returns:
+            list: A list containing a dict for each row, with a key for each column which is present in the row
+        """
+        ret = []
+        for entry in table.find("tbody").find_all("tr"):
+            cells = entry.find_all("td")
+            row = {}
+            valid = not self.skipHeaders
+            i = 0
+            optional = True
+            for name, read, minCells, headers in self.columns:
+                if minCells > 0:
+                    optional = optional and len(cells) > minCells
+                    if not optional:
+                        continue
+                value = read(cells[i])
+                i += 1
+                row[name] = value
+                if not valid and (len(headers) == 0 or not isinstance(value, str) or value.lower() not in headers):
+                    valid = True
+            if valid:
+                ret.append(row)
+        return ret
+
+class Segment:
+    """
+    A run of consecutive children of a container which belong to the same section, as produced by Outline.segments(Tag)
+    """
+    __slots__ = ("name", "headings", "content")
+    def __init__(self, name:str | None):
+        """
+        Args:
+            name (str | None): The name of the section; None for the children before the first heading
+        """
+        self.name = name
+        self.headings = []
+        self.content = []
+
+class Outline:
+    """
+    Declares how to split the children of a container into named sections, in a single pass
+
+    Headings are matched by tag name and then by their string, either exactly or by prefix, and name the section which the following children belong to.
+    A heading which names the section that is already open continues it, rather than starting a new one. A heading which does not match any rule is dropped.
+    Switches start a new section at a child that is not a heading, when a predicate matches it while a specific section is open; the child then belongs to the new section
+    """
+    def __init__(self, headings:Iterable[tuple], switches:Iterable[tuple] = (), content:Callable | None = None):
+        """
+        Args:
+            headings (Iterable[tuple]): The heading rules, in priority order, as tuples of (tagName, section, exact, prefixes). exact is a collection of strings
+                which must equal the stripped heading string; prefixes is a collection of strings which the stripped heading string must start with; if both are None, any heading with tagName matches
+            switches (Iterable[tuple]): The switch rules, as tuples of (section, predicate, newSection). Default: None
+            content (Callable | None): A predicate which selects the non-heading children that are kept in Segment.content. Default: None, which keeps all children, including strings
+        """
+        self.headings = {}
+        for tagName, section, exact, prefixes in headings:
+            self.headings.setdefault(tagName, []).append((section, frozenset(exact) if exact is not None else None, tuple(prefixes) if prefixes is not None else None))
+        self.switches = {}
+        for section, predicate, newSection in switches:
+            self.switches.setdefault(section, []).append((predicate, newSection))
+        self.content = content
+
+    def match(self, tag) -> str | None:
+        """
+        Returns the section named by a heading
+
+        Args:
+            tag: A child of the container
+
+        Returns:
+            str | None: The section name; None if the child is not a heading or does not match any rule
+        """
+        rules = self.headings.get(tag.name)
+        if rules is None:
+            return None
+        heading = None
+        for section, exact, prefixes in rules:
+            if exact is None and prefixes is None:
+                return section
+            if heading is None:
+                if tag.string is None:
+                    return None
+                heading = tag.string.strip()
+            if (exact is not None and heading in exact) or (prefixes is not None and heading.startswith(prefixes)):
+                return section
+        return None
+
+    def segments(self, container:Tag) -> list:
+        """
+        Split the children of a container into sections
+
+        Args:
+            container (Tag): The container
+
+        Returns:
+            list: A list of Segment, in document order. The first Segment always has the name None, and contains the children before the first heading
+        """
+        current = Segment(None)
+        ret = [current]
+        for child in container.children:
+            if child.name in self.headings:
+                section = self.match(child)
+                if section is None:
+                    continue
+                if section != current.name:
+                    current = Segment(section)
+                    ret.append(current)
+                current.headings.append(child)
+                continue
+            if self.content is not None and not self.content(child):
+                continue
+            for predicate, newSection in self.switches.get(current.name, ()):
+                if predicate(child):
+                    current = Segment(newSection)
+                    ret.append(current)
+                    break
+            current.content.append(child)
+        return ret
@@ -0,0 +1,274 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from collections import deque
+import codecs
+from collections.abc import Callable
+from concurrent.futures import as_completed, ThreadPoolExecutor, wait
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+import math
+import random
+import requests
+import time
+
+class FetchError(Exception):
+    """
+    Raised when a page could not be fetched
+    """
+    def __init__(self, url:str, status:int|None, message:str):
+        """
+        Args:
+            url (str): The URL that was being fetched
+            status (int | None): The HTTP status code of the response, if one was received
+            message (str): A description of the error
+        """
+        super().__init__(message)
+        self.url = url
+        self.status = status
+
+class Fetcher:
+    """
+    Fetches pages over HTTP with bounded latency
+
+    Every request has a connect and read timeout, and all requests made by the same instance share an optional overall deadline.
+    Connection errors, timeouts, HTTP 429, and HTTP 5xx are retried with jittered exponential backoff, honouring Retry-After up to a limit.
+    Optionally, a second hedged request is started if the first has not completed after a percentile of the previously observed latencies, and the first to succeed is used
+    """
+    userAgent = "streamactions.diff.parser/1"
+    """
+    The user agent sent with each request
+    """
+    retryStatuses = frozenset([429, 500, 502, 503, 504])
+    """
+    HTTP status codes which are retried
+    """
+    chunkSize = 65536
+    """
+    The maximum size of the chunks the response body is read in. The deadline is checked after every chunk
+    """
+    def __init__(self, connectTimeout:float = 10.0, readTimeout:float = 30.0, retries:int = 3, backoff:float = 1.0, maxBackoff:float = 30.0,
+                 deadline:float | None = None, maxRetryAfter:float = 120.0, hedgePercentile:float | None = None, hedgeAfter:float | None = None, hedgeMinSamples:int = 5):
+        """
+        Args:
+            connectTimeout (float): The maximum number of seconds to wait for a connection. Default: 10
+            readTimeout (float): The maximum number of seconds to wait between bytes from the server. Default: 30
+            retries (int): The maximum number of times to retry a failed request. Default: 3
+            backoff (float): The base of the exponential backoff between retries, in seconds. Default: 1
+            maxBackoff (float): The maximum backoff between retries, in seconds, excluding Retry-After. Default: 30
+            deadline (float | None): The number of seconds from now after which all requests made by this instance fail. Default: None
+            maxRetryAfter (float): The maximum Retry-After, in seconds. A response which asks to wait longer fails the fetch instead of being retried. Default: 120
+            hedgePercentile (float | None): Start a hedged request if the first has not completed after this percentile, from 0 to 100, of the observed latencies. Default: None
+            hedgeAfter (float | None): Start a hedged request if the first has not completed after this many seconds, until hedgeMinSamples latencies have been observed. Default: None
+            hedgeMinSamples (int): The number of latencies which must be observed before hedgePercentile is used. Default: 5
+        """
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.deadline = time.monotonic() + deadline if deadline is not None else None
+        self.maxRetryAfter = maxRetryAfter
+        self.hedgePercentile = hedgePercentile
+        self.hedgeAfter = hedgeAfter
+        self.hedgeMinSamples = hedgeMinSamples
+        self.latencies = deque(maxlen=100)
+
+    def remaining(self) -> float | None:
+        """
+        Returns the number of seconds until the deadline
+
+        Returns:
+            float | None: The number of seconds remaining, which may be negative; None if there is no deadline
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def timeout(self) -> tuple:
+        """
+        Returns the connect and read timeouts for the next request, shortened to fit within the deadline
+
+        Returns:
+            tuple: The connect and read timeouts, in seconds
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return (self.connectTimeout, self.readTimeout)
+        remaining = max(remaining, 0.001)
+        return (min(self.connectTimeout, remaining), min(self.readTimeout, remaining))
+
+    def hedgeDelay(self) -> float | None:
+        """
+        Returns the number of seconds to wait for a request before starting a hedged request
+
+        Returns:
+            float | None: The delay, in seconds; None if hedging is disabled or there is not enough data yet
+        """
+        if self.hedgePercentile is not None and len(self.latencies) >= self.hedgeMinSamples:
+            latencies = sorted(self.latencies)
+            return latencies[min(len(latencies) - 1, max(0, math.ceil(self.hedgePercentile / 100 * len(latencies)) - 1))]
+        return self.hedgeAfter
+
+    def retryDelay(self, attempt:int, retryAfter:float | None) -> float:
+        """
+        Returns the number of seconds to wait before a retry
+
+        Args:
+            attempt (int): The 0-based number of the attempt which failed
+            retryAfter (float | None): The number of seconds from the Retry-After header of the failed response, if any
+
+        Returns:
+            float: The delay, in seconds
+        """
+        if retryAfter is not None:
+            return max(retryAfter, 0.0)
+        return random.uniform(0, min(self.maxBackoff, self.backoff * (2 ** attempt)))
+
+    @staticmethod
+    def parseRetryAfter(value:str | None) -> float | None:
+        """
+        Parses the value of a Retry-After header
+
+        Args:
+            value (str | None): The header value, either a number of seconds or an HTTP date
+
+        Returns:
+            float | None: The number of seconds to wait; None if the value is missing or invalid
+        """
+        if value is None:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+
+    def request(self, url:str, normalize:Callable[[str], str] | None = None) -> tuple:
+        """
+        Make a single request and read the entire response body, without retries or hedging
+
+        The body is decompressed, decoded, and normalized incrementally as it arrives, so only the normalized text is ever held in full
+
+        Args:
+            url (str): The URL to fetch
+            normalize (Callable[[str], str] | None): A function applied to each decoded chunk of the body. Default: None
+
+        Returns:
+            tuple: The requests.Response, with the body already consumed, and the decoded and normalized body as str
+
+        Raises:
+            FetchError: The deadline passed
+            requests.RequestException: The request failed or timed out
+        """
+        start = time.monotonic()
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise FetchError(url, None, "Deadline exceeded fetching " + url)
+        resp = requests.get(url, headers = { "User-Agent": self.userAgent }, timeout=self.timeout(), stream=True)
+        try:
+            chunks = []
+            decoder = codecs.getincrementaldecoder(resp.encoding if resp.encoding else "utf-8")(errors="replace")
+            # read1 returns as soon as any data is available, so a server which trickles the body can not hold the request past the deadline
+            chunk = resp.raw.read1(self.chunkSize, decode_content=True)
+            while len(chunk) > 0:
+                text = decoder.decode(chunk)
+                chunks.append(normalize(text) if normalize is not None else text)
+                remaining = self.remaining()
+                if remaining is not None and remaining <= 0:
+                    raise FetchError(url, resp.status_code, "Deadline exceeded fetching " + url)
+                chunk = resp.raw.read1(self.chunkSize, decode_content=True)
+            text = decoder.decode(b"", final=True)
+            chunks.append(normalize(text) if normalize is not None else text)
+        finally:
+            resp.close()
+        self.latencies.append(time.monotonic() - start)
+        return resp, "".join(chunks)
+
+    def hedgedRequest(self, url:str, normalize:Callable[[str], str] | None = None) -> tuple:
+        """
+        Make a request, starting a second identical request if the first is slower than hedgeDelay(), and return whichever succeeds first
+
+        Args:
+            url (str): The URL to fetch
+            normalize (Callable[[str], str] | None): A function applied to each decoded chunk of the body. Default: None
+
+        Returns:
+            tuple: The output of request(str) for the winning request
+
+        Raises:
+            FetchError: The deadline passed
+            requests.RequestException: All requests failed or timed out
+        """
+        delay = self.hedgeDelay()
+        if delay is None:
+            return self.request(url, normalize)
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            futures = [executor.submit(self.request, url, normalize)]
+            done, _ = wait(futures, timeout=delay)
+            if len(done) == 0:
+                futures.append(executor.submit(self.request, url, normalize))
+            for future in as_completed(futures):
+                if future.exception() is None:
+                    return future.result()
+            raise futures[0].exception()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch(self, url:str, normalize:Callable[[str], str] | None = None) -> str:
+        """
+        Fetch a page, retrying transient failures until the retries or the deadline run out
+
+        Responses using a Content-Encoding supported by urllib3, such as gzip or br, are decompressed as they are streamed
+
+        Args:
+            url (str): The URL to fetch
+            normalize (Callable[[str], str] | None): A function applied to each decoded chunk of the body. Must not depend on the surrounding chunks. Default: None
+
+        Returns:
+            str: The decoded and normalized body of the page
+
+        Raises:
+            FetchError: The page could not be fetched with HTTP status 200
+        """
+        attempt = 0
+        while True:
+            retryAfter = None
+            try:
+                resp, text = self.hedgedRequest(url, normalize)
+            except requests.RequestException as e:
+                error = FetchError(url, None, str(e))
+            else:
+                if resp.status_code == 200:
+                    return text
+                error = FetchError(url, resp.status_code, "HTTP " + str(resp.status_code) + " fetching " + url)
+                if resp.status_code not in self.retryStatuses:
+                    raise error
+                retryAfter = self.parseRetryAfter(resp.headers.get("Retry-After"))
+            if attempt >= self.retries:
+                raise error
+            delay = self.retryDelay(attempt, retryAfter)
+            remaining = self.remaining()
+            if delay > self.maxRetryAfter or (remaining is not None and delay >= remaining):
+                raise error
+            time.sleep(delay)
+            attempt += 1
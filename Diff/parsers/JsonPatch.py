@@ -0,0 +1,303 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+from difflib import SequenceMatcher
+import copy
+import json
+
+class JsonPatchError(Exception):
+    """
+    Raised when a JSON Patch can not be applied to a document
+    """
+    def __init__(self, operation:dict, message:str):
+        """
+        Args:
+            operation (dict): The operation which failed
+            message (str): A description of the error
+        """
+        super().__init__(message)
+        self.operation = operation
+
+def escape(token:str) -> str:
+    """
+    Escape a reference token of a JSON Pointer (RFC 6901)
+
+    Args:
+        token (str): The key or index
+
+    Returns:
+        str: The escaped token
+    """
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+def unescape(token:str) -> str:
+    """
+    Unescape a reference token of a JSON Pointer (RFC 6901)
+
+    Args:
+        token (str): The escaped token
+
+    Returns:
+        str: The key or index
+    """
+    return token.replace("~1", "/").replace("~0", "~")
+
+def pointer(path:str) -> list:
+    """
+    Split a JSON Pointer (RFC 6901) into its unescaped reference tokens
+
+    Args:
+        path (str): The JSON Pointer
+
+    Returns:
+        list: The reference tokens; [] for the whole document
+
+    Raises:
+        ValueError: The JSON Pointer is not empty and does not start with /
+    """
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise ValueError("JSON Pointer " + path + " must start with /")
+    return [unescape(token) for token in path[1:].split("/")]
+
+def create(lhs:any, rhs:any, path:str = "", keepOrder:bool = False) -> list:
+    """
+    Create a JSON Patch (RFC 6902) which turns lhs into rhs
+
+    Objects are compared key by key. RFC 6902 does not define the order of the members of an object, so an added key ends up wherever the implementation applying the patch puts it.
+    If keepOrder is set, the key order of rhs is also preserved by moving each key which would otherwise be out of order to its own location, which apply(any, list) treats as moving it to the end.
+    Other implementations may treat such a move as doing nothing, or reject it.
+    Arrays are aligned with difflib, so an insertion or removal in the middle of an array does not replace every element after it.
+    The operations for an array are emitted from the end of the array towards the start, so each index refers to lhs as it was before any earlier element changed
+
+    Args:
+        lhs (any): The "original" document
+        rhs (any): The "new/modified" document
+        path (str): The JSON Pointer of lhs and rhs within the document. Default: "", the whole document
+        keepOrder (bool): Preserve the key order of the objects in rhs with moves of keys to their own location, which only apply(any, list) is known to support. Default: False
+
+    Returns:
+        list: The operations of the JSON Patch; [] if lhs and rhs are equal
+    """
+    if type(lhs) != type(rhs):
+        return [{"op": "replace", "path": path, "value": rhs}]
+    if isinstance(lhs, dict):
+        return createObject(lhs, rhs, path, keepOrder)
+    if isinstance(lhs, list):
+        return createArray(lhs, rhs, path, keepOrder)
+    if lhs != rhs:
+        return [{"op": "replace", "path": path, "value": rhs}]
+    return []
+
+def createObject(lhs:dict, rhs:dict, path:str, keepOrder:bool) -> list:
+    """
+    Create the operations of a JSON Patch which turn one object into another (see create(any, any, str, bool))
+
+    Args:
+        lhs (dict): The "original" object
+        rhs (dict): The "new/modified" object
+        path (str): The JSON Pointer of the objects
+        keepOrder (bool): Preserve the key order of rhs
+
+    Returns:
+        list: The operations
+    """
+    ret = []
+    for k in lhs:
+        if k not in rhs:
+            ret.append({"op": "remove", "path": path + "/" + escape(k)})
+    for k in lhs:
+        if k in rhs:
+            ret.extend(create(lhs[k], rhs[k], path + "/" + escape(k), keepOrder))
+    added = [k for k in rhs if k not in lhs]
+    for k in added:
+        ret.append({"op": "add", "path": path + "/" + escape(k), "value": rhs[k]})
+    if not keepOrder:
+        return ret
+    # Added keys are appended, so the keys of rhs after the longest prefix which is already in order are moved to the end in turn
+    position = {k: i for i, k in enumerate([k for k in lhs if k in rhs] + added)}
+    expected = list(rhs)
+    i = 0
+    last = -1
+    while i < len(expected) and position[expected[i]] > last:
+        last = position[expected[i]]
+        i += 1
+    for k in expected[i:]:
+        ret.append({"op": "move", "from": path + "/" + escape(k), "path": path + "/" + escape(k)})
+    return ret
+
+def createArray(lhs:list, rhs:list, path:str, keepOrder:bool) -> list:
+    """
+    Create the operations of a JSON Patch which turn one array into another (see create(any, any, str, bool))
+
+    Args:
+        lhs (list): The "original" array
+        rhs (list): The "new/modified" array
+        path (str): The JSON Pointer of the arrays
+        keepOrder (bool): Preserve the key order of the objects in rhs
+
+    Returns:
+        list: The operations
+    """
+    ret = []
+    matcher = SequenceMatcher(None, [json.dumps(x) for x in lhs], [json.dumps(x) for x in rhs], autojunk=False)
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            continue
+        if tag == "replace" and i2 - i1 == j2 - j1:
+            for k in reversed(range(i2 - i1)):
+                ret.extend(create(lhs[i1 + k], rhs[j1 + k], path + "/" + str(i1 + k), keepOrder))
+            continue
+        for i in reversed(range(i1, i2)):
+            ret.append({"op": "remove", "path": path + "/" + str(i)})
+        for j in range(j1, j2):
+            ret.append({"op": "add", "path": path + "/" + str(i1 + j - j1), "value": rhs[j]})
+    return ret
+
+def resolve(document:any, tokens:list, operation:dict) -> any:
+    """
+    Find the value referenced by the reference tokens of a JSON Pointer
+
+    Args:
+        document (any): The document
+        tokens (list): The reference tokens
+        operation (dict): The operation being applied, for error reporting
+
+    Returns:
+        any: The value
+
+    Raises:
+        JsonPatchError: The value does not exist
+    """
+    for token in tokens:
+        if isinstance(document, dict) and token in document:
+            document = document[token]
+        elif isinstance(document, list) and token.isdigit() and (token == "0" or not token.startswith("0")) and int(token) < len(document):
+            document = document[int(token)]
+        else:
+            raise JsonPatchError(operation, "Path /" + "/".join(escape(x) for x in tokens) + " does not exist")
+    return document
+
+def remove(document:any, tokens:list, operation:dict) -> any:
+    """
+    Remove a value from a document
+
+    Args:
+        document (any): The document
+        tokens (list): The reference tokens of the value, which must not be empty
+        operation (dict): The operation being applied, for error reporting
+
+    Returns:
+        any: The removed value
+
+    Raises:
+        JsonPatchError: The value does not exist
+    """
+    resolve(document, tokens, operation)
+    parent = resolve(document, tokens[:-1], operation)
+    if isinstance(parent, list):
+        return parent.pop(int(tokens[-1]))
+    return parent.pop(tokens[-1])
+
+def add(document:any, tokens:list, value:any, operation:dict) -> any:
+    """
+    Add a value to a document, replacing the value of an existing object member
+
+    Args:
+        document (any): The document
+        tokens (list): The reference tokens of the value
+        value (any): The value
+        operation (dict): The operation being applied, for error reporting
+
+    Returns:
+        any: The document, which is replaced by value if tokens is empty
+
+    Raises:
+        JsonPatchError: The parent of the value does not exist, or the array index is out of range
+    """
+    if len(tokens) == 0:
+        return value
+    parent = resolve(document, tokens[:-1], operation)
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        if token == "-":
+            parent.append(value)
+        elif token.isdigit() and (token == "0" or not token.startswith("0")) and int(token) <= len(parent):
+            parent.insert(int(token), value)
+        else:
+            raise JsonPatchError(operation, "Array index " + token + " is out of range")
+    else:
+        raise JsonPatchError(operation, "Path " + operation["path"] + " does not have a container as its parent")
+    return document
+
+def apply(document:any, patch:list) -> any:
+    """
+    Apply a JSON Patch (RFC 6902) to a document
+
+    The document is not modified; a patched copy is returned. A move or copy to its own location removes the value and adds it back, which moves an object member to the end of the object
+
+    Args:
+        document (any): The document
+        patch (list): The operations of the JSON Patch
+
+    Returns:
+        any: The patched document
+
+    Raises:
+        JsonPatchError: An operation is invalid, or a test operation failed
+    """
+    document = copy.deepcopy(document)
+    for operation in patch:
+        op = operation.get("op")
+        try:
+            tokens = pointer(operation["path"])
+            if op in ("move", "copy"):
+                source = pointer(operation["from"])
+        except (KeyError, ValueError) as e:
+            raise JsonPatchError(operation, "Invalid operation: " + str(e)) from e
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(operation, "Invalid operation: " + str(op) + " requires a value")
+        if op == "add":
+            document = add(document, tokens, copy.deepcopy(operation["value"]), operation)
+        elif op == "remove":
+            if len(tokens) == 0:
+                raise JsonPatchError(operation, "Can not remove the whole document")
+            remove(document, tokens, operation)
+        elif op == "replace":
+            resolve(document, tokens, operation)
+            if len(tokens) == 0:
+                document = copy.deepcopy(operation["value"])
+            else:
+                parent = resolve(document, tokens[:-1], operation)
+                parent[int(tokens[-1]) if isinstance(parent, list) else tokens[-1]] = copy.deepcopy(operation["value"])
+        elif op == "move":
+            if tokens[:len(source)] == source and len(tokens) > len(source):
+                raise JsonPatchError(operation, "Can not move a value into one of its children")
+            value = remove(document, source, operation) if len(source) > 0 else document
+            document = add(document, tokens, value, operation)
+        elif op == "copy":
+            document = add(document, tokens, copy.deepcopy(resolve(document, source, operation)), operation)
+        elif op == "test":
+            if resolve(document, tokens, operation) != operation["value"]:
+                raise JsonPatchError(operation, "Test of " + operation["path"] + " failed")
+        else:
+            raise JsonPatchError(operation, "Unknown operation " + str(op))
+    return document
@@ -0,0 +1,330 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+from collections.abc import Callable, Iterator, Mapping
+import json
+import re
+
+class JsonStream:
+    """
+    Reads a JSON document from a text file a chunk at a time, so that a value can be skipped without being decoded or held in memory
+
+    Only the part of the file which has not been consumed yet is buffered, and a value which is decoded is buffered until it is complete
+    """
+    chunkSize = 65536
+    """
+    The number of characters read from the file at a time
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[ \t\n\r]*")
+    """
+    Matches the whitespace allowed between values
+    """
+    structural = re.compile(r"[\"{}\[\]]")
+    """
+    Matches the characters which start or end a value inside an object or array being skipped
+    """
+    stringEnd = re.compile(r"[\"\\]")
+    """
+    Matches the characters which end a string or start an escape inside of it
+    """
+    def __init__(self, text_file, chunkSize:int | None = None):
+        """
+        Args:
+            text_file: The file, opened in text mode. Closed by close()
+            chunkSize (int | None): The number of characters read from the file at a time. Default: None, which uses the class attribute chunkSize
+        """
+        self.file = text_file
+        if chunkSize != None:
+            self.chunkSize = chunkSize
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close the file
+        """
+        self.file.close()
+
+    def fill(self, size:int | None = None) -> bool:
+        """
+        Read more of the file into the buffer, dropping the part of the buffer which was consumed
+
+        Args:
+            size (int | None): The number of characters to read. Default: None, which reads chunkSize characters
+
+        Returns:
+            bool: False if the end of the file was reached
+        """
+        if self.eof:
+            return False
+        data = self.file.read(size if size != None else self.chunkSize)
+        if len(data) == 0:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character, without consuming it
+
+        Returns:
+            str: The character; an empty string at the end of the file
+        """
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char:str):
+        """
+        Skip whitespace and consume the next character, which must be char
+
+        Args:
+            char (str): The character
+
+        Raises:
+            ValueError: The next character is a different one
+        """
+        if self.peek() != char:
+            raise ValueError("Expected " + repr(char) + " in the JSON document, found " + repr(self.peek() or "the end of the file"))
+        self.pos += 1
+
+    def decode(self) -> any:
+        """
+        Decode and consume the next value
+
+        Returns:
+            any: The value
+
+        Raises:
+            json.JSONDecodeError: The value is not valid JSON
+        """
+        self.peek()
+        size = self.chunkSize
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number or literal which ends at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read as much again as is buffered, so a large value is decoded a bounded number of times
+            size = max(size, len(self.buffer) - self.pos)
+            self.fill(size)
+
+    def skip(self):
+        """
+        Consume the next value without decoding it
+
+        Raises:
+            ValueError: The file ends before the value does
+        """
+        char = self.peek()
+        if char == "\"":
+            self.pos += 1
+            self.skipString()
+            return
+        elif char not in ("{", "["):
+            self.decode()
+            return
+        try:
+            # A value which is already buffered is skipped faster by the decoder than by scanning
+            self.pos = self.decoder.raw_decode(self.buffer, self.pos)[1]
+            return
+        except json.JSONDecodeError:
+            pass
+        depth = 0
+        while True:
+            if self.pos >= len(self.buffer) and not self.fill():
+                raise ValueError("Unexpected end of the JSON document")
+            match = self.structural.search(self.buffer, self.pos)
+            if match == None:
+                self.pos = len(self.buffer)
+                continue
+            self.pos = match.end()
+            char = match.group()
+            if char == "\"":
+                self.skipString()
+            elif char in ("{", "["):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def skipString(self):
+        """
+        Consume the rest of a string, after its opening quote
+
+        Raises:
+            ValueError: The file ends before the string does
+        """
+        while True:
+            match = self.stringEnd.search(self.buffer, self.pos)
+            if match == None:
+                self.pos = len(self.buffer)
+            elif match.group() == "\"":
+                self.pos = match.end()
+                return
+            elif match.end() < len(self.buffer):
+                # Skip the escaped character, which may be a quote
+                self.pos = match.end() + 1
+                continue
+            else:
+                self.pos = match.start()
+            if not self.fill():
+                raise ValueError("Unexpected end of the JSON document")
+
+    def members(self) -> Iterator[str]:
+        """
+        Consume an object, yielding each key. The value of the key must be consumed, with decode() or skip(), before the next key is requested
+
+        Returns:
+            Iterator[str]: The keys
+
+        Raises:
+            ValueError: The next value is not an object
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != "\"":
+                raise ValueError("Expected a key in the JSON document, found " + repr(self.peek() or "the end of the file"))
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.peek() == "}":
+                self.pos += 1
+                return
+            self.expect(",")
+
+class StreamedObject(Mapping):
+    """
+    A read-only Mapping of a JSON object in a file, which reads the file again for each lookup or iteration instead of holding the object in memory
+
+    The values of the top lazyDepth levels of objects which are themselves objects are returned as StreamedObject, and every other value is decoded when it is returned.
+    items() and values() read the file once, instead of once per key
+    """
+    def __init__(self, opener:Callable, path:tuple = (), lazyDepth:int = 1, chunkSize:int | None = None):
+        """
+        Args:
+            opener (Callable): Returns the file containing the JSON document, opened in text mode, each time it is called
+            path (tuple): The keys of the object, starting from the object at the root of the document. Default: (), the root
+            lazyDepth (int): The number of levels, starting from the root, whose object values are returned as StreamedObject. Default: 1, which only decodes the values of the keys of the root one at a time
+            chunkSize (int | None): The number of characters read from the file at a time (see JsonStream). Default: None
+        """
+        self.opener = opener
+        self.path = path
+        self.lazyDepth = lazyDepth
+        self.chunkSize = chunkSize
+        self.length = None
+
+    def open(self) -> JsonStream:
+        """
+        Open the file, positioned at the start of this object
+
+        Returns:
+            JsonStream: The stream
+
+        Raises:
+            KeyError: A key of path is not in the file
+        """
+        stream = JsonStream(self.opener(), self.chunkSize)
+        try:
+            for key in self.path:
+                for name in stream.members():
+                    if name == key:
+                        break
+                    stream.skip()
+                else:
+                    raise KeyError(key)
+        except BaseException:
+            stream.close()
+            raise
+        return stream
+
+    def value(self, stream:JsonStream, key:str, consume:bool = True) -> any:
+        """
+        Read the value of a key from a stream
+
+        Args:
+            stream (JsonStream): The stream, positioned at the value
+            key (str): The key
+            consume (bool): Consume a value which is returned as a StreamedObject, so the stream can be read further. Default: True
+
+        Returns:
+            any: The value, which is a StreamedObject if it is an object in the top lazyDepth levels
+        """
+        if len(self.path) < self.lazyDepth and stream.peek() == "{":
+            if consume:
+                stream.skip()
+            return StreamedObject(self.opener, self.path + (key,), self.lazyDepth, self.chunkSize)
+        return stream.decode()
+
+    def __getitem__(self, key:str) -> any:
+        with self.open() as stream:
+            for name in stream.members():
+                if name == key:
+                    return self.value(stream, key, False)
+                stream.skip()
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        with self.open() as stream:
+            for name in stream.members():
+                stream.skip()
+                yield name
+
+    def __len__(self) -> int:
+        if self.length == None:
+            self.length = sum(1 for _ in self)
+        return self.length
+
+    def items(self) -> Iterator[tuple]:
+        """
+        Returns:
+            Iterator[tuple]: The key and value of each member, in the order of the file
+        """
+        with self.open() as stream:
+            for name in stream.members():
+                yield name, self.value(stream, name)
+
+    def values(self) -> Iterator[any]:
+        """
+        Returns:
+            Iterator[any]: The value of each member, in the order of the file
+        """
+        for _, value in self.items():
+            yield value
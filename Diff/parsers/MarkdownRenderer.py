@@ -0,0 +1,420 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import argparse
+from collections.abc import Iterator, Mapping
+import io
+import itertools
+import json
+import re
+import sys
+
+class MarkdownRenderer:
+    """
+    Renders a dict created by BaseParser.diff(dict, dict) as Markdown, such as for the body of a GitHub issue, without exceeding a budget of UTF-8 bytes
+
+    The Markdown is generated line by line, so it can be written as it is rendered, and rendering stops as soon as the budget is spent.
+    Sections are rendered in order of priority: a summary of the counts, a line per changed endpoint, the TOC changes, and finally the changes to each field of each endpoint.
+    When a section does not fit, it ends with a note of what was left out, and the sections after it are left out. Every value is cut to maxValue bytes, and nesting to maxDepth levels
+    """
+    issueBudget = 65536
+    """
+    The maximum size of the body of a GitHub issue
+    """
+    noteReserve = 160
+    """
+    The number of bytes kept free for the note at the end of a section which does not fit
+    """
+    maxValue = 400
+    """
+    The maximum number of bytes of a single value, such as a string diff, before it is cut
+    """
+    maxDepth = 8
+    """
+    The maximum nesting of the fields of an endpoint which are rendered
+    """
+    maxKeys = 8
+    """
+    The maximum number of changed fields named in the line of a modified endpoint
+    """
+    diffTag = re.compile(r"(</?(?:del|ins)>)")
+    """
+    Matches the tags which BaseParser.diffobj(any, any) puts around changed text. These are kept, since GitHub renders them
+    """
+    partialTag = re.compile(r"<[^<>]*$")
+    """
+    Matches a tag which was cut in half at the end of a value
+    """
+    markdownSpecial = re.compile(r"([\\`*_\[\]|~])")
+    """
+    Matches the characters which are escaped so that a value is rendered as plain text
+    """
+    whitespace = re.compile(r"\s+")
+    """
+    Matches runs of whitespace, which are collapsed into a space so that every value fits on one line
+    """
+    def __init__(self, budget:int = issueBudget, title:str | None = None):
+        """
+        Args:
+            budget (int): The maximum number of UTF-8 bytes to render. Default: issueBudget
+            title (str | None): A heading to render first. Default: None
+        """
+        self.budget = budget
+        self.title = title
+        self.remaining = budget
+
+    def fits(self, line:str, reserve:int = 0) -> bool:
+        """
+        Spend the budget for a line, if the line and reserve fit in what remains of it
+
+        Nothing is spent if the line does not fit, so a blank line and the line after it are checked together, as one line starting with a line break
+
+        Args:
+            line (str): The line, without the final line break
+            reserve (int): The number of bytes which must remain free after the line. Default: 0
+
+        Returns:
+            bool: True if the line fits and the budget was spent
+        """
+        size = len(line.encode("utf8")) + 1
+        if size + reserve > self.remaining:
+            return False
+        self.remaining -= size
+        return True
+
+    def note(self, text:str) -> Iterator[str]:
+        """
+        Render the note at the end of a section which does not fit, using the reserved budget
+
+        Args:
+            text (str): The note
+
+        Returns:
+            Iterator[str]: The lines of the note, if it fits
+        """
+        line = "_" + self.cut(text, self.noteReserve - 4) + "_"
+        if self.fits("\n" + line):
+            yield "\n"
+            yield line + "\n"
+
+    def cut(self, text:str, limit:int) -> str:
+        """
+        Cut a string to a number of UTF-8 bytes, keeping the <del></del> and <ins></ins> tags balanced
+
+        Args:
+            text (str): The string
+            limit (int): The maximum number of bytes
+
+        Returns:
+            str: The string, ending with an ellipsis if it was cut
+        """
+        encoded = text.encode("utf8")
+        if len(encoded) <= limit:
+            return text
+        text = encoded[:max(limit - 16, 0)].decode("utf8", "ignore")
+        text = self.partialTag.sub("", text)
+        closing = ""
+        for tag in ("del", "ins"):
+            if text.count("<" + tag + ">") > text.count("</" + tag + ">"):
+                closing += "</" + tag + ">"
+        return text + "…" + closing
+
+    def text(self, value:any) -> str:
+        """
+        Convert a value to Markdown which renders as its plain text on a single line, keeping the <del></del> and <ins></ins> tags
+
+        Args:
+            value (any): The value. Values other than strings are converted to JSON
+
+        Returns:
+            str: The Markdown, cut to maxValue bytes
+        """
+        if not isinstance(value, str):
+            value = json.dumps(value, default=dict)
+        value = self.cut(self.whitespace.sub(" ", value).strip(), self.maxValue)
+        parts = self.diffTag.split(value)
+        for i in range(0, len(parts), 2):
+            parts[i] = self.markdownSpecial.sub(r"\\\1", parts[i].replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;"))
+        return "".join(parts)
+
+    def code(self, value:str) -> str:
+        """
+        Convert a name, such as the key of a field, to a Markdown code span
+
+        Args:
+            value (str): The name
+
+        Returns:
+            str: The code span, cut to maxValue bytes
+        """
+        return "`" + self.cut(self.whitespace.sub(" ", str(value)).replace("`", "'").strip(), self.maxValue) + "`"
+
+    def operation(self, value:any) -> str:
+        """
+        Get the operation of an endpoint in a diff
+
+        Args:
+            value (any): The diff of the endpoint
+
+        Returns:
+            str: One of: add, remove, rename, modify
+        """
+        if isinstance(value, Mapping) and value.get("_operation") in ("add", "remove", "rename"):
+            return value["_operation"]
+        return "modify"
+
+    def changes(self, value:any) -> Mapping:
+        """
+        Get the changes to the fields of an endpoint in a diff
+
+        Args:
+            value (any): The diff of the endpoint
+
+        Returns:
+            Mapping: The diff of each field which changed; empty if the endpoint was added or removed
+        """
+        op = self.operation(value)
+        if op == "rename":
+            return value.get("changes") or {}
+        elif op == "modify" and isinstance(value, Mapping):
+            return value
+        return {}
+
+    def summary(self, diff:Mapping) -> list:
+        """
+        Render the summary of the counts of a diff
+
+        Args:
+            diff (Mapping): The diff
+
+        Returns:
+            list: The lines
+        """
+        endpoints = diff.get("endpoints", {})
+        toc = diff.get("toc", {})
+        if len(endpoints) == 0 and len(toc) == 0:
+            return ["No changes"]
+        counts = {"add": 0, "remove": 0, "rename": 0, "modify": 0}
+        for value in endpoints.values():
+            counts[self.operation(value)] += 1
+        names = {"add": "added", "remove": "removed", "rename": "renamed", "modify": "modified"}
+        line = "- **" + str(len(endpoints)) + "** endpoint" + ("" if len(endpoints) == 1 else "s") + " changed"
+        parts = [str(count) + " " + names[op] for op, count in counts.items() if count > 0]
+        if len(parts) > 0:
+            line += ": " + ", ".join(parts)
+        lines = [line]
+        if len(toc) > 0:
+            lines.append("- **" + str(len(toc)) + "** TOC categor" + ("y" if len(toc) == 1 else "ies") + " changed")
+        return lines
+
+    def endpointLine(self, name:str, value:any) -> str:
+        """
+        Render the line of an endpoint in the list of changed endpoints
+
+        Args:
+            name (str): The name of the endpoint
+            value (any): The diff of the endpoint
+
+        Returns:
+            str: The line
+        """
+        op = self.operation(value)
+        line = "- **" + self.text(name) + "**: "
+        if op == "add":
+            return line + "added"
+        elif op == "remove":
+            return line + "removed"
+        elif op == "rename":
+            line += "renamed from **" + self.text(value.get("from")) + "**"
+            value = value.get("changes") or {}
+        else:
+            line += "modified"
+        keys = [key for key in value if key != "_operation"] if isinstance(value, Mapping) else []
+        if len(keys) > 0:
+            line += " (" + ", ".join(self.code(key) for key in keys[:self.maxKeys]) + (", …" if len(keys) > self.maxKeys else "") + ")"
+        return line
+
+    def tocLines(self, toc:Mapping) -> Iterator[str]:
+        """
+        Render the TOC changes of a diff
+
+        Args:
+            toc (Mapping): The "toc" of the diff
+
+        Returns:
+            Iterator[str]: The lines, without line breaks
+        """
+        for category, value in toc.items():
+            if isinstance(value, Mapping):
+                yield "- **" + self.text(category) + "**: category " + ("added" if value.get("_operation") == "add" else "removed" if value.get("_operation") == "remove" else "changed")
+                continue
+            for entry in value:
+                if not isinstance(entry, Mapping):
+                    continue
+                op = entry.get("_operation")
+                line = "- **" + self.text(category) + "** / " + self.text(entry.get("endpoint"))
+                if op == "add":
+                    yield line + ": added"
+                elif op == "remove":
+                    yield line + ": removed"
+                elif op == "move":
+                    yield line + ": moved from **" + self.text(entry.get("from")) + "**"
+                elif op == "rename":
+                    yield line + ": renamed from " + self.text(entry.get("from"))
+                elif isinstance(entry.get("description"), Mapping):
+                    yield from self.fieldLines(line[2:] + " description", entry["description"], 0)
+
+    def fieldLines(self, path:str, value:any, depth:int) -> Iterator[str]:
+        """
+        Render the changes of a field of an endpoint, and of the fields inside it
+
+        Plain values in a diff, such as the context keys of a changed list item, are not changes, so they are only used to label the item
+
+        Args:
+            path (str): The Markdown of the name of the field, including its parents
+            value (any): The diff of the field
+            depth (int): The nesting of the field
+
+        Returns:
+            Iterator[str]: The lines, without line breaks
+        """
+        if depth > self.maxDepth:
+            yield "- " + path + ": …"
+            return
+        if isinstance(value, list):
+            for i, item in enumerate(value):
+                label = str(i)
+                if isinstance(item, Mapping):
+                    context = next((v for k, v in item.items() if k != "_operation" and isinstance(v, str)), None)
+                    if context != None:
+                        label = self.text(self.cut(context, 60))
+                yield from self.fieldLines(path + "[" + label + "]", item, depth + 1)
+            return
+        if not isinstance(value, Mapping):
+            return
+        op = value.get("_operation")
+        if op in ("replace", "insert", "delete"):
+            text = value.get("combined", value.get("rhs", value.get("lhs")))
+            yield "- " + path + " (" + op + "): " + self.text(text)
+        elif op in ("add", "remove"):
+            # Structure diffs keep the value of an added or removed key in "rhs" or "lhs"
+            content = value["string"] if "string" in value else value.get("rhs" if op == "add" else "lhs", {k: v for k, v in value.items() if k != "_operation"})
+            yield "- " + path + ": " + ("added" if op == "add" else "removed") + ((": " + self.text(content)) if content else "")
+        elif op == "structure":
+            yield from self.fieldLines(path, value.get("changes"), depth + 1)
+        elif op == "unknown":
+            yield "- " + path + ": " + self.text(value.get("lhs")) + " → " + self.text(value.get("rhs"))
+        elif op == None:
+            for key, item in value.items():
+                yield from self.fieldLines(path + "." + self.code(key), item, depth + 1)
+
+    def render(self, diff:Mapping) -> Iterator[str]:
+        """
+        Render a diff as Markdown
+
+        The diff is only iterated, a key at a time, so it may be a StreamedObject of a file which does not fit in memory
+
+        Args:
+            diff (Mapping): A dict created by BaseParser.diff(dict, dict), or a StreamedObject of a file containing one
+
+        Returns:
+            Iterator[str]: The Markdown, a line at a time, including the line breaks. The total size never exceeds budget
+        """
+        self.remaining = self.budget
+        endpoints = diff.get("endpoints", {})
+        toc = diff.get("toc", {})
+        header = ([] if self.title == None else ["## " + self.text(self.title), ""]) + self.summary(diff)
+        for line in header:
+            if not self.fits(line):
+                return
+            yield line + "\n"
+        if len(endpoints) > 0:
+            if not self.fits("\n### Endpoints", self.noteReserve):
+                yield from self.note("The endpoints, TOC changes, and details are not shown")
+                return
+            yield "\n### Endpoints\n"
+            for i, (name, value) in enumerate(endpoints.items()):
+                line = self.endpointLine(name, value)
+                if not self.fits(line, self.noteReserve):
+                    yield from self.note(str(len(endpoints) - i) + " more endpoints, the TOC changes, and the details are not shown")
+                    return
+                yield line + "\n"
+        if len(toc) > 0:
+            if not self.fits("\n### Table of Contents", self.noteReserve):
+                yield from self.note("The TOC changes and details are not shown")
+                return
+            yield "\n### Table of Contents\n"
+            for line in self.tocLines(toc):
+                if not self.fits(line, self.noteReserve):
+                    yield from self.note("More TOC changes and the details are not shown")
+                    return
+                yield line + "\n"
+        # A generator, so the details of a large diff are never collected into a list
+        modified = ((name, self.changes(value)) for name, value in endpoints.items())
+        modified = ((name, value) for name, value in modified if len(value) > 0)
+        first = next(modified, None)
+        if first == None:
+            return
+        if not self.fits("\n### Details", self.noteReserve):
+            yield from self.note("The details are not shown")
+            return
+        yield "\n### Details\n"
+        for name, value in itertools.chain([first], modified):
+            heading = "#### " + self.text(name)
+            if not self.fits("\n" + heading, self.noteReserve):
+                yield from self.note("The details of " + str(1 + sum(1 for _ in modified)) + " more endpoints are not shown")
+                return
+            yield "\n" + heading + "\n"
+            for key, field in value.items():
+                for line in self.fieldLines(self.code(key), field, 0):
+                    if not self.fits(line, self.noteReserve):
+                        yield from self.note("More changes to this endpoint, and the details of " + str(sum(1 for _ in modified)) + " more endpoints, are not shown")
+                        return
+                    yield line + "\n"
+
+    def write(self, diff:Mapping, out_file) -> int:
+        """
+        Render a diff as Markdown to a text file
+
+        Args:
+            diff (Mapping): A dict created by BaseParser.diff(dict, dict), or a StreamedObject of a file containing one
+            out_file: The file, which should use UTF-8 and no newline translation
+
+        Returns:
+            int: The number of bytes written
+        """
+        for chunk in self.render(diff):
+            out_file.write(chunk)
+        return self.budget - self.remaining
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a diff created by a parser as Markdown, such as for the body of a GitHub issue, within a budget of bytes")
+    parser.add_argument("diff", action="store", help="The JSON file created by --diffout. May be compressed with gzip or zstd. Read an endpoint at a time, so it does not need to fit in memory")
+    parser.add_argument("--out", action="store", help="Output the Markdown to the specified file instead of STDOUT")
+    parser.add_argument("--budget", action="store", type=int, default=MarkdownRenderer.issueBudget, help="The maximum number of UTF-8 bytes to output. Default: " + str(MarkdownRenderer.issueBudget))
+    parser.add_argument("--title", action="store", help="A heading to output first")
+    args = parser.parse_args()
+    from BaseParser import BaseParser
+    from JsonStream import StreamedObject
+    renderer = MarkdownRenderer(args.budget, args.title)
+    diff = StreamedObject(lambda: io.TextIOWrapper(BaseParser().openCompressed(args.diff), encoding="utf8"))
+    if args.out == None:
+        renderer.write(diff, sys.stdout)
+    else:
+        with open(args.out, "w", encoding="utf8", newline="\n") as out_file:
+            renderer.write(diff, out_file)
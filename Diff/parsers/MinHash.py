@@ -0,0 +1,192 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+from collections.abc import Callable, Mapping
+from hashlib import blake2b
+import random
+import re
+
+class MinHash:
+    """
+    Finds pairs of similar values between two dicts in near-linear time
+
+    Each value is reduced to a set of shingles (runs of consecutive words from the leaf values inside the value), which is summarized by a MinHash signature.
+    The keys of dicts are not shingled, since values with the same schema share all of them, and neither are the values of the keys in ignoredKeys.
+    The signatures are split into bands, and only values which share an identical band with a value from the other dict are compared, using the exact Jaccard similarity of their shingles.
+    Hashing uses blake2b and a seeded random.Random, so the signatures and matches are identical in every run
+    """
+    prime = (1 << 61) - 1
+    """
+    The Mersenne prime used by the permutation
+    """
+    words = re.compile(r"\w+")
+    """
+    Matches the words which are shingled
+    """
+    def __init__(self, permutations:int = 64, bands:int = 16, shingleSize:int = 3, threshold:float = 0.6, seed:int = 0, ignoredKeys:frozenset = frozenset()):
+        """
+        Args:
+            permutations (int): The number of bins in a signature. Must be divisible by bands. Default: 64
+            bands (int): The number of bands the signature is split into. More bands finds pairs with lower similarity. Default: 16
+            shingleSize (int): The number of words in a shingle. Default: 3
+            threshold (float): The minimum Jaccard similarity of a matched pair, from 0 to 1. Default: 0.6
+            seed (int): The seed of the permutation. Default: 0
+            ignoredKeys (frozenset): The keys of dicts, at any depth, whose values are not shingled, such as boilerplate which every value has. Default: frozenset()
+
+        Raises:
+            ValueError: permutations is not divisible by bands
+        """
+        if permutations % bands != 0:
+            raise ValueError("permutations must be divisible by bands")
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        self.shingleSize = shingleSize
+        self.threshold = threshold
+        self.ignoredKeys = ignoredKeys
+        rng = random.Random(seed)
+        self.a = rng.randrange(1, self.prime)
+        self.b = rng.randrange(0, self.prime)
+
+    def strings(self, value:any):
+        """
+        Yields every leaf value in a value as a string, except the keys of dicts and the values of the keys in ignoredKeys
+
+        Args:
+            value (any): A value created by a parser
+
+        Yields:
+            str: Each string, in order
+        """
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, Mapping):
+            for k, v in value.items():
+                if k not in self.ignoredKeys:
+                    yield from self.strings(v)
+        elif isinstance(value, list):
+            for v in value:
+                yield from self.strings(v)
+        elif value != None:
+            yield str(value)
+
+    def shingles(self, value:any) -> set:
+        """
+        Returns the hashed shingles of a value
+
+        Args:
+            value (any): A value created by a parser
+
+        Returns:
+            set: A set of 64-bit ints
+        """
+        tokens = [word.lower() for s in self.strings(value) for word in self.words.findall(s)]
+        size = min(self.shingleSize, len(tokens))
+        return set(int.from_bytes(blake2b(" ".join(tokens[i:i + size]).encode("utf8"), digest_size=8).digest(), "little") for i in range(len(tokens) - size + 1)) if size > 0 else set()
+
+    def similarity(self, lhs:any, rhs:any) -> float:
+        """
+        Returns the exact Jaccard similarity of the shingles of two values
+
+        Args:
+            lhs (any): A value created by a parser
+            rhs (any): A value created by a parser
+
+        Returns:
+            float: The similarity, from 0 to 1; 0 if neither value has any words
+        """
+        lshingles = self.shingles(lhs)
+        rshingles = self.shingles(rhs)
+        union = len(lshingles | rshingles)
+        return len(lshingles & rshingles) / union if union > 0 else 0.0
+
+    def signature(self, shingles:set) -> tuple:
+        """
+        Returns the MinHash signature of a set of shingles
+
+        Uses one permutation hashing: each shingle is hashed once, the hash selects a bin, and each bin keeps its minimum.
+        Empty bins are filled from the next non-empty bin to the right, offset by the distance, so that two sets which agree on a bin agree on its fill
+
+        Args:
+            shingles (set): The output of shingles(any)
+
+        Returns:
+            tuple: The signature; every element is -1 for an empty set
+        """
+        size = self.permutations
+        if len(shingles) == 0:
+            return tuple(-1 for _ in range(size))
+        bins = [None] * size
+        for h in shingles:
+            h = (self.a * h + self.b) % self.prime
+            i = h % size
+            h //= size
+            if bins[i] == None or h < bins[i]:
+                bins[i] = h
+        ret = list(bins)
+        for i in range(size):
+            if bins[i] == None:
+                for distance in range(1, size):
+                    j = (i + distance) % size
+                    if bins[j] != None:
+                        ret[i] = bins[j] + distance * self.prime
+                        break
+        return tuple(ret)
+
+    def match(self, lhs:dict, rhs:dict, confirm:Callable[[any, any], bool] | None = None) -> list:
+        """
+        Match values in lhs with the most similar value in rhs, one to one
+
+        Pairs are accepted greedily from the highest similarity, with ties broken by the order of the keys in lhs, then rhs. Values without any words are never matched
+
+        Args:
+            lhs (dict): The "original" values, such as removed endpoints
+            rhs (dict): The "new/modified" values, such as added endpoints
+            confirm (Callable[[any, any], bool] | None): Called with the lhs and rhs values of each pair which reaches threshold. Pairs for which it returns False are never matched, so they can not take the place of another pair. Default: None
+
+        Returns:
+            list: A list of tuples of the lhs key, the rhs key, and the Jaccard similarity, in the order they were accepted
+        """
+        lshingles = {k: self.shingles(v) for k, v in lhs.items()}
+        rshingles = {k: self.shingles(v) for k, v in rhs.items()}
+        buckets = {}
+        for i, (k, shingles) in enumerate(lshingles.items()):
+            if len(shingles) > 0:
+                signature = self.signature(shingles)
+                for band in range(self.bands):
+                    buckets.setdefault((band, signature[band * self.rows:(band + 1) * self.rows]), []).append((i, k))
+        pairs = []
+        for j, (k, shingles) in enumerate(rshingles.items()):
+            if len(shingles) > 0:
+                signature = self.signature(shingles)
+                candidates = set()
+                for band in range(self.bands):
+                    candidates.update(buckets.get((band, signature[band * self.rows:(band + 1) * self.rows]), []))
+                for i, lk in candidates:
+                    similarity = len(lshingles[lk] & shingles) / len(lshingles[lk] | shingles)
+                    if similarity >= self.threshold and (confirm == None or confirm(lhs[lk], rhs[k])):
+                        pairs.append((-similarity, i, j, lk, k))
+        ret = []
+        matchedl = set()
+        matchedr = set()
+        for negsimilarity, _, _, lk, rk in sorted(pairs):
+            if lk not in matchedl and rk not in matchedr:
+                matchedl.add(lk)
+                matchedr.add(rk)
+                ret.append((lk, rk, -negsimilarity))
+        return ret
@@ -0,0 +1,270 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import argparse
+from collections.abc import Mapping
+import json
+import sys
+
+class Shape:
+    """
+    The keys of a Record, in order, and the index of each key. Every Record with the same keys created by the same ParseModel shares one Shape
+    """
+    __slots__ = ("keys", "index")
+    def __init__(self, keys:tuple):
+        """
+        Args:
+            keys (tuple): The keys, in order
+        """
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+class Record(Mapping):
+    """
+    An immutable dict of a parsed object, which stores its values in a tuple and shares its keys with every other Record of the same Shape
+
+    A Record can be used anywhere a read-only dict is expected, and compares equal to a dict with the same items
+    """
+    __slots__ = ("_shape", "_values")
+    def __init__(self, shape:Shape, values:tuple):
+        """
+        Args:
+            shape (Shape): The keys
+            values (tuple): The value of each key, in the order of the keys
+        """
+        self._shape = shape
+        self._values = values
+
+    def __getitem__(self, key:str) -> any:
+        return self._values[self._shape.index[key]]
+
+    def __iter__(self):
+        return iter(self._shape.keys)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key:str) -> bool:
+        return key in self._shape.index
+
+    def get(self, key:str, default:any = None) -> any:
+        i = self._shape.index.get(key)
+        return self._values[i] if i != None else default
+
+    def __eq__(self, other:any) -> bool:
+        if isinstance(other, Record) and other._shape.keys == self._shape.keys:
+            return other._values == self._values
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return len(other) == len(self) and all(key in other and other[key] == value for key, value in zip(self._shape.keys, self._values))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return type(self).__name__ + "(" + repr(dict(zip(self._shape.keys, self._values))) + ")"
+
+class Endpoint(Record):
+    """
+    The values of an endpoint in "endpoints"
+    """
+    __slots__ = ()
+
+class FieldRow(Record):
+    """
+    A row of a table in the values of an endpoint, such as a request or response field
+    """
+    __slots__ = ()
+
+class TocEntry(Record):
+    """
+    An entry of a category in "toc"
+    """
+    __slots__ = ()
+
+class ParseModel:
+    """
+    Converts dicts created by BaseParser.parse(str) to and from a compact, typed, read-only model
+
+    Endpoints, field rows, TOC entries, and any other dicts become Records, whose keys are a Shape shared by every Record with the same keys.
+    Strings are pooled, so an identical key, type, or description is only stored once across every snapshot converted by the same instance, which is most of the data when many revisions of a page are loaded.
+    The top level dict, "toc", and "endpoints" stay dicts, and lists stay lists, so BaseParser.diff(dict, dict) and BaseParser.timeline(list, list | None) work on the model directly
+    """
+    def __init__(self):
+        self.strings = {}
+        """
+        The pool of strings, by value
+        """
+        self.shapes = {}
+        """
+        The pool of Shapes, by keys
+        """
+
+    def string(self, value:str) -> str:
+        """
+        Get the pooled copy of a string
+
+        Args:
+            value (str): The string
+
+        Returns:
+            str: The first string equal to value which was pooled
+        """
+        return self.strings.setdefault(value, value)
+
+    def shape(self, keys:tuple) -> Shape:
+        """
+        Get the pooled Shape of a set of keys
+
+        Args:
+            keys (tuple): The keys, in order
+
+        Returns:
+            Shape: The Shape
+        """
+        shape = self.shapes.get(keys)
+        if shape == None:
+            shape = Shape(tuple(self.string(key) for key in keys))
+            self.shapes[shape.keys] = shape
+        return shape
+
+    def record(self, cls:type, value:dict, rows:bool = False) -> Record:
+        """
+        Convert a dict into a Record
+
+        Args:
+            cls (type): The subclass of Record to create
+            value (dict): The dict
+            rows (bool): Convert dicts directly inside lists in the values to FieldRows. Default: False
+
+        Returns:
+            Record: The Record
+        """
+        values = []
+        for v in value.values():
+            if rows and isinstance(v, list):
+                values.append([self.record(FieldRow, x) if isinstance(x, dict) else self.value(x) for x in v])
+            else:
+                values.append(self.value(v))
+        return cls(self.shape(tuple(value)), tuple(values))
+
+    def value(self, value:any) -> any:
+        """
+        Convert any part of a dict created by BaseParser.parse(str)
+
+        Args:
+            value (any): The value
+
+        Returns:
+            any: The value, with dicts converted to Records and strings pooled
+        """
+        if isinstance(value, str):
+            return self.string(value)
+        elif isinstance(value, dict):
+            return self.record(Record, value)
+        elif isinstance(value, list):
+            return [self.value(x) for x in value]
+        return value
+
+    def fromJson(self, snapshot:dict) -> dict:
+        """
+        Convert a dict created by BaseParser.parse(str) into the model
+
+        Args:
+            snapshot (dict): The dict
+
+        Returns:
+            dict: The model, which toJson(any) converts back into a dict equal to snapshot, including the order of every key
+        """
+        ret = {}
+        for key, value in snapshot.items():
+            if key == "toc" and isinstance(value, dict):
+                ret[key] = {self.string(k): [self.record(TocEntry, x) if isinstance(x, dict) else self.value(x) for x in v] if isinstance(v, list) else self.value(v) for k, v in value.items()}
+            elif key == "endpoints" and isinstance(value, dict):
+                ret[key] = {self.string(k): self.record(Endpoint, v, True) if isinstance(v, dict) else self.value(v) for k, v in value.items()}
+            else:
+                ret[key] = self.value(value)
+        return ret
+
+    @staticmethod
+    def toJson(value:any) -> any:
+        """
+        Convert the model, or any part of it, back into the format created by BaseParser.parse(str)
+
+        Args:
+            value (any): The model or part of it. Values which are already in that format are copied
+
+        Returns:
+            any: The value, with Records converted to dicts
+        """
+        if isinstance(value, Mapping):
+            return {k: ParseModel.toJson(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            return [ParseModel.toJson(x) for x in value]
+        return value
+
+    @staticmethod
+    def footprint(values:list) -> int:
+        """
+        Measure the memory used by a list of values with sys.getsizeof, counting every object reachable from them once, including the Shapes of Records
+
+        The pools of a ParseModel are not counted, since they can be released once the snapshots are converted
+
+        Args:
+            values (list): The values, such as several snapshots, which may share objects
+
+        Returns:
+            int: The number of bytes
+        """
+        seen = set()
+        stack = list(values)
+        ret = 0
+        while len(stack) > 0:
+            value = stack.pop()
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            ret += sys.getsizeof(value)
+            if isinstance(value, Record):
+                stack.append(value._shape)
+                stack.append(value._values)
+            elif isinstance(value, Shape):
+                stack.append(value.keys)
+                stack.append(value.index)
+            elif isinstance(value, dict):
+                stack.extend(value.keys())
+                stack.extend(value.values())
+            elif isinstance(value, (list, tuple)):
+                stack.extend(value)
+        return ret
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the memory used by JSON files created by parse, as dicts and in the compact model")
+    parser.add_argument("files", action="store", nargs="+", help="The JSON files. May be compressed with gzip or zstd")
+    args = parser.parse_args()
+    from BaseParser import BaseParser
+    reader = BaseParser()
+    model = ParseModel()
+    snapshots = [reader.readSnapshot(path) for path in args.files]
+    compact = [model.fromJson(snapshot) for snapshot in snapshots]
+    for snapshot, converted in zip(snapshots, compact):
+        if json.dumps(ParseModel.toJson(converted)) != json.dumps(snapshot):
+            parser.exit(1, "The model of a snapshot does not convert back into the snapshot\n")
+    dictBytes = ParseModel.footprint(snapshots)
+    compactBytes = ParseModel.footprint(compact)
+    poolBytes = sys.getsizeof(model.strings) + sys.getsizeof(model.shapes)
+    print(json.dumps({"snapshots": len(snapshots), "dict": dictBytes, "compact": compactBytes, "pool": poolBytes, "ratio": compactBytes / dictBytes if dictBytes > 0 else None}, indent=4))
@@ -0,0 +1,142 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+from AtomicFile import writeAtomic
+from contextlib import contextmanager
+import hashlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class SnapshotCache:
+    """
+    A folder of locks for snapshots and derived artifacts, such as diffs, which may be shared by concurrent processes and threads
+
+    Files are written to a temporary file and renamed into place, so a reader sees either the old or the new contents, never part of them.
+    Writers of the same file are serialized by an advisory lock per key, using flock on POSIX and msvcrt.locking on Windows, where every lock is exclusive.
+    Locks are not reentrant, so a thread must not lock a key it already holds. The folder is in the format below
+    path/
+        locks/
+            hash.lock: The lock of a key, named by the hash of the key. Never deleted, since a lock file may be open in another process
+    """
+    def __init__(self, path:str | Path):
+        """
+        Args:
+            path (str | Path): The path to the folder. Created if it does not exist
+        """
+        self.path = Path(path)
+        Path(self.path, "locks").mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def keyHash(key:str) -> str:
+        """
+        Returns the name of the lock file of a key
+
+        Args:
+            key (str): The key
+
+        Returns:
+            str: The SHA-256 of the key, as a hex string
+        """
+        return hashlib.sha256(key.encode("utf8")).hexdigest()
+
+    @staticmethod
+    def pathKey(path:str | Path) -> str:
+        """
+        Returns the key used by writeFile(str | Path, bytes) and lockPath(str | Path, bool) for a path, so the same file has the same key regardless of how its path is written
+
+        Args:
+            path (str | Path): The path
+
+        Returns:
+            str: The absolute path, with symlinks resolved
+        """
+        return str(Path(path).resolve())
+
+    @contextmanager
+    def lockFile(self, path:Path, shared:bool = False):
+        """
+        Hold an advisory lock on a lock file for the duration of a with statement
+
+        Args:
+            path (Path): The lock file. Created if it does not exist
+            shared (bool): Allow other shared locks to be held at the same time. Ignored on Windows. Default: False
+        """
+        with open(path, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after 10 seconds
+                        pass
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def lock(self, key:str, shared:bool = False):
+        """
+        Hold the advisory lock of a key for the duration of a with statement
+
+        Args:
+            key (str): The key
+            shared (bool): Allow other shared locks of the key to be held at the same time, such as by readers. Ignored on Windows. Default: False
+
+        Returns:
+            A context manager
+        """
+        return self.lockFile(Path(self.path, "locks", self.keyHash(key) + ".lock"), shared)
+
+    def lockPath(self, path:str | Path, shared:bool = False):
+        """
+        Hold the advisory lock of a file or folder outside of the cache for the duration of a with statement
+
+        Args:
+            path (str | Path): The path
+            shared (bool): Allow other shared locks of the path to be held at the same time, such as by readers. Ignored on Windows. Default: False
+
+        Returns:
+            A context manager
+        """
+        return self.lock(self.pathKey(path), shared)
+
+    def writeFile(self, path:str | Path, data:bytes):
+        """
+        Write a file outside of the cache, such as the output of a parser or diff, while holding the lock of its path
+
+        The file is replaced atomically, so concurrent readers never see a partially written file, and concurrent writers of the same path do not interleave
+
+        Args:
+            path (str | Path): The path to the file
+            data (bytes): The contents
+        """
+        with self.lockPath(path):
+            writeAtomic(path, data)
@@ -19,11 +19,20 @@
 
 from bs4 import BeautifulSoup
 from BaseParser import BaseParser
+from Extraction import Column, nextTags, string, Table, text
 
 class TwitchEventSubWebSocketMessagesParser(BaseParser):
     """
     Parse a Twitch EventSub WebSocket Messages page into a format that can be diffed
     """
+    fieldsTable = Table(
+        Column("name"),
+        Column("type"),
+        Column("description", "text")
+    )
+    """
+    The table of fields after each message
+    """
     def parse(self, html:str) -> dict:
         """
         Parse a Twitch EventSub WebSocket Messages page from the input HTML and return a dict of parsed data
@@ -71,30 +80,26 @@ class TwitchEventSubWebSocketMessagesParser(BaseParser):
         }
         soup = BeautifulSoup(html, "html.parser")
         nodes = soup.find(class_="main").find_all(class_="text-content")
+        tocheading = soup.find("h1", id="websocket-messages")
+        tocnodes = set(id(x) for x in tocheading.parents) if tocheading != None else set()
         for node in nodes:
-            if node.find("h1", id="websocket-messages") != None:
+            if id(node) in tocnodes:
                 docs = node.find_all("h2")
                 for doc in docs:
-                    category = str(doc.string).strip()
+                    category = string(doc)
                     if category not in ret["toc"]:
                         ret["toc"][category] = []
-                    nextsibling = doc.find_next_sibling()
+                    siblings = nextTags(doc)
+                    nextsibling = next(siblings, None)
                     fields = []
                     description = None
                     if nextsibling and nextsibling.name == "p":
-                        description = " ".join([str(x) for x in nextsibling.stripped_strings])
-                        nextsibling = nextsibling.find_next_sibling()
+                        description = text(nextsibling)
+                        nextsibling = next(siblings, None)
                         while nextsibling and nextsibling.name == "p":
-                            nextsibling = nextsibling.find_next_sibling()
+                            nextsibling = next(siblings, None)
                     if nextsibling and nextsibling.name == "table":
-                        for entry in nextsibling.find("tbody").find_all("tr"):
-                            cells = entry.find_all("td")
-                            out = {
-                                "name": str(cells[0].string).strip(),
-                                "type": str(cells[1].string).strip(),
-                                "description": " ".join([str(x) for x in cells[2].stripped_strings])
-                            }
-                            fields.append(out)
+                        fields = self.fieldsTable.rows(nextsibling)
                     ret["toc"][category].append({
                         "endpoint": category
                     })
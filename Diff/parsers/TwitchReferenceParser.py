@@ -17,13 +17,139 @@
 # along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+import argparse
+import math
+import re
 from bs4 import BeautifulSoup
 from BaseParser import BaseParser
+from concurrent.futures import ProcessPoolExecutor
+from Extraction import Column, Outline, Table, text
+
+def classPattern(name:str) -> re.Pattern:
+    """
+    Create a pattern which matches the start tag of an element which has the specified class, in the same way that html.parser splits the class attribute
+
+    Args:
+        name (str): The class
+
+    Returns:
+        re.Pattern: A pattern where group 1 is the tag name
+    """
+    name = re.escape(name)
+    return re.compile(r"<([a-zA-Z][^\s/>]*)[^>]*?\s[cC][lL][aA][sS][sS]\s*=\s*(?:\"(?:[^\"]*\s)?" + name + r"(?:\s[^\"]*)?\"|'(?:[^']*\s)?" + name + r"(?:\s[^']*)?'|" + name + r"(?=[\s/>]))")
+
+mainPattern = classPattern("main")
+"""
+Matches the start tag of the main element
+"""
+sectionPattern = classPattern("doc-content")
+"""
+Matches the start tag of a doc-content section
+"""
+
+def removeTags(description:str) -> str:
+    """
+    Remove the BETA and NEW tags from the start of a description
+
+    Args:
+        description (str): The description
+
+    Returns:
+        str: The description, without the tags and stripped of surrounding whitespace
+    """
+    return description.removeprefix("BETA ").removeprefix("NEW ").strip()
+
+def isRateLimit(tag) -> bool:
+    """
+    Indicates if a tag in the description is the start of the Per-Endpoint Rate Limits
+
+    Args:
+        tag: A child of the left-docs section
+
+    Returns:
+        bool: True if the tag contains a strong tag starting with "Rate Limit"
+    """
+    strong = tag.find("strong")
+    return strong != None and strong.string != None and strong.string.startswith("Rate Limit")
 
 class TwitchReferenceParser(BaseParser):
     """
     Parse a Twitch API Reference page into a format that can be diffed
     """
+    tocTable = Table(
+        Column("resource"),
+        Column("endpoint"),
+        Column("description", lambda cell: removeTags(text(cell)))
+    )
+    """
+    The Table of Contents
+    """
+    docsOutline = Outline(
+        headings=[
+            ("h2", "description", None, None),
+            ("h3", "authorization", ["Authorization", "Authentication"], None),
+            ("h3", "url", ["URL"], None),
+            ("h3", "requestQuery", None, ["Request Query"]),
+            ("h3", "requestBody", None, ["Request Body"]),
+            ("h3", "responseBody", None, ["Response Body", "Return Value"]),
+            ("h3", "responseCodes", None, ["Response Code"])
+        ],
+        switches=[
+            ("description", isRateLimit, "rateLimits")
+        ],
+        content=lambda tag: tag.name == "p" or tag.name == "ul" or tag.name == "table"
+    )
+    """
+    The sections of the left-docs section of an endpoint. Sections which are not in docsTables are read as text
+    """
+    docsTables = {
+        "requestQuery": Table(
+            Column("parameter", headers=["parameter", "code", "field"]),
+            Column("type", minCells=2, headers=["type"]),
+            Column("required", minCells=3, headers=["required", "required?"]),
+            Column("description", "text", headers=["description"])
+        ),
+        "requestBody": Table(
+            Column("field", headers=["parameter", "code", "field"]),
+            Column("type", minCells=2, headers=["type"]),
+            Column("required", minCells=3, headers=["required", "required?"]),
+            Column("description", "text", headers=["description"])
+        ),
+        "responseBody": Table(
+            Column("field", headers=["parameter", "code", "field"]),
+            Column("type", minCells=2, headers=["type"]),
+            Column("description", "text", headers=["description"])
+        ),
+        "responseCodes": Table(
+            Column("code", headers=["parameter", "code", "field"]),
+            Column("description", "text", headers=["description"])
+        )
+    }
+    """
+    The sections of the left-docs section of an endpoint which are read from a table. Paragraphs and lists in these sections are appended to the description
+    """
+    exampleOutline = Outline(
+        headings=[
+            ("h3", "exampleRequestDescription", ["Example Request"], None),
+            ("h3", "exampleResponse", ["Example Response"], None)
+        ],
+        switches=[
+            ("exampleRequestDescription", lambda tag: tag.name == "div", "exampleRequestCurl")
+        ]
+    )
+    """
+    The sections of the right-code section of an endpoint
+    """
+    def __init__(self, *args, workers:int | None = None, **kwargs):
+        """
+        Takes the same arguments as BaseParser, in the same order, and the keyword argument below
+
+        Args:
+            workers (int | None): The number of processes used to parse the endpoint sections of the page. Default: None, which parses in this process
+        """
+        super().__init__(*args, **kwargs)
+        self.workers = workers
+
     def parse(self, html:str) -> dict:
         """
         Parse a Twitch API Reference page from the input HTML and return a dict of parsed data
@@ -98,203 +224,218 @@ class TwitchReferenceParser(BaseParser):
         Returns:
             dict: A dict containing the parsed data, as described above
         """
+        if self.workers != None and self.workers > 1:
+            ret = self.parseParallel(html)
+            if ret != None:
+                return ret
         ret = {
             "toc": {},
             "endpoints": {}
         }
         soup = BeautifulSoup(html, "html.parser")
         nodes = soup.find(class_="main").find_all(class_="doc-content")
+        tocheading = soup.find("h1", id="twitch-api-reference")
+        tocnodes = set(id(x) for x in tocheading.parents) if tocheading != None else set()
         for node in nodes:
-            if node.find("h1", id="twitch-api-reference") != None:
-                for entry in node.find("tbody").find_all("tr"):
-                    cells = entry.find_all("td")
-                    resource = str(cells[0].string).strip()
-                    endpoint = str(cells[1].string).strip()
-                    description = (" ".join([str(x) for x in cells[2].stripped_strings])).removeprefix("BETA ").removeprefix("NEW ").strip()
-                    if resource not in ret["toc"]:
-                        ret["toc"][resource] = []
-                    ret["toc"][resource].append({
-                        "endpoint": endpoint,
-                        "description": description
-                    })
+            if id(node) in tocnodes:
+                self.mergeToc(ret, self.parseToc(node))
             else:
-                docs = node.find(class_="left-docs")
-                if docs == None:
-                    continue
-                # 0 = Start
-                # 1 = Description
-                # 2 = Per-Endpoint Rate Limits
-                # 3 = Authorization
-                # 4 = URL
-                # 5 = Request Query
-                # 6 = Request Body
-                # 7 = Response Body
-                # 8 = Response Codes
-                state = 0
-                data = []
-                endpoint = None
-                description = None
-                rateLimits = None
-                authorization = None
-                url = None
-                slug = None
-                reqQuery = None
-                reqBody = None
-                resBody = None
-                resCodes = None
-                for tag in docs.children:
-                    newState = state
-                    if tag.name == "h2":
-                        endpoint = str(tag.string).strip()
-                        slug = "#" + str(tag.attrs["id"]).strip() if "id" in tag.attrs else None
-                        newState = 1
-                    elif tag.name == "p" or tag.name == "ul" or (tag.name == "table" and state < 5):
-                        if state == 1:
-                            strong = tag.find("strong")
-                            if strong != None and strong.string.startswith("Rate Limit"):
-                                description = (" ".join(data)).removeprefix("BETA ").removeprefix("NEW ").strip()
-                                state = 2
-                                newState = state
-                                data = []
-                        if state < 5:
-                            data.append(" ".join([str(x) for x in tag.stripped_strings]))
-                        else:
-                            description += " ".join([str(x) for x in tag.stripped_strings])
-                    elif tag.name == "table":
-                        data = []
-                        for entry in tag.find("tbody").find_all("tr"):
-                            cells = entry.find_all("td")
-                            dataPoint = {}
-                            valid = False
-                            dataPoint["parameter" if state == 5 else ("code" if state == 8 else "field")] = str(cells[0].string).strip()
-                            if dataPoint["parameter" if state == 5 else ("code" if state == 8 else "field")].lower() != "parameter" and dataPoint["parameter" if state == 5 else ("code" if state == 8 else "field")].lower() != "code" and dataPoint["parameter" if state == 5 else ("code" if state == 8 else "field")].lower() != "field":
-                                valid = True
-                            add = 0
-                            if state <= 7 and len(cells) > 2:
-                                add += 1
-                                dataPoint["type"] = str(cells[1].string).strip()
-                                if dataPoint["type"].lower() != "type":
-                                    valid = True
-                                if state <= 6 and len(cells) > 3:
-                                    add += 1
-                                    dataPoint["required"] = str(cells[2].string).strip()
-                                    if dataPoint["required"].lower() != "required" and dataPoint["required"].lower() != "required?":
-                                        valid = True
-                            dataPoint["description"] = (" ".join([str(x) for x in cells[1 + add].stripped_strings])).strip()
-                            if dataPoint["description"].lower() != "description":
-                                valid = True
-                            if valid == True:
-                                data.append(dataPoint)
-                    elif tag.name == "h3":
-                        section = tag.string.strip()
-                        if section == "Authorization" or section == "Authentication":
-                            newState = 3
-                        elif section == "URL":
-                            newState = 4
-                        elif section.startswith("Request Query"):
-                            newState = 5
-                        elif section.startswith("Request Body"):
-                            newState = 6
-                        elif section.startswith("Response Body") or section.startswith("Return Value"):
-                            newState = 7
-                        elif section.startswith("Response Code"):
-                            newState = 8
-                    if newState != state:
-                        if state == 1:
-                            description = (" ".join(data)).removeprefix("BETA ").removeprefix("NEW ").strip()
-                        elif state == 2:
-                            rateLimits = (" ".join(data)).strip()
-                        elif state == 3:
-                            authorization = (" ".join(data)).strip()
-                        elif state == 4:
-                            url = (" ".join(data)).strip()
-                        elif state == 5:
-                            reqQuery = data.copy() if data != None else None
-                        elif state == 6:
-                            reqBody = data.copy() if data != None else None
-                        elif state == 7:
-                            resBody = data.copy() if data != None else None
-                        elif state == 8:
-                            resCodes = data.copy() if data != None else None
-                        if newState <= 4:
-                            data = []
-                        else:
-                            data = None
-                        state = newState
-                if state == 1:
-                    description = (" ".join(data)).strip()
-                elif state == 2:
-                    rateLimits = (" ".join(data)).strip()
-                elif state == 3:
-                    authorization = (" ".join(data)).strip()
-                elif state == 4:
-                    url = (" ".join(data)).strip()
-                elif state == 5:
-                    reqQuery = data.copy()
-                elif state == 6:
-                    reqBody = data.copy()
-                elif state == 7:
-                    resBody = data.copy()
-                elif state == 8:
-                    resCodes = data.copy()
-                example = node.find(class_="right-code")
-                # 0 = Start
-                # 1 = Request Description
-                # 2 = Request cURL
-                # 3 = Response
-                state = 0
-                data = None
-                exampleRequestDescription = None
-                exampleRequestCurl = None
-                exampleResponse = None
-                if example != None:
-                    for tag in example.children:
-                        newState = state
-                        if state == 1 and tag.name == "div":
-                            exampleRequestDescription = (" ".join(data)).strip()
-                            state = 2
-                            newState = state
-                            data = []
-                        elif tag.name == "h3":
-                            section = tag.string.strip()
-                            if section == "Example Request":
-                                newState = 1
-                            elif section == "Example Response":
-                                newState = 3
-                        if state > 0 and tag.name != "h3":
-                            data.append(" ".join([str(x) for x in tag.stripped_strings]))
-                        if newState != state:
-                            if state == 1:
-                                exampleRequestDescription = (" ".join(data)).strip()
-                            elif state == 2:
-                                exampleRequestCurl = (" ".join(data)).strip()
-                            elif state == 3:
-                                exampleResponse = (" ".join(data)).strip()
-                            data = []
-                            state = newState
-                    if state == 1:
-                        exampleRequestDescription = (" ".join(data)).strip()
-                    elif state == 2:
-                        exampleRequestCurl = (" ".join(data)).strip()
-                    elif state == 3:
-                        exampleResponse = (" ".join(data)).strip().strip()
-                if endpoint != None:
-                    ret["endpoints"][endpoint] = {
-                        "description": description,
-                        "rateLimits": rateLimits,
-                        "authorization": authorization,
-                        "url": url,
-                        "slug": slug,
-                        "requestQuery": reqQuery,
-                        "requestBody": reqBody,
-                        "responseBody": resBody,
-                        "responseCodes": resCodes,
-                        "exampleRequestDescription": exampleRequestDescription,
-                        "exampleRequestCurl": exampleRequestCurl,
-                        "exampleResponse": exampleResponse
-                    }
+                self.mergeSection(ret, self.parseSection(node))
+        return ret
+
+    def parseParallel(self, html:str) -> dict | None:
+        """
+        Parse a Twitch API Reference page by splitting the HTML at the start of each doc-content section and parsing the sections in a process pool
+
+        The sections are merged in document order, so the output is identical to parse(str) in a single process.
+        The split is only used when every section closes before the next one starts, directly inside the main element, which is verified by the processes
+
+        Args:
+            html (str): The HTML from a Twitch API Reference page which will be parsed
+
+        Returns:
+            dict | None: A dict containing the parsed data, as described in parse(str); None if the page can not be split
+        """
+        main = mainPattern.search(html)
+        starts = [match.start() for match in sectionPattern.finditer(html)]
+        if main == None or len(starts) < 2 or main.start() > starts[0]:
+            return None
+        chunks = [html[:starts[0]]] + [html[start:end] for start, end in zip(starts, starts[1:] + [len(html)])]
+        count = len(chunks)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(parseChunk, chunks, [main.group(1).lower()] * count, range(count), [count] * count, chunksize=math.ceil(count / (self.workers * 4))))
+        if not all(result[0] for result in results):
+            return None
+        tocindex = None
+        for i, (_, found, inNode, _, _) in enumerate(results):
+            if found:
+                tocindex = i if inNode else None
+                break
+        ret = {
+            "toc": {},
+            "endpoints": {}
+        }
+        for i, (_, _, _, toc, section) in enumerate(results):
+            if i == tocindex:
+                self.mergeToc(ret, toc)
+            elif i > 0:
+                self.mergeSection(ret, section)
         return ret
 
+    def parseToc(self, node) -> list:
+        """
+        Parse the Table of Contents from a doc-content section
+
+        Args:
+            node: The doc-content section containing the TOC
+
+        Returns:
+            list: The rows of the TOC table
+        """
+        return self.tocTable.rows(node)
+
+    def mergeToc(self, ret:dict, rows:list):
+        """
+        Add the rows returned by parseToc to the parsed data
+
+        Args:
+            ret (dict): The parsed data
+            rows (list): The rows returned by parseToc
+        """
+        for row in rows:
+            if row["resource"] not in ret["toc"]:
+                ret["toc"][row["resource"]] = []
+            ret["toc"][row["resource"]].append({
+                "endpoint": row["endpoint"],
+                "description": row["description"]
+            })
+
+    def parseSection(self, node) -> tuple | None:
+        """
+        Parse an endpoint from a doc-content section
+
+        Args:
+            node: The doc-content section
+
+        Returns:
+            tuple | None: A tuple of the endpoint name and the endpoint entry, as described in parse(str); None if the section does not document an endpoint
+        """
+        docs = node.find(class_="left-docs")
+        if docs == None:
+            return None
+        endpoint = None
+        slug = None
+        values = dict.fromkeys(["description", "rateLimits", "authorization", "url", "requestQuery", "requestBody", "responseBody", "responseCodes"])
+        segments = self.docsOutline.segments(docs)
+        for segment in segments:
+            for tag in segment.headings:
+                if tag.name == "h2":
+                    endpoint = str(tag.string).strip()
+                    slug = "#" + str(tag.attrs["id"]).strip() if "id" in tag.attrs else None
+            if segment.name in self.docsTables:
+                data = None
+                for tag in segment.content:
+                    if tag.name == "table":
+                        data = self.docsTables[segment.name].rows(tag)
+                    else:
+                        values["description"] += text(tag)
+                values[segment.name] = data
+            elif segment.name != None:
+                data = " ".join([text(tag) for tag in segment.content])
+                # A description which runs to the end of the section keeps its BETA/NEW tags
+                if segment.name == "description" and segment is not segments[-1]:
+                    values[segment.name] = removeTags(data)
+                else:
+                    values[segment.name] = data.strip()
+        example = node.find(class_="right-code")
+        examples = dict.fromkeys(["exampleRequestDescription", "exampleRequestCurl", "exampleResponse"])
+        if example != None:
+            for segment in self.exampleOutline.segments(example):
+                if segment.name != None:
+                    examples[segment.name] = (" ".join([text(tag) for tag in segment.content])).strip()
+        if endpoint == None:
+            return None
+        return (endpoint, {
+            "description": values["description"],
+            "rateLimits": values["rateLimits"],
+            "authorization": values["authorization"],
+            "url": values["url"],
+            "slug": slug,
+            "requestQuery": values["requestQuery"],
+            "requestBody": values["requestBody"],
+            "responseBody": values["responseBody"],
+            "responseCodes": values["responseCodes"],
+            "exampleRequestDescription": examples["exampleRequestDescription"],
+            "exampleRequestCurl": examples["exampleRequestCurl"],
+            "exampleResponse": examples["exampleResponse"]
+        })
+
+    def mergeSection(self, ret:dict, section:tuple | None):
+        """
+        Add the endpoint returned by parseSection to the parsed data
+
+        Args:
+            ret (dict): The parsed data
+            section (tuple | None): The tuple returned by parseSection
+        """
+        if section != None:
+            ret["endpoints"][section[0]] = section[1]
+
+    def addArguments(self, parser:argparse.ArgumentParser):
+        """
+        Add arguments which are specific to this parser to the argument parser used by main()
+
+        Args:
+            parser (argparse.ArgumentParser): The argument parser
+        """
+        parser.add_argument("--workers", action="store", type=int, help="Parse the endpoint sections of the page in the specified number of processes. The output is identical to parsing in a single process. Default: 1")
+
+    def applyArguments(self, args:argparse.Namespace):
+        """
+        Apply the arguments added by addArguments(argparse.ArgumentParser) before main() parses the page
+
+        Args:
+            args (argparse.Namespace): The parsed arguments
+        """
+        self.workers = args.workers
+
+def parseChunk(chunk:str, wrapper:str, index:int, count:int) -> tuple:
+    """
+    Parse one chunk of a Twitch API Reference page which was split by TwitchReferenceParser.parseParallel(str). Runs in a worker process
+
+    The first chunk is everything before the first doc-content section, and must open the main element.
+    Every other chunk starts with a doc-content section, and is parsed inside an element named wrapper, standing in for the main element.
+    The section must be the only one in the chunk, and must be followed by an end tag for the wrapper in the last chunk only
+
+    Args:
+        chunk (str): The HTML of the chunk
+        wrapper (str): The tag name of the main element
+        index (int): The index of the chunk
+        count (int): The number of chunks
+
+    Returns:
+        tuple: A tuple of whether the chunk is valid, whether it contains the TOC heading, whether the TOC heading is in the section, the result of parseToc if the TOC heading is in the section, and the result of parseSection
+    """
+    sentinel = '<i id="twitch-reference-parser-chunk-end"></i>'
+    parser = TwitchReferenceParser()
+    if index == 0:
+        soup = BeautifulSoup(chunk + sentinel, "html.parser")
+        main = soup.find(class_="main")
+        end = soup.find("i", id="twitch-reference-parser-chunk-end")
+        valid = main != None and end != None and main.name == wrapper and any(x is main for x in end.parents) and soup.find(class_="doc-content") == None
+        return (valid, soup.find("h1", id="twitch-api-reference") != None, False, None, None)
+    soup = BeautifulSoup("<" + wrapper + ">" + chunk + sentinel, "html.parser")
+    main = soup.find(wrapper)
+    nodes = soup.find_all(class_="doc-content")
+    end = soup.find("i", id="twitch-reference-parser-chunk-end")
+    valid = len(nodes) == 1 and end != None and nodes[0].parent is main and (index == count - 1 or end.parent is main)
+    if not valid:
+        return (False, False, False, None, None)
+    tocheading = soup.find("h1", id="twitch-api-reference")
+    inNode = tocheading != None and any(x is nodes[0] for x in tocheading.parents)
+    return (True, tocheading != None, inNode, parser.parseToc(nodes[0]) if inNode else None, parser.parseSection(nodes[0]))
+
+
 if __name__ == "__main__":
     parser = TwitchReferenceParser()
     parser.main()
\ No newline at end of file
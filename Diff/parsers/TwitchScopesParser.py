@@ -19,11 +19,49 @@
 
 from bs4 import BeautifulSoup
 from BaseParser import BaseParser
+from Extraction import Column, string, Table
+
+def readDetails(cell) -> dict:
+    """
+    Read the second column of the scopes table, which contains the description, followed by the API endpoints and EventSub topics after their respective strong tags
+
+    Args:
+        cell: The td tag
+
+    Returns:
+        dict: A dict containing the description, api, and eventsub keys of an endpoint entry
+    """
+    section = "description"
+    out = {
+        "description": [],
+        "api": [],
+        "eventsub": []
+    }
+    for value in cell.stripped_strings:
+        value = str(value).strip()
+        if value == "API":
+            section = "api"
+        elif value == "EventSub":
+            section = "eventsub"
+        elif len(value) > 0:
+            out[section].append(value)
+    return {
+        "description": " ".join(out["description"]).strip(),
+        "api": out["api"],
+        "eventsub": out["eventsub"]
+    }
 
 class TwitchScopesParser(BaseParser):
     """
     Parse a Twitch API Scope page into a format that can be diffed
     """
+    scopesTable = Table(
+        Column("endpoint"),
+        Column("details", readDetails)
+    )
+    """
+    The table of scopes under each category
+    """
     def parse(self, html:str) -> dict:
         """
         Parse a Twitch API Scope page from the input HTML and return a dict of parsed data
@@ -71,40 +109,32 @@ class TwitchScopesParser(BaseParser):
         }
         soup = BeautifulSoup(html, "html.parser")
         nodes = soup.find(class_="main").find_all(class_="text-content")
+        tocheading = soup.find("h1", id="twitch-access-token-scopes")
+        tocnodes = set(id(x) for x in tocheading.parents) if tocheading != None else set()
         for node in nodes:
-            if node.find("h1", id="twitch-access-token-scopes") != None:
-                docs = node.find_all("h2")
-                for doc in docs:
-                    category = str(doc.string).strip()
+            if id(node) in tocnodes:
+                # Each category uses the first table after its H2 tag with the same parent, which is found in the same pass as the H2 tags
+                categories = []
+                pending = {}
+                tables = {}
+                for tag in node.find_all(["h2", "table"]):
+                    if tag.name == "h2":
+                        category = [string(tag), None]
+                        categories.append(category)
+                        pending.setdefault(id(tag.parent), []).append(category)
+                    else:
+                        for category in pending.pop(id(tag.parent), []):
+                            category[1] = tag
+                for category, table in categories:
                     if category not in ret["toc"]:
                         ret["toc"][category] = []
-                    table = doc.find_next_sibling("table")
-                    for entry in table.find("tbody").find_all("tr"):
-                        cells = entry.find_all("td")
-                        endpoint = str(cells[0].string).strip()
-                        data = cells[1].stripped_strings
-                        section = "description"
-                        out = {
-                            "description": [],
-                            "api": [],
-                            "eventsub": []
-                        }
-                        for string in data:
-                            string = str(string).strip()
-                            if string == "API":
-                                section = "api"
-                            elif string == "EventSub":
-                                section = "eventsub"
-                            elif len(string) > 0:
-                                out[section].append(string)
+                    if id(table) not in tables:
+                        tables[id(table)] = self.scopesTable.rows(table)
+                    for row in tables[id(table)]:
                         ret["toc"][category].append({
-                            "endpoint": endpoint
+                            "endpoint": row["endpoint"]
                         })
-                        ret["endpoints"][endpoint] = {
-                            "description": " ".join(out["description"]).strip(),
-                            "api": out["api"],
-                            "eventsub": out["eventsub"]
-                        }
+                        ret["endpoints"][row["endpoint"]] = row["details"]
         return ret
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import json
+from pathlib import Path
+import sys
+import unittest
+
+sys.path.insert(0, str(Path(Path(__file__).parent.parent, "parsers")))
+
+from BaseParser import BaseParser
+
+class DiffObjTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = BaseParser()
+
+    def testNestedArrayAdded(self):
+        self.assertEqual(self.parser.diffobj({"a": [[1], [2]]}, {"a": [[1], [2], [3]]}), {"a": [{"value": [3], "_operation": "add"}]})
+        self.assertEqual(self.parser.diffobj([[1, 2]], [[1, 2], [3]]), [{"value": [3], "_operation": "add"}])
+
+    def testNestedArrayRemoved(self):
+        self.assertEqual(self.parser.diffobj([[1, 2], [3]], [[1, 2]]), [{"value": [3], "_operation": "remove"}])
+
+    def testNestedArrayReplaced(self):
+        self.assertEqual(self.parser.diffobj([[1], 5], [[2]]), [[{"_operation": "unknown", "lhs": 1, "rhs": 2}], {"value": 5, "_operation": "remove"}])
+
+    def testStructureKeepsValues(self):
+        diff = self.parser.diffobj('{"a": 1, "b": 2}', '{"a": 1, "c": [3]}', key="exampleResponse")
+        self.assertEqual(diff["changes"], {"b": {"_operation": "remove", "lhs": "2"}, "c": {"_operation": "add", "rhs": ["3"]}})
+
+    def testStructureOnlyForStructureFields(self):
+        lhs = {"exampleResponse": '{"a": 1}', "description": '{"a": 1}'}
+        rhs = {"exampleResponse": '{"a": 2}', "description": '{"a": 2}'}
+        diff = self.parser.diffobj(lhs, rhs)
+        self.assertEqual(diff["exampleResponse"]["_operation"], "structure")
+        self.assertEqual(diff["description"]["_operation"], "replace")
+        self.assertEqual(self.parser.diffEndpoint(lhs, rhs), diff)
+        self.parser.structureFields = frozenset()
+        self.assertEqual(self.parser.diffobj(lhs, rhs)["exampleResponse"]["_operation"], "replace")
+
+    def testCurlOptionValueIsNotUrl(self):
+        fmt, value = self.parser.structure("curl -u user:pass -o out.json https://example.com/a")
+        self.assertEqual(value["url"], "https://example.com/a")
+        self.assertEqual(value["options"], ["-u user:pass", "-o out.json"])
+
+class RenameTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = BaseParser(renames=True)
+        with open(Path(Path(__file__).parent, "fixtures", "renames.json"), "r", encoding="utf8") as fixture_file:
+            self.endpoints = json.load(fixture_file)
+
+    def snapshot(self, category:str, name:str) -> dict:
+        return {"toc": {category: [{"endpoint": name, "description": self.endpoints[name]["description"]}]}, "endpoints": {name: self.endpoints[name]}}
+
+    def testUnrelatedEndpointsAreNotRenamed(self):
+        # Same schema, pagination and error boilerplate, but a different resource
+        diff = self.parser.diff(self.snapshot("Channels", "Get Channel Followers"), self.snapshot("Channels", "Get Broadcaster Subscriptions"))
+        self.assertEqual(diff["endpoints"], {"Get Channel Followers": {"_operation": "remove"}, "Get Broadcaster Subscriptions": {"_operation": "add"}})
+        self.assertEqual([entry["_operation"] for entry in diff["toc"]["Channels"]], ["remove", "add"])
+
+    def testRenamedEndpointIsRenamed(self):
+        diff = self.parser.diff(self.snapshot("Channels", "Get Channel Followers"), self.snapshot("Channels", "Get Followers"))
+        self.assertEqual(list(diff["endpoints"]), ["Get Followers"])
+        self.assertEqual(diff["endpoints"]["Get Followers"]["_operation"], "rename")
+        self.assertEqual(diff["endpoints"]["Get Followers"]["from"], "Get Channel Followers")
+        self.assertEqual(diff["toc"]["Channels"][0]["_operation"], "rename")
+
+if __name__ == "__main__":
+    unittest.main()
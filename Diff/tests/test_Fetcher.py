@@ -0,0 +1,188 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, str(Path(Path(__file__).parent.parent, "parsers")))
+
+from Fetcher import FetchError, Fetcher
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves the scenarios of FetcherTest. The number of requests to each path is counted in server.counts
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status:int, body:bytes = b"", headers:dict | None = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        try:
+            self.route()
+        except ConnectionError:
+            # The client gave up, such as after a timeout or when a hedged request won
+            pass
+
+    def route(self):
+        with self.server.lock:
+            count = self.server.counts.get(self.path, 0) + 1
+            self.server.counts[self.path] = count
+        if self.path == "/ok":
+            self.respond(200, "héllo".encode("utf8"), {"Content-Type": "text/html; charset=utf-8"})
+        elif self.path == "/flaky":
+            if count <= 2:
+                self.respond(503)
+            else:
+                self.respond(200, b"recovered")
+        elif self.path == "/down":
+            self.respond(503)
+        elif self.path == "/missing":
+            self.respond(404)
+        elif self.path == "/retryafter-short":
+            if count == 1:
+                self.respond(429, headers={"Retry-After": "0"})
+            else:
+                self.respond(200, b"after")
+        elif self.path == "/retryafter-long":
+            self.respond(429, headers={"Retry-After": "3600"})
+        elif self.path == "/slow":
+            time.sleep(2)
+            self.respond(200, b"slow")
+        elif self.path == "/hedge":
+            # Only the first request is slow, so a hedged request wins
+            if count == 1:
+                time.sleep(2)
+            self.respond(200, b"hedged")
+        elif self.path == "/trickle":
+            # Headers arrive at once, then a byte every 100ms, so the read timeout never fires
+            self.send_response(200)
+            self.end_headers()
+            for _ in range(30):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.1)
+        elif self.path == "/gzip":
+            body = gzip.compress(("ä€" * 5000).encode("utf8"))
+            self.respond(200, body, {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip"})
+        else:
+            self.respond(404)
+
+class FetcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.server.counts = {}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = "http://127.0.0.1:" + str(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        with self.server.lock:
+            self.server.counts.clear()
+
+    def count(self, path:str) -> int:
+        with self.server.lock:
+            return self.server.counts.get(path, 0)
+
+    def testSuccess(self):
+        self.assertEqual(Fetcher().fetch(self.base + "/ok"), "héllo")
+        self.assertEqual(self.count("/ok"), 1)
+
+    def testFlakyServerIsRetried(self):
+        self.assertEqual(Fetcher(retries=3, backoff=0.01).fetch(self.base + "/flaky"), "recovered")
+        self.assertEqual(self.count("/flaky"), 3)
+
+    def testRetriesRunOut(self):
+        with self.assertRaises(FetchError) as context:
+            Fetcher(retries=2, backoff=0.01).fetch(self.base + "/down")
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(self.count("/down"), 3)
+
+    def testClientErrorIsNotRetried(self):
+        with self.assertRaises(FetchError) as context:
+            Fetcher(retries=3, backoff=0.01).fetch(self.base + "/missing")
+        self.assertEqual(context.exception.status, 404)
+        self.assertEqual(self.count("/missing"), 1)
+
+    def testRetryAfterIsHonoured(self):
+        self.assertEqual(Fetcher(retries=1).fetch(self.base + "/retryafter-short"), "after")
+        self.assertEqual(self.count("/retryafter-short"), 2)
+
+    def testRetryAfterAboveMaximumFails(self):
+        start = time.monotonic()
+        with self.assertRaises(FetchError) as context:
+            Fetcher(retries=3, maxRetryAfter=1.0).fetch(self.base + "/retryafter-long")
+        self.assertEqual(context.exception.status, 429)
+        self.assertEqual(self.count("/retryafter-long"), 1)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def testSlowServerTimesOut(self):
+        with self.assertRaises(FetchError) as context:
+            Fetcher(readTimeout=0.3, retries=1, backoff=0.01).fetch(self.base + "/slow")
+        self.assertEqual(context.exception.status, None)
+        self.assertEqual(self.count("/slow"), 2)
+
+    def testDeadlineStopsRetries(self):
+        start = time.monotonic()
+        with self.assertRaises(FetchError):
+            Fetcher(readTimeout=10, retries=5, backoff=0.01, deadline=0.5).fetch(self.base + "/slow")
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(self.count("/slow"), 1)
+
+    def testDeadlineStopsTrickledBody(self):
+        start = time.monotonic()
+        with self.assertRaises(FetchError) as context:
+            Fetcher(retries=0, deadline=0.5).fetch(self.base + "/trickle")
+        self.assertEqual(context.exception.status, 200)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def testHedgedRequestWins(self):
+        start = time.monotonic()
+        self.assertEqual(Fetcher(retries=0, hedgeAfter=0.2).fetch(self.base + "/hedge"), "hedged")
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(self.count("/hedge"), 2)
+
+    def testStreamingDecode(self):
+        fetcher = Fetcher()
+        # Small chunks split the multi-byte characters of the decompressed body between chunks
+        fetcher.chunkSize = 7
+        chunks = []
+        text = fetcher.fetch(self.base + "/gzip", lambda chunk: chunks.append(chunk) or chunk.upper())
+        self.assertEqual(text, ("ä€" * 5000).upper())
+        self.assertGreater(len(chunks), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import io
+import json
+from pathlib import Path
+import sys
+import unittest
+
+sys.path.insert(0, str(Path(Path(__file__).parent.parent, "parsers")))
+
+from JsonStream import StreamedObject
+from MarkdownRenderer import MarkdownRenderer
+
+def materialize(value):
+    if isinstance(value, StreamedObject):
+        return {key: materialize(item) for key, item in value.items()}
+    return value
+
+class StreamedObjectTest(unittest.TestCase):
+    document = {
+        "a\"\\{": [1.5e3, -0, True, None, "x\\\"}]{[", {"k": "é😀"}],
+        "endpoints": {"Get Thing": {"s": "\\" * 5}, "Big": 12345678901234567890},
+        "n": 12345,
+        "empty": {},
+        "list": []
+    }
+
+    def stream(self, chunkSize:int, lazyDepth:int = 1, indent:int | None = None) -> StreamedObject:
+        text = json.dumps(self.document, ensure_ascii=False, indent=indent)
+        return StreamedObject(lambda: io.StringIO(text), lazyDepth=lazyDepth, chunkSize=chunkSize)
+
+    def testMatchesJsonLoad(self):
+        # Small chunks split every token, escape, and number across reads
+        for chunkSize in range(1, 24):
+            for lazyDepth, indent in ((1, None), (3, 2)):
+                with self.subTest(chunkSize=chunkSize, lazyDepth=lazyDepth):
+                    obj = self.stream(chunkSize, lazyDepth, indent)
+                    self.assertEqual(materialize(obj), self.document)
+                    self.assertEqual(list(obj), list(self.document))
+                    self.assertEqual(len(obj), len(self.document))
+                    self.assertEqual(obj["n"], 12345)
+                    self.assertEqual(materialize(obj["endpoints"]), self.document["endpoints"])
+
+    def testLazyValues(self):
+        obj = self.stream(4)
+        self.assertIsInstance(obj["endpoints"], StreamedObject)
+        self.assertIsInstance(obj["endpoints"]["Get Thing"], dict)
+        self.assertIsInstance(obj["a\"\\{"], list)
+
+    def testMissingKey(self):
+        obj = self.stream(4)
+        self.assertNotIn("missing", obj)
+        self.assertEqual(obj.get("missing", {}), {})
+        with self.assertRaises(KeyError):
+            obj["endpoints"]["missing"]
+
+    def testRendersLikeDict(self):
+        diff = {
+            "endpoints": {
+                "Get Thing " + str(i): {"_operation": "add"} if i % 3 == 0 else {"description": {"_operation": "replace", "combined": "<del>old</del><ins>new</ins> " + str(i)}}
+                for i in range(40)
+            },
+            "toc": {"Ads": [{"_operation": "add", "endpoint": "Get Thing 0"}]}
+        }
+        text = json.dumps(diff)
+        for budget in (200, 1000, MarkdownRenderer.issueBudget):
+            with self.subTest(budget=budget):
+                expected = "".join(MarkdownRenderer(budget, "Title").render(diff))
+                actual = "".join(MarkdownRenderer(budget, "Title").render(StreamedObject(lambda: io.StringIO(text), chunkSize=64)))
+                self.assertEqual(actual, expected)
+
+if __name__ == "__main__":
+    unittest.main()
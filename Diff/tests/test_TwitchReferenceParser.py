@@ -0,0 +1,59 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+import json
+from pathlib import Path
+import sys
+import unittest
+
+sys.path.insert(0, str(Path(Path(__file__).parent.parent, "parsers")))
+
+from Fetcher import Fetcher
+from ParseModel import ParseModel
+from TwitchReferenceParser import TwitchReferenceParser
+
+fixtures = Path(Path(__file__).parent, "fixtures")
+
+class TwitchReferenceParserTest(unittest.TestCase):
+    def testTakesBaseParserArguments(self):
+        fetcher = Fetcher()
+        model = ParseModel()
+        parser = TwitchReferenceParser(fetcher, 5, "words", True, model, None, 3, workers=2)
+        self.assertIs(parser.fetcher, fetcher)
+        self.assertEqual((parser.context, parser.contextUnit, parser.renames, parser.diffWorkers, parser.workers), (5, "words", True, 3, 2))
+        self.assertIs(parser.model, model)
+
+    def testMatchesBaselineParser(self):
+        # TwitchReference.json is the output of the parser before it was split into Extraction steps
+        with open(Path(fixtures, "TwitchReference.json"), "r", encoding="utf8", newline="") as f:
+            expected = f.read()
+        parser = TwitchReferenceParser()
+        self.assertEqual(json.dumps(parser.parseFromFile(str(Path(fixtures, "TwitchReference.html"))), indent=4), expected)
+
+    def testParallelMatchesSerial(self):
+        path = str(Path(fixtures, "TwitchReference.html"))
+        serial = json.dumps(TwitchReferenceParser().parseFromFile(path), indent=4)
+        parser = TwitchReferenceParser(workers=2)
+        with open(path, "r", encoding="utf8") as f:
+            parallel = parser.parseParallel(parser.normalize(f.read()))
+        self.assertIsNotNone(parallel)
+        self.assertEqual(json.dumps(parallel, indent=4), serial)
+        self.assertEqual(json.dumps(parser.parseFromFile(path), indent=4), serial)
+
+if __name__ == "__main__":
+    unittest.main()
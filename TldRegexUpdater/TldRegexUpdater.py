@@ -18,30 +18,198 @@
 #
 
 import argparse
+import gc
 import json
 import idna
+import os
+from pathlib import Path
+import random
+import re
 import requests
+import sys
+import timeit
+import tracemalloc
 
-tlds = {}
-itlds = {}
-xntlds = {}
+url = "https://data.iana.org/TLD/tlds-alpha-by-domain.txt"
+"""
+The URL of the IANA TLD list
+"""
+
+useragent = "gmt2001.tldregexupdater/2023"
+"""
+The user agent sent when fetching the IANA TLD list
+"""
 
 eopmark = "_"
+"""
+Marks the end of a TLD in a trie
+"""
 
 escapes = ["(", ")", ".", "\\", "[", "]"]
-
-parser = argparse.ArgumentParser()
-parser.add_argument("-v", action="store_true", help="Verbose (Creates syntax tree files and tld text file)")
-args = parser.parse_args()
+"""
+Characters which must be escaped in the regex
+"""
 
 def escape(echr):
-    global escapes
+    """
+    Escape a character for use in the regex
+
+    Args:
+        echr (str): The character
+
+    Returns:
+        str: The escaped character
+    """
     if echr in escapes:
         return "\\" + echr
     return echr
 
+def writeFile(path:str | Path, text:str) -> bool:
+    """
+    Atomically write a UTF-8 text file, creating the parent folder if needed
+
+    The file is left untouched if it already contains the text, so its modification time only changes when its contents do
+
+    Args:
+        path (str | Path): The path to the file
+        text (str): The text
+
+    Returns:
+        bool: True if the file was written; False if it already contained the text
+    """
+    path = Path(path)
+    try:
+        with open(path, "r", encoding="utf8") as in_file:
+            if in_file.read() == text:
+                return False
+    except (OSError, ValueError):
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + "." + str(os.getpid()) + ".tmp")
+    with open(temp, "w", encoding="utf8") as out_file:
+        out_file.write(text)
+    os.replace(temp, path)
+    return True
+
+def loadState(cachedir:str | Path) -> dict:
+    """
+    Load the state of the previous run from the cache folder
+
+    Args:
+        cachedir (str | Path): The cache folder
+
+    Returns:
+        dict: The state, with the keys etag and lastModified from the last fetch, and emitter of the regex the outputs were last generated with; {} if there is no valid state
+    """
+    try:
+        with open(Path(cachedir, "state.json"), "r", encoding="utf8") as state_file:
+            state = json.load(state_file)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def saveState(cachedir:str | Path, state:dict):
+    """
+    Atomically save the state of this run to the cache folder
+
+    Args:
+        cachedir (str | Path): The cache folder
+        state (dict): The state, as described in loadState(str | Path)
+    """
+    writeFile(Path(cachedir, "state.json"), json.dumps(state, indent=4))
+
+def loadList(path:str | Path) -> str:
+    """
+    Load an IANA TLD list from a local file
+
+    Args:
+        path (str | Path): The path to a file in the format of tlds-alpha-by-domain.txt
+
+    Returns:
+        str: The contents of the file
+    """
+    with open(path, "r", encoding="utf8") as list_file:
+        return list_file.read()
+
+def loadPrevious(cachedir:str | Path) -> dict | None:
+    """
+    Load the list the outputs were last generated from, and the tries built from it, from the cache folder
+
+    Args:
+        cachedir (str | Path): The cache folder
+
+    Returns:
+        dict | None: A dict with the keys list, tlds, itlds, and xntlds, as described in savePrevious(str | Path, str, dict, dict, dict); None if there is no valid previous list
+    """
+    try:
+        with open(Path(cachedir, "previous.json"), "r", encoding="utf8") as previous_file:
+            previous = json.load(previous_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(previous, dict) or not all(isinstance(previous.get(key), t) for key, t in (("list", str), ("tlds", dict), ("itlds", dict), ("xntlds", dict))):
+        return None
+    return previous
+
+def savePrevious(cachedir:str | Path, tldsresponse:str, tlds:dict, itlds:dict, xntlds:dict):
+    """
+    Atomically save the list the outputs were generated from, and the tries built from it, to the cache folder, so the next run can patch them
+
+    Args:
+        cachedir (str | Path): The cache folder
+        tldsresponse (str): The contents of the IANA TLD list, including its version line
+        tlds (dict): The trie, as returned by buildTrie(str)
+        itlds (dict): The combined trie, as returned by combineTldsRecursive(dict)
+        xntlds (dict): The IDNA TLDs, as returned by buildTrie(str)
+    """
+    writeFile(Path(cachedir, "previous.json"), json.dumps({"list": tldsresponse, "tlds": tlds, "itlds": itlds, "xntlds": xntlds}))
+
+def fetchList(cachedir:str | Path, timeout:float = 30.0, listurl:str = url) -> str:
+    """
+    Fetch the IANA TLD list, using a conditional GET against the copy in the cache folder
+
+    If the server responds with 304 Not Modified, the cached copy is returned without downloading the list again. Otherwise the new list is cached along with its ETag and Last-Modified headers
+
+    Args:
+        cachedir (str | Path): The cache folder
+        timeout (float): The maximum number of seconds to wait for the connection and between bytes. Default: 30
+        listurl (str): The URL of the list. Default: url
+
+    Returns:
+        str: The contents of the list
+
+    Raises:
+        requests.RequestException: The request failed, or the server responded with a status other than 200 or 304
+    """
+    cached = Path(cachedir, "tlds-alpha-by-domain.txt")
+    state = loadState(cachedir)
+    headers = { "User-Agent": useragent }
+    if cached.is_file():
+        if state.get("etag") != None:
+            headers["If-None-Match"] = state["etag"]
+        if state.get("lastModified") != None:
+            headers["If-Modified-Since"] = state["lastModified"]
+    resp = requests.get(listurl, headers = headers, timeout = timeout)
+    if resp.status_code == 304 and cached.is_file():
+        return loadList(cached)
+    if resp.status_code != 200:
+        raise requests.HTTPError("Fetching " + listurl + " failed with HTTP " + str(resp.status_code), response=resp)
+    writeFile(cached, resp.text)
+    state["etag"] = resp.headers.get("ETag")
+    state["lastModified"] = resp.headers.get("Last-Modified")
+    saveState(cachedir, state)
+    return resp.text
+
 def addTLDRecursive(tld_s, tld):
-    global eopmark
+    """
+    Add the remaining characters of a TLD to a trie
+
+    Args:
+        tld_s (str): The remaining characters of the TLD
+        tld (dict): The node of the trie for the characters before tld_s
+
+    Returns:
+        tuple: The node, and whether it now only contains the end of the TLD
+    """
     if tld_s[0] in tld:
         ctld = tld[tld_s[0]]
     else:
@@ -54,30 +222,210 @@ def addTLDRecursive(tld_s, tld):
     isend = len(tld) == 1 and eopmark in tld
     return tld, isend
 
-resp = requests.get("https://data.iana.org/TLD/tlds-alpha-by-domain.txt", headers = { "User-Agent": "gmt2001.tldregexupdater/2023" })
-if resp.status_code != 200:
-    exit(1)
-tldsresponse = resp.text
-lines = tldsresponse.splitlines()
-for line in lines:
-    line = line.strip()
-    if not line.startswith("#"):
-        tld_s = line.lower()
-        if tld_s.startswith("xn--"):
-            xntlds[tld_s] = idna.decode(line)
-            if xntlds[tld_s][0] in tlds:
-                xntld = tlds[xntlds[tld_s][0]]
+def buildTrie(tldsresponse:str) -> tuple:
+    """
+    Build a trie of one character per node from an IANA TLD list
+
+    IDNA TLDs are added both in their ASCII (xn--) form and their Unicode form
+
+    Args:
+        tldsresponse (str): The contents of the list
+
+    Returns:
+        tuple: The trie, and a dict of the ASCII form of each IDNA TLD to its Unicode form
+    """
+    tlds = {}
+    xntlds = {}
+    lines = tldsresponse.splitlines()
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("#"):
+            tld_s = line.lower()
+            if tld_s.startswith("xn--"):
+                xntlds[tld_s] = idna.decode(line)
+                if xntlds[tld_s][0] in tlds:
+                    xntld = tlds[xntlds[tld_s][0]]
+                else:
+                    xntld = {}
+                tlds[xntlds[tld_s][0]], isend = addTLDRecursive(xntlds[tld_s][1:], xntld)
+            if tld_s[0] in tlds:
+                tld = tlds[tld_s[0]]
             else:
-                xntld = {}
-            tlds[xntlds[tld_s][0]], isend = addTLDRecursive(xntlds[tld_s][1:], xntld)
-        if tld_s[0] in tlds:
-            tld = tlds[tld_s[0]]
-        else:
-            tld = {}
-        tlds[tld_s[0]], isend = addTLDRecursive(tld_s[1:], tld)
+                tld = {}
+            tlds[tld_s[0]], isend = addTLDRecursive(tld_s[1:], tld)
+    return tlds, xntlds
+
+def listVersion(tldsresponse:str) -> str | None:
+    """
+    Get the version line of an IANA TLD list
+
+    Args:
+        tldsresponse (str): The contents of the list
+
+    Returns:
+        str | None: The first comment line, without the leading #; None if there is none
+    """
+    for line in tldsresponse.splitlines():
+        line = line.strip()
+        if line.startswith("#"):
+            return line[1:].strip()
+    return None
+
+def listNames(tldsresponse:str) -> list:
+    """
+    Get the TLDs in an IANA TLD list, in the order of the list
+
+    Args:
+        tldsresponse (str): The contents of the list
+
+    Returns:
+        list: The TLDs, in lower case
+    """
+    return [line.strip().lower() for line in tldsresponse.splitlines() if len(line.strip()) > 0 and not line.strip().startswith("#")]
+
+def diffLists(previous:str | None, tldsresponse:str) -> dict:
+    """
+    Compare two IANA TLD lists by their TLDs, ignoring the version line
+
+    Args:
+        previous (str | None): The contents of the previous list; None if there is none
+        tldsresponse (str): The contents of the current list
+
+    Returns:
+        dict: A dict with the keys previousVersion and version, containing the version lines; added and removed, containing the sorted TLDs which differ; unicode, containing the Unicode form of each IDNA TLD in added or removed; and changed
+    """
+    old = set(listNames(previous)) if previous != None else set()
+    new = set(listNames(tldsresponse))
+    added = sorted(new - old)
+    removed = sorted(old - new)
+    return {
+        "previousVersion": listVersion(previous) if previous != None else None,
+        "version": listVersion(tldsresponse),
+        "added": added,
+        "removed": removed,
+        "unicode": {tld: idna.decode(tld) for tld in added + removed if tld.startswith("xn--")},
+        "changed": previous == None or len(added) + len(removed) > 0
+    }
+
+def removeTLDRecursive(tld_s, tld):
+    """
+    Remove the remaining characters of a TLD from a trie, along with any nodes left empty
+
+    Args:
+        tld_s (str): The remaining characters of the TLD
+        tld (dict): The node of the trie for the characters before tld_s
+    """
+    if not tld_s[0] in tld:
+        return
+    ctld = tld[tld_s[0]]
+    if len(tld_s) > 1:
+        removeTLDRecursive(tld_s[1:], ctld)
+    else:
+        ctld.pop(eopmark, None)
+    if len(ctld) == 0:
+        del tld[tld_s[0]]
+
+def rankTlds(tldsresponse:str, xntlds:dict) -> dict:
+    """
+    Rank the TLDs of an IANA TLD list in the order buildTrie(str) adds them
+
+    Args:
+        tldsresponse (str): The contents of the list
+        xntlds (dict): The IDNA TLDs of the list, as returned by buildTrie(str)
+
+    Returns:
+        dict: The rank of each TLD and the Unicode form of each IDNA TLD
+    """
+    ranks = {}
+    for i, tld_s in enumerate(listNames(tldsresponse)):
+        if tld_s in xntlds:
+            ranks[xntlds[tld_s]] = (i, 0)
+        ranks[tld_s] = (i, 1)
+    return ranks
+
+def minRank(tld, prefix:str, ranks:dict, memo:dict) -> tuple:
+    """
+    Get the lowest rank of the TLDs under a node of a trie
+
+    Args:
+        tld (dict): The node
+        prefix (str): The characters of the node
+        ranks (dict): The ranks, as returned by rankTlds(str)
+        memo (dict): The ranks already computed, by prefix
+
+    Returns:
+        tuple: The lowest rank
+    """
+    if not prefix in memo:
+        ret = ranks[prefix] if eopmark in tld else (float("inf"), 0)
+        for key in tld:
+            if key != eopmark:
+                ret = min(ret, minRank(tld[key], prefix + key, ranks, memo))
+        memo[prefix] = ret
+    return memo[prefix]
+
+def patchTrie(tlds:dict, xntlds:dict, changes:dict, tldsresponse:str) -> set:
+    """
+    Apply the changes between two IANA TLD lists to the trie and IDNA TLDs built from the previous one
+
+    The nodes along the changed TLDs are reordered so that the trie is identical, including the order of its keys, to the one buildTrie(str) would build from the current list
+
+    Args:
+        tlds (dict): The trie, which is modified
+        xntlds (dict): The IDNA TLDs, which are modified
+        changes (dict): The changes, as returned by diffLists(str, str)
+        tldsresponse (str): The contents of the current list
+
+    Returns:
+        set: The top level keys of the trie which were changed
+    """
+    paths = []
+    for tld_s in changes["removed"]:
+        if tld_s in xntlds:
+            paths.append(xntlds.pop(tld_s))
+        paths.append(tld_s)
+    for tld_s in changes["added"]:
+        if tld_s.startswith("xn--"):
+            xntlds[tld_s] = changes["unicode"][tld_s]
+            paths.append(xntlds[tld_s])
+        paths.append(tld_s)
+    for tld_s in changes["removed"]:
+        removeTLDRecursive(tld_s, tlds)
+        if tld_s in changes["unicode"]:
+            removeTLDRecursive(changes["unicode"][tld_s], tlds)
+    for tld_s in changes["added"]:
+        if tld_s.startswith("xn--"):
+            addTLDRecursive(xntlds[tld_s], tlds)
+        addTLDRecursive(tld_s, tlds)
+    ranks = rankTlds(tldsresponse, xntlds)
+    memo = {}
+    reordered = set()
+    for path in paths:
+        tld = tlds
+        for i in range(len(path) + 1):
+            if not path[:i] in reordered:
+                reordered.add(path[:i])
+                items = sorted(tld.items(), key=lambda item: ranks[path[:i]] if item[0] == eopmark else minRank(item[1], path[:i] + item[0], ranks, memo))
+                tld.clear()
+                tld.update(items)
+            if i == len(path) or not path[i] in tld:
+                break
+            tld = tld[path[i]]
+    items = sorted(xntlds.items(), key=lambda item: ranks[item[0]])
+    xntlds.clear()
+    xntlds.update(items)
+    return set(path[0] for path in paths)
 
 def combineTldsRecursive(tlds):
-    global eopmark
+    """
+    Combine chains of nodes with a single child in a trie into one node with a multi-character key
+
+    Args:
+        tlds (dict): The trie
+
+    Returns:
+        dict: The combined trie
+    """
     ntlds = {}
     for tld in tlds:
         if tld == eopmark:
@@ -94,9 +442,37 @@ def combineTldsRecursive(tlds):
                 ntlds[tld] = ntld
     return ntlds
 
-itlds = combineTldsRecursive(tlds)
+def patchCombined(tlds:dict, itlds:dict, touched:set) -> dict:
+    """
+    Update a combined trie after patchTrie(dict, dict, dict, str), only recombining the top level keys which were changed
+
+    Args:
+        tlds (dict): The patched trie
+        itlds (dict): The combined trie built from the trie before it was patched
+        touched (set): The top level keys which were changed, as returned by patchTrie(dict, dict, dict, str)
+
+    Returns:
+        dict: The combined trie, identical to combineTldsRecursive(tlds)
+    """
+    previous = {key[0]: key for key in itlds}
+    ntlds = {}
+    for tld in tlds:
+        if tld in touched or not tld in previous:
+            ntlds.update(combineTldsRecursive({tld: tlds[tld]}))
+        else:
+            ntlds[previous[tld]] = itlds[previous[tld]]
+    return ntlds
 
 def combineSingles(singles):
+    """
+    Combine runs of consecutive characters into ranges for a character class
+
+    Args:
+        singles (list): The characters, in order
+
+    Returns:
+        list: The characters and ranges
+    """
     retval = []
     curval = ""
     for single in singles:
@@ -124,7 +500,15 @@ def combineSingles(singles):
     return retval
 
 def compileRegexRecursive(tlds):
-    global eopmark
+    """
+    Compile a combined trie into a regex
+
+    Args:
+        tlds (dict): The combined trie
+
+    Returns:
+        str: The regex
+    """
     singles = {}
     nonsingles = []
     for tld in tlds:
@@ -164,25 +548,565 @@ def compileRegexRecursive(tlds):
         regex = regex + ")"
     return regex
 
-regex = "(?<tld>"
+def compileRegex(itlds:dict) -> str:
+    """
+    Compile a combined trie into the TLD portion of the link detection regex
+
+    Args:
+        itlds (dict): The combined trie, as returned by combineTldsRecursive(dict)
+
+    Returns:
+        str: The regex, as a .NET named group called tld
+    """
+    return "(?<tld>" + compileRegexRecursive(itlds) + ")"
+
+def buildDawg(tlds:dict) -> tuple:
+    """
+    Minimize a trie into a directed acyclic word graph, where every set of equivalent suffixes is a single state
+
+    Args:
+        tlds (dict): The trie, as returned by buildTrie(str)
+
+    Returns:
+        tuple: A list of states, each a tuple of whether the state accepts and a dict of each character to the index of the next state, and the index of the start state.
+        A state always has a higher index than the states it leads to
+    """
+    states = []
+    register = {}
+    def minimize(node):
+        edges = tuple(sorted((c, minimize(child)) for c, child in node.items() if c != eopmark))
+        signature = (eopmark in node, edges)
+        if signature not in register:
+            register[signature] = len(states)
+            states.append((signature[0], dict(edges)))
+        return register[signature]
+    return states, minimize(tlds)
+
+def postDominators(states:list) -> list:
+    """
+    Find the immediate post-dominator of every state of a DAWG, which is the nearest state that every accepting path from the state passes through
+
+    Args:
+        states (list): The states, as returned by buildDawg(dict)
+
+    Returns:
+        list: The index of the immediate post-dominator of each state; -1 if it is the end of the word
+    """
+    ipdom = [-1] * len(states)
+    depth = {-1: 0}
+    def intersect(a, b):
+        while a != b:
+            if depth[a] < depth[b]:
+                a, b = b, a
+            a = ipdom[a]
+        return a
+    for i, (final, edges) in enumerate(states):
+        successors = list(edges.values())
+        if final:
+            successors.append(-1)
+        p = successors[0]
+        for successor in successors[1:]:
+            p = intersect(p, successor)
+        ipdom[i] = p
+        depth[i] = depth[p] + 1
+    return ipdom
+
+def charClass(chars:list) -> str:
+    """
+    Create a regex which matches any one of the characters, using a character class with ranges if there is more than one
+
+    Args:
+        chars (list): The characters
+
+    Returns:
+        str: The regex
+    """
+    chars = sorted(chars)
+    if len(chars) == 1:
+        return escape(chars[0]) if chars[0] != "-" else "-"
+    ranges = []
+    for c in chars:
+        if len(ranges) > 0 and ord(c) == ord(ranges[-1][1]) + 1:
+            ranges[-1][1] = c
+        else:
+            ranges.append([c, c])
+    ret = "["
+    for start, end in ranges:
+        start = "\\" + start if start in "\\]^-" else start
+        if ord(end) - ord(start[-1]) >= 2:
+            ret = ret + start + "-" + ("\\" + end if end in "\\]^-" else end)
+        else:
+            for c in range(ord(start[-1]), ord(end) + 1):
+                ret = ret + ("\\" + chr(c) if chr(c) in "\\]^-" else chr(c))
+    return ret + "]"
+
+def compileDawgRegex(states:list, root:int) -> str:
+    """
+    Compile a DAWG into the TLD portion of the link detection regex
+
+    Each state is split at its immediate post-dominator, so a suffix which is shared by every branch of an alternation is emitted once after the alternation instead of at the end of every branch.
+    Branches which all pass through the same later state are grouped into a nested alternation followed by the suffix of that state, when that makes the regex shorter.
+    Characters which lead to the same state are merged into a character class. As in compileRegexRecursive(dict), the empty alternative of a state which accepts is first
+
+    Args:
+        states (list): The states, as returned by buildDawg(dict)
+        root (int): The index of the start state
+
+    Returns:
+        str: The regex, as a .NET named group called tld
+    """
+    ipdom = postDominators(states)
+    memo = {}
+    def chain(state, stop):
+        ret = []
+        while state != stop:
+            ret.append(state)
+            state = ipdom[state]
+        return ret
+    def merge(branches, stop):
+        # Each branch is a regex for the start of the branch and the state it reaches, and matches the regex followed by emit(state, stop)
+        merged = True
+        while merged:
+            merged = False
+            chains = [chain(target, stop) for _, target in branches]
+            counts = {}
+            for c in chains:
+                for state in c:
+                    counts[state] = counts.get(state, 0) + 1
+            groups = {}
+            for i, c in enumerate(chains):
+                key = next((state for state in c if counts[state] > 1 and (counts[state] - 1) * len(emit(state, stop)) > 4), None)
+                groups.setdefault(key if key != None else (i,), []).append(i)
+            nbranches = []
+            for key, members in groups.items():
+                if isinstance(key, int) and len(members) > 1:
+                    suffix = emit(key, stop)
+                    if (len(members) - 1) * len(suffix) > 4:
+                        nbranches.append(("(?:" + "|".join(branches[i][0] + emit(branches[i][1], key) for i in members) + ")", key))
+                        merged = True
+                        continue
+                nbranches.extend(branches[i] for i in members)
+            branches = nbranches
+        return [prefix + emit(target, stop) for prefix, target in branches]
+    def emit(state, stop):
+        if state == stop:
+            return ""
+        if (state, stop) in memo:
+            return memo[(state, stop)]
+        if ipdom[state] != stop:
+            ret = emit(state, ipdom[state]) + emit(ipdom[state], stop)
+        else:
+            final, edges = states[state]
+            targets = {}
+            for c, target in edges.items():
+                targets.setdefault(target, []).append(c)
+            alternatives = merge([(charClass(chars), target) for chars, target in sorted((sorted(chars), target) for target, chars in targets.items())], stop)
+            if final and stop == -1:
+                alternatives.insert(0, "")
+            ret = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        memo[(state, stop)] = ret
+        return ret
+    return "(?<tld>" + emit(root, -1) + ")"
+
+def words(tldsresponse:str) -> list:
+    """
+    Returns every TLD in an IANA TLD list, in lower case, followed by the Unicode form of every IDNA TLD
+
+    Args:
+        tldsresponse (str): The contents of the list
+
+    Returns:
+        list: The TLDs
+    """
+    ret = []
+    unicode = []
+    for line in tldsresponse.splitlines():
+        line = line.strip()
+        if len(line) > 0 and not line.startswith("#"):
+            ret.append(line.lower())
+            if line.lower().startswith("xn--"):
+                unicode.append(idna.decode(line))
+    return ret + unicode
+
+def pythonRegex(regex:str) -> re.Pattern:
+    """
+    Compile a generated regex with the Python re module, which uses a different syntax for named groups
+
+    Args:
+        regex (str): The regex, as returned by compileRegex(dict) or compileDawgRegex(list, int)
+
+    Returns:
+        re.Pattern: The compiled regex
+    """
+    return re.compile(regex.replace("(?<tld>", "(?P<tld>", 1))
+
+def verifyRegex(regex:str, tlds:list) -> list:
+    """
+    Check that a regex matches exactly the TLDs in a list
+
+    Every TLD must match in full. Every proper prefix of a TLD, every TLD with one character removed, and every TLD followed by one more character
+    from the alphabet of the TLDs must not match, unless it is also a TLD
+
+    Args:
+        regex (str): The regex, as returned by compileRegex(dict) or compileDawgRegex(list, int)
+        tlds (list): The TLDs, as returned by words(str)
+
+    Returns:
+        list: The strings which were matched or not matched incorrectly; [] if the regex is correct
+    """
+    pattern = pythonRegex(regex)
+    expected = set(tlds)
+    alphabet = sorted(set(c for tld in expected for c in tld))
+    candidates = set(expected)
+    for tld in expected:
+        for i in range(len(tld)):
+            candidates.add(tld[:i])
+            candidates.add(tld[:i] + tld[i + 1:])
+        for c in alphabet:
+            candidates.add(tld + c)
+    return sorted(x for x in candidates if (pattern.fullmatch(x) != None) != (x in expected))
+
+def benchmarkRegex(regexes:dict, tlds:list, repeat:int = 5) -> dict:
+    """
+    Measure the size of regexes and the time they take to match TLDs, and to search text for TLDs
+
+    Args:
+        regexes (dict): The regexes to measure, by name
+        tlds (list): The TLDs, as returned by words(str)
+        repeat (int): The number of times each measurement is repeated, keeping the fastest. Default: 5
+
+    Returns:
+        dict: For each name, the length of the regex in characters, and the seconds taken to fullmatch every TLD and to search a chat-like text
+    """
+    text = " ".join("see example." + tld + "/path for details" for tld in tlds)
+    ret = {}
+    for name, regex in regexes.items():
+        pattern = pythonRegex(regex)
+        matchTime = min(timeit.repeat(lambda: [pattern.fullmatch(tld) for tld in tlds], number=1, repeat=repeat))
+        searchPattern = re.compile(r"\.(?:" + pattern.pattern + r")(?![\w-])")
+        searchTime = min(timeit.repeat(lambda: searchPattern.findall(text), number=1, repeat=repeat))
+        ret[name] = {"length": len(regex), "fullmatch": matchTime, "search": searchTime}
+    return ret
+
+def buildTable(tlds:list) -> dict:
+    """
+    Build a sorted string table of TLDs, bucketed by length
+
+    Each bucket is a single string of the TLDs of that length, sorted by code point and concatenated, so a TLD can be found with a binary search over fixed-width slices
+
+    Args:
+        tlds (list): The TLDs, as returned by words(str)
 
-regex = regex + compileRegexRecursive(itlds)
+    Returns:
+        dict: A dict with the key lengths, which maps each length, as a str, to its bucket
+    """
+    buckets = {}
+    for tld in set(tlds):
+        buckets.setdefault(len(tld), []).append(tld)
+    return {"lengths": {str(length): "".join(sorted(buckets[length])) for length in sorted(buckets)}}
 
-regex = regex + ")"
+def tableContains(table:dict, name:str) -> bool:
+    """
+    Check if a name is a TLD, using a table created by buildTable(list)
 
-if args.v:
-    with open("tld_tree.json", "w", encoding="utf8") as tld_file:
-        json.dump(tlds, tld_file)
-    with open("tld_itree.json", "w", encoding="utf8") as tld_file:
-        json.dump(itlds, tld_file)
-    with open("xntlds.json", "w", encoding="utf8") as tld_file:
-        json.dump(xntlds, tld_file)
-    with open("tlds.txt", "w", encoding="utf8") as tld_file:
+    Args:
+        table (dict): The table
+        name (str): The name, in lower case
+
+    Returns:
+        bool: True if the name is a TLD
+    """
+    length = len(name)
+    bucket = table["lengths"].get(str(length))
+    if bucket == None:
+        return False
+    lo = 0
+    hi = len(bucket) // length
+    while lo < hi:
+        mid = (lo + hi) // 2
+        value = bucket[mid * length:(mid + 1) * length]
+        if value < name:
+            lo = mid + 1
+        elif value > name:
+            hi = mid
+        else:
+            return True
+    return False
+
+def fnv1a(name:str, seed:int = 0) -> int:
+    """
+    Hash a str with 32-bit FNV-1a over its UTF-8 bytes, with the seed mixed into the offset basis
+
+    Args:
+        name (str): The str
+        seed (int): The seed. Default: 0
+
+    Returns:
+        int: The hash
+    """
+    h = (2166136261 ^ seed) & 0xffffffff
+    for b in name.encode("utf8"):
+        h = ((h ^ b) * 16777619) & 0xffffffff
+    return h
+
+def buildPerfectHash(tlds:list) -> dict:
+    """
+    Build a minimal perfect hash table of TLDs with hash and displace
+
+    Every TLD is put in a bucket by fnv1a(name). Starting with the largest bucket, each bucket is assigned the first seed which puts all of its TLDs in free slots by fnv1a(name, seed).
+    A bucket with a single TLD instead stores -1 - slot to use any remaining free slot directly
+
+    Args:
+        tlds (list): The TLDs, as returned by words(str)
+
+    Returns:
+        dict: A dict with the keys seeds, which contains the seed of each bucket (0 for an empty bucket), and keys, which contains the TLD in each slot
+    """
+    keys = sorted(set(tlds))
+    size = len(keys)
+    buckets = [[] for _ in range(size)]
+    for key in keys:
+        buckets[fnv1a(key) % size].append(key)
+    seeds = [0] * size
+    slots = [None] * size
+    order = sorted(range(size), key=lambda i: (-len(buckets[i]), i))
+    for i in order:
+        bucket = buckets[i]
+        if len(bucket) <= 1:
+            break
+        seed = 1
+        while True:
+            positions = [fnv1a(key, seed) % size for key in bucket]
+            if len(set(positions)) == len(positions) and all(slots[position] == None for position in positions):
+                break
+            seed += 1
+        for key, position in zip(bucket, positions):
+            slots[position] = key
+        seeds[i] = seed
+    free = [position for position in range(size) if slots[position] == None]
+    for i in order:
+        if len(buckets[i]) == 1:
+            position = free.pop()
+            slots[position] = buckets[i][0]
+            seeds[i] = -1 - position
+    return {"seeds": seeds, "keys": slots}
+
+def perfectHashContains(table:dict, name:str) -> bool:
+    """
+    Check if a name is a TLD, using a table created by buildPerfectHash(list)
+
+    Args:
+        table (dict): The table
+        name (str): The name, in lower case
+
+    Returns:
+        bool: True if the name is a TLD
+    """
+    size = len(table["keys"])
+    if size == 0:
+        return False
+    seed = table["seeds"][fnv1a(name) % size]
+    if seed < 0:
+        return table["keys"][-1 - seed] == name
+    return table["keys"][fnv1a(name, seed) % size] == name
+
+def hostnames(tlds:list, count:int = 200000, seed:int = 0) -> list:
+    """
+    Generate a deterministic corpus of hostnames, about three quarters of which end with a TLD from the list
+
+    Args:
+        tlds (list): The TLDs, as returned by words(str)
+        count (int): The number of hostnames. Default: 200000
+        seed (int): The seed of the random generator. Default: 0
+
+    Returns:
+        list: The hostnames
+    """
+    rng = random.Random(seed)
+    tlds = sorted(set(tlds))
+    ret = []
+    for i in range(count):
+        tld = rng.choice(tlds)
+        if rng.random() < 0.25:
+            tld = tld[:-1] + rng.choice("qxz0") if len(tld) > 2 else tld + "q"
+        ret.append("host" + str(i) + "." + rng.choice(["example", "stream", "clips", "cdn"]) + "." + tld)
+    return ret
+
+def measure(build) -> tuple:
+    """
+    Measure the memory allocated by a function which builds a lookup structure
+
+    Args:
+        build (Callable): The function
+
+    Returns:
+        tuple: The result of the function, and the number of bytes it allocated which are still in use
+    """
+    gc.collect()
+    tracemalloc.start()
+    ret = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ret, size
+
+def benchmarkLookup(regex:str, tlds:list, corpus:list, repeat:int = 3) -> dict:
+    """
+    Measure the throughput and memory of checking if the last label of each hostname is a TLD, using the regex, the artifacts of buildTable(list) and buildPerfectHash(list), and a set as a baseline
+
+    The artifacts are measured after loading them from JSON, as a consumer would
+
+    Args:
+        regex (str): The regex, as returned by compileRegex(dict) or compileDawgRegex(list, int)
+        tlds (list): The TLDs, as returned by words(str)
+        corpus (list): The hostnames
+        repeat (int): The number of times each measurement is repeated, keeping the fastest. Default: 3
+
+    Returns:
+        dict: For each method, the number of hostnames which matched, the lookups per second, and the bytes used by the loaded structure
+    """
+    labels = [hostname.rsplit(".", 1)[-1].lower() for hostname in corpus]
+    tableJson = json.dumps(buildTable(tlds))
+    perfectHashJson = json.dumps(buildPerfectHash(tlds))
+    pattern, patternSize = measure(lambda: re.compile(regex.replace("(?<tld>", "(?P<tld>", 1) + "$"))
+    table, tableSize = measure(lambda: json.loads(tableJson))
+    perfectHash, perfectHashSize = measure(lambda: json.loads(perfectHashJson))
+    baseline, baselineSize = measure(lambda: frozenset(json.loads(json.dumps(tlds))))
+    methods = {
+        "regex": (lambda label: pattern.match(label) != None, patternSize),
+        "table": (lambda label: tableContains(table, label), tableSize),
+        "perfectHash": (lambda label: perfectHashContains(perfectHash, label), perfectHashSize),
+        "set": (lambda label: label in baseline, baselineSize)
+    }
+    ret = {}
+    for name, (contains, size) in methods.items():
+        seconds = min(timeit.repeat(lambda: [contains(label) for label in labels], number=1, repeat=repeat))
+        ret[name] = {"matched": sum(1 for label in labels if contains(label)), "perSecond": len(labels) / seconds, "bytes": size}
+    return ret
+
+def artifactNames(verbose:bool) -> list:
+    """
+    Returns the names of the files written by writeArtifacts
+
+    Args:
+        verbose (bool): If the syntax tree files and TLD text file are written
+
+    Returns:
+        list: The file names
+    """
+    if verbose:
+        return ["tld_tree.json", "tld_itree.json", "xntlds.json", "tlds.txt", "tldregex.txt", "tld_table.json", "tld_mph.json"]
+    return ["tldregex.txt", "tld_table.json", "tld_mph.json"]
+
+def writeArtifacts(outdir:str | Path, tldsresponse:str, tlds:dict, itlds:dict, xntlds:dict, regex:str, verbose:bool = False):
+    """
+    Atomically write the regex, the lookup tables, and optionally the syntax trees and TLD list, to the output folder
+
+    The lookup tables contain both the ASCII and the Unicode form of every IDNA TLD. See tableContains(dict, str) and perfectHashContains(dict, str) for how to use them
+
+    Args:
+        outdir (str | Path): The output folder
+        tldsresponse (str): The contents of the IANA TLD list
+        tlds (dict): The trie, as returned by buildTrie(str)
+        itlds (dict): The combined trie, as returned by combineTldsRecursive(dict)
+        xntlds (dict): The IDNA TLDs, as returned by buildTrie(str)
+        regex (str): The regex, as returned by compileRegex(dict)
+        verbose (bool): Also write the syntax tree files and TLD text file. Default: False
+
+    Returns:
+        list: The names of the files which were written; files which already had the same contents are left untouched
+    """
+    outputs = {}
+    if verbose:
+        outputs["tld_tree.json"] = json.dumps(tlds)
+        outputs["tld_itree.json"] = json.dumps(itlds)
+        outputs["xntlds.json"] = json.dumps(xntlds)
         out = tldsresponse
         for xntld in xntlds:
             out = out + '\n' + xntlds[xntld]
-        tld_file.write(out)
+        outputs["tlds.txt"] = out
+    outputs["tldregex.txt"] = regex
+    names = words(tldsresponse)
+    outputs["tld_table.json"] = json.dumps(buildTable(names))
+    outputs["tld_mph.json"] = json.dumps(buildPerfectHash(names))
+    return [name for name, text in outputs.items() if writeFile(Path(outdir, name), text)]
+
+def main() -> int:
+    """
+    Processes the argument parser, loads the IANA TLD list, and writes the regex if the list has changed since the outputs were last generated
 
-with open("tldregex.txt", "w", encoding="utf8") as tld_file:
-    tld_file.write(regex)
+    Returns:
+        int: The exit code
+    """
+    parser = argparse.ArgumentParser(description="Generate the TLD portion of the link detection regex from the IANA TLD list")
+    parser.add_argument("-v", action="store_true", help="Verbose (Creates syntax tree files and tld text file)")
+    parser.add_argument("--file", action="store", help="Load the TLD list from a local file in the format of tlds-alpha-by-domain.txt instead of fetching it from IANA")
+    parser.add_argument("--out", action="store", default=".", help="The folder to write the outputs to. Default: the current folder")
+    parser.add_argument("--cache", action="store", default=".cache", help="The folder to cache the fetched TLD list and the state of the last run in. Default: .cache")
+    parser.add_argument("--timeout", action="store", type=float, default=30.0, help="The maximum number of seconds to wait for the connection and between bytes when fetching. Default: 30")
+    parser.add_argument("--force", action="store_true", help="Write the outputs even if the TLDs in the list have not changed since they were last generated")
+    parser.add_argument("--legacy", action="store_true", help="Generate the regex from the prefix trie only, without minimizing it into a DAWG")
+    parser.add_argument("--verify", action="store_true", help="Check that the regex matches exactly the TLDs in the list and their Unicode forms, and exit with 1 if it does not")
+    parser.add_argument("--benchmark", action="store_true", help="Output the size and match speed of the regex generated with and without --legacy, and the throughput and memory of checking hostnames with the regex and the lookup tables")
+    parser.add_argument("--report", action="store", help="Write a JSON report of the TLDs added and removed since the outputs were last generated to the specified file")
+    parser.add_argument("--corpus", action="store", help="With --benchmark, load the hostnames from the specified file, one per line, instead of generating them")
+    args = parser.parse_args()
+    if args.file != None:
+        tldsresponse = loadList(args.file)
+    else:
+        try:
+            tldsresponse = fetchList(args.cache, args.timeout)
+        except requests.RequestException as e:
+            print(str(e), file=sys.stderr)
+            return 1
+    emitter = "legacy" if args.legacy else "dawg"
+    state = loadState(args.cache)
+    previous = loadPrevious(args.cache)
+    changes = diffLists(previous["list"] if previous != None else None, tldsresponse)
+    if args.report != None:
+        writeFile(args.report, json.dumps(changes, indent=4))
+    print("TLD list " + str(changes["version"]) + ": " + str(len(changes["added"])) + " added, " + str(len(changes["removed"])) + " removed", file=sys.stderr)
+    if not args.force and not args.verify and not args.benchmark and not changes["changed"] and state.get("emitter") == emitter and all(Path(args.out, name).is_file() for name in artifactNames(args.v)):
+        savePrevious(args.cache, tldsresponse, previous["tlds"], previous["itlds"], previous["xntlds"])
+        print("TLDs have not changed, nothing to do", file=sys.stderr)
+        return 0
+    if previous != None:
+        tlds = previous["tlds"]
+        xntlds = previous["xntlds"]
+        itlds = patchCombined(tlds, previous["itlds"], patchTrie(tlds, xntlds, changes, tldsresponse))
+    else:
+        tlds, xntlds = buildTrie(tldsresponse)
+        itlds = combineTldsRecursive(tlds)
+    if args.legacy:
+        regex = compileRegex(itlds)
+    else:
+        regex = compileDawgRegex(*buildDawg(tlds))
+    if args.verify and previous != None:
+        rtlds, rxntlds = buildTrie(tldsresponse)
+        if json.dumps([tlds, itlds, xntlds]) != json.dumps([rtlds, combineTldsRecursive(rtlds), rxntlds]):
+            print("The patched tries differ from the ones built from the list", file=sys.stderr)
+            return 1
+    if args.verify:
+        failures = verifyRegex(regex, words(tldsresponse))
+        if len(failures) > 0:
+            print("The regex does not match exactly the TLDs in the list: " + json.dumps(failures[:20]), file=sys.stderr)
+            return 1
+    if args.benchmark:
+        if args.corpus != None:
+            with open(args.corpus, "r", encoding="utf8") as corpus_file:
+                corpus = [line.strip() for line in corpus_file if len(line.strip()) > 0]
+        else:
+            corpus = hostnames(words(tldsresponse))
+        print(json.dumps({
+            "regex": benchmarkRegex({"legacy": compileRegex(itlds), "dawg": compileDawgRegex(*buildDawg(tlds))}, words(tldsresponse)),
+            "lookup": benchmarkLookup(regex, words(tldsresponse), corpus)
+        }, indent=4))
+    written = writeArtifacts(args.out, tldsresponse, tlds, itlds, xntlds, regex, args.v)
+    print("Wrote " + (", ".join(written) if len(written) > 0 else "nothing, the outputs are unchanged"), file=sys.stderr)
+    savePrevious(args.cache, tldsresponse, tlds, itlds, xntlds)
+    state = loadState(args.cache)
+    state["emitter"] = emitter
+    saveState(args.cache, state)
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# coding=utf-8
+#
+# This file is part of StreamActions.
+# Copyright © 2019-2026 StreamActions Team (streamactions.github.io)
+#
+# StreamActions is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# StreamActions is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with StreamActions.  If not, see <https://www.gnu.org/licenses/>.
+#
+from pathlib import Path
+import sys
+import unittest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import idna
+import TldRegexUpdater
+
+fixtures = Path(Path(__file__).parent, "fixtures")
+
+class DawgRegexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tldsresponse = TldRegexUpdater.loadList(Path(fixtures, "tlds-alpha-by-domain.txt"))
+        cls.tlds = TldRegexUpdater.words(cls.tldsresponse)
+        tlds, xntlds = TldRegexUpdater.buildTrie(cls.tldsresponse)
+        cls.xntlds = xntlds
+        cls.legacy = TldRegexUpdater.pythonRegex(TldRegexUpdater.compileRegex(TldRegexUpdater.combineTldsRecursive(tlds)))
+        tlds, xntlds = TldRegexUpdater.buildTrie(cls.tldsresponse)
+        cls.dawg = TldRegexUpdater.pythonRegex(TldRegexUpdater.compileDawgRegex(*TldRegexUpdater.buildDawg(tlds)))
+
+    def nearMisses(self) -> set:
+        # Every prefix, every TLD with a character removed, replaced, or appended, and every TLD with a dot or hyphen attached
+        expected = set(self.tlds)
+        alphabet = sorted(set(c for tld in expected for c in tld))
+        candidates = set()
+        for tld in expected:
+            for i in range(len(tld)):
+                candidates.add(tld[:i])
+                candidates.add(tld[:i] + tld[i + 1:])
+                candidates.add(tld[:i] + alphabet[(alphabet.index(tld[i]) + 1) % len(alphabet)] + tld[i + 1:])
+            for c in alphabet + [".", "-"]:
+                candidates.add(tld + c)
+            candidates.add("-" + tld)
+        return candidates - expected
+
+    def testMatchesEveryTld(self):
+        for tld in self.tlds:
+            with self.subTest(tld=tld):
+                self.assertIsNotNone(self.legacy.fullmatch(tld))
+                self.assertIsNotNone(self.dawg.fullmatch(tld))
+
+    def testMatchesUnicodeForms(self):
+        self.assertGreater(len(self.xntlds), 0)
+        for xntld, tld in self.xntlds.items():
+            with self.subTest(tld=xntld):
+                self.assertEqual(tld, idna.decode(xntld))
+                self.assertIn(tld, self.tlds)
+                self.assertIsNotNone(self.legacy.fullmatch(tld))
+                self.assertIsNotNone(self.dawg.fullmatch(tld))
+
+    def testRejectsNearMisses(self):
+        candidates = self.nearMisses()
+        self.assertEqual(sorted(x for x in candidates if self.legacy.fullmatch(x) != None), [])
+        self.assertEqual(sorted(x for x in candidates if self.dawg.fullmatch(x) != None), [])
+
+    def testDawgMatchesLegacy(self):
+        for candidate in sorted(self.nearMisses() | set(self.tlds)):
+            self.assertEqual(self.dawg.fullmatch(candidate) != None, self.legacy.fullmatch(candidate) != None, candidate)
+
+    def testVerifyRegex(self):
+        self.assertEqual(TldRegexUpdater.verifyRegex(TldRegexUpdater.compileDawgRegex(*TldRegexUpdater.buildDawg(TldRegexUpdater.buildTrie(self.tldsresponse)[0])), self.tlds), [])
+        self.assertNotEqual(TldRegexUpdater.verifyRegex("(?<tld>com|net)", self.tlds), [])
+
+if __name__ == "__main__":
+    unittest.main()